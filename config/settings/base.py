@@ -4,6 +4,9 @@ from os import path, getenv
 from loguru import logger
 from datetime import timedelta, date
 import cloudinary
+import logging.config
+
+from interceptor import build_logging
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent.parent
@@ -43,11 +46,14 @@ THIRD_PARTY_APPS = [
 LOCAL_APPS = [
     "core_apps.user_auth",
     "core_apps.common",
+    "core_apps.user_profile",
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    "core_apps.common.middleware.HealthProbeMiddleware", # /healthz and /readyz
+    "core_apps.common.query_budget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,7 +61,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "core_apps.user_auth.middleware.CustomHeaderMiddleware",
+    "core_apps.user_auth.middleware.InstrumentationMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -90,9 +96,57 @@ DATABASES = {
         "PASSWORD": getenv("POSTGRES_PASSWORD"),
         "HOST": getenv("POSTGRES_HOST"),
         "PORT": getenv("POSTGRES_PORT"),
+        # Keep each thread's connection for this many seconds, checking it is
+        # still alive at the start of the request that reuses it
+        "CONN_MAX_AGE": int(getenv("POSTGRES_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# Share a bounded pool of connections between the threads of a process
+# instead (see core_apps.common.db), worth it for ASGI and threaded workers
+if getenv("POSTGRES_POOL", "False") == "True":
+    DATABASES["default"].update(
+        {
+            "ENGINE": "core_apps.common.db",
+            "CONN_MAX_AGE": 0, # connections go back to the pool after each request
+            "POOL": {
+                "MIN_SIZE": int(getenv("POSTGRES_POOL_MIN_SIZE", "2")),
+                "MAX_SIZE": int(getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+                "TIMEOUT": 5, # seconds to wait for a free connection
+                "MAX_IDLE": 600, # close idle connections above MIN_SIZE after this
+                "CHECK_AFTER": 30, # ping connections idle for longer before reuse
+            },
+        }
+    )
+
+CACHES = {
+    "default": {
+        # django_redis RedisCache counting hits/misses for request metrics
+        "BACKEND": "core_apps.common.instrumentation.InstrumentedRedisCache",
+        "LOCATION": getenv("REDIS_URL", "redis://redis:6379/1"),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    }
+}
+
+# Authenticated user lookups (see core_apps.common.user_cache)
+USER_CACHE = {
+    "KEY_PREFIX": "auth:user",
+    "TIMEOUT": 5 * 60, # seconds a user stays in Redis
+    "LOCAL_MAXSIZE": 1024, # users kept in each process
+}
+
+# Cached database reads, like profiles (see core_apps.common.read_through)
+READ_THROUGH_CACHE = {
+    "KEY_PREFIX": "rt",
+    "TIMEOUT": 15 * 60, # seconds an entry is served before it is reloaded
+    "EARLY_REFRESH_BETA": 1.0, # above 1 refreshes earlier, 0 disables early refresh
+    "LOCK_TIMEOUT": 5, # seconds one worker may take to load a missing entry
+    "LOCK_WAIT": 0.5, # seconds other workers wait for it before loading it too
+}
+
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.Argon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
@@ -148,6 +202,7 @@ AUTH_USER_MODEL = "user_auth.CustomUser"
 # Defaults for the profiles
 DEFAULT_BIRTH_DATE = date(2000, 1, 1)
 DEFAULT_DATE_JOINED = date(2021, 1, 1)
+DEFAULT_DATE = date(2021, 1, 1)
 DEFAULT_EXPIRY_DATE = date(2024, 1, 1)
 DEFAULT_COUNTRY = "US"
 DEFAULT_PHONE_NUMBER = "+593 994233890"
@@ -165,13 +220,20 @@ REST_FRAMEWORK = {
         "django_filters.rest_framework.DjangoFilterBackend"
     ],
     "PAGE_SIZE":10,
+    # GCRA throttles kept in Redis, shared by every worker (see core_apps.common.throttling)
     "DEFAULT_THROTTLE_CLASSES":[
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "core_apps.common.throttling.AnonRateThrottle",
+        "core_apps.common.throttling.RoleRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "50/day",
-        "user": "100/day"
+        "login": "10/min", # Per client IP, login and OTP verification
+        "user": "100/day", # Roles without a rate of their own
+        # Per CustomUser.RoleChoices
+        "customer": "100/day",
+        "account_executive": "2000/day",
+        "teller": "5000/day",
+        "branch_manager": "5000/day",
     }
 }
 
@@ -244,10 +306,128 @@ CELERY_TASK_SOFT_TIME_LIMIT = 5 * 60
 # Tells Celery Beat to use the database to store periodic task schedules instead of a local file.
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 
+# ContentView ingestion
+# "sync" writes each view inside the request, "buffered" pushes it to a buffer
+# that is written in batches ("local": in-process, "redis": shared by all workers)
+CONTENT_VIEW_INGESTION = {
+    "MODE": getenv("CONTENT_VIEW_INGESTION_MODE", "buffered"),
+    "BUFFER": getenv("CONTENT_VIEW_BUFFER", "redis"),
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 10, # seconds
+    "REDIS_KEY": "common:content_views:buffer",
+}
+
+# Approximate unique viewer counts (see core_apps.common.view_sketches),
+# "redis": shared by all workers, "local": in-process, per process
+CONTENT_VIEW_SKETCHES = {
+    "BACKEND": getenv("CONTENT_VIEW_SKETCHES", "redis"),
+    "REDIS_PREFIX": "common:content_views:hll",
+    "RETENTION_DAYS": 400, # per-day sketches, the all-time one is kept
+}
+
+# Daily ContentView rollups (see core_apps.common.rollups), folded in every
+# INTERVAL seconds, leaving out views changed in the last LAG seconds
+CONTENT_VIEW_ROLLUPS = {
+    "INTERVAL": 300, # seconds
+    "LAG": 60, # seconds
+    "WINDOW": 3600, # seconds of changes folded per transaction
+}
+
+# Monthly partitions of the ContentView table (see core_apps.common.partitions),
+# enable before running partition_content_views --convert
+CONTENT_VIEW_PARTITIONING = {
+    "ENABLED": getenv("CONTENT_VIEW_PARTITIONING", "False") == "True",
+    "PREMAKE_MONTHS": 3, # partitions created ahead of time
+    "RETENTION_MONTHS": 13, # full months kept before the current one
+    "EXPIRED": "drop", # or "detach", to archive the detached tables by hand
+}
+
+# Periodic tasks, synced into the database by the DatabaseScheduler
+CELERY_BEAT_SCHEDULE = {
+    "flush-content-views": {
+        "task": "common.flush_content_views",
+        "schedule": CONTENT_VIEW_INGESTION["FLUSH_INTERVAL"],
+    },
+    "rollup-content-views": {
+        "task": "common.rollup_content_views",
+        "schedule": CONTENT_VIEW_ROLLUPS["INTERVAL"],
+    },
+    "maintain-content-view-partitions": {
+        "task": "common.maintain_content_view_partitions",
+        "schedule": 6 * 60 * 60,
+    },
+}
+
 # Workers will send task events (e.g., started, succeeded, failed) 
 # so monitoring tools (like flower) can track them in real time.
 CELERY_WORKER_SEND_TASK_EVENTS = True
 
+# Readiness checks served on /readyz (see core_apps.common.health). Each result
+# is cached for CACHE_TTL seconds; a failing non CRITICAL check is reported
+# without taking the instance out of rotation
+HEALTH_CHECKS = [
+    {"BACKEND": "core_apps.common.health.DatabaseCheck", "TIMEOUT": 2, "CACHE_TTL": 5},
+    {"BACKEND": "core_apps.common.health.MigrationsCheck", "TIMEOUT": 10, "CACHE_TTL": 30},
+    {"BACKEND": "core_apps.common.health.CacheCheck", "TIMEOUT": 1, "CACHE_TTL": 5},
+    {"BACKEND": "core_apps.common.health.BrokerCheck", "TIMEOUT": 2, "CACHE_TTL": 10},
+    {
+        "BACKEND": "core_apps.common.health.CeleryWorkerCheck",
+        "TIMEOUT": 2,
+        "CACHE_TTL": 30,
+        "CRITICAL": False,
+    },
+]
+
+# Per-request instrumentation (see core_apps.common.instrumentation)
+INSTRUMENTATION = {
+    "SERVER_TIMING": getenv("SERVER_TIMING", "True") == "True", # Server-Timing response header
+}
+
+# Query budgets of views and model methods (see core_apps.common.query_budget)
+QUERY_BUDGETS = {
+    "ENFORCE": getenv("QUERY_BUDGETS_ENFORCE", "False") == "True", # always on in tests
+    # URL names, namespaced, that need no budget
+    "EXEMPT_URLS": ["admin:*", "schema", "swagger-ui", "redoc"],
+}
+
+TEST_RUNNER = "core_apps.common.test_runner.QueryBudgetTestRunner"
+
+# Threads running password hashing and email delivery for async views
+# (see core_apps.common.offload)
+ASYNC_OFFLOAD = {
+    "MAX_WORKERS": int(getenv("ASYNC_OFFLOAD_WORKERS", "4")),
+}
+
+# Email notifications (see core_apps.common.notifications)
+NOTIFICATIONS = {
+    "CHUNK_SIZE": 100, # messages sent per SMTP connection
+}
+
+# Largest file accepted for upload
+MAX_UPLOAD_SIZE = 1 * 1024 * 1024 # 1MB
+
+# KYC document uploads (see core_apps.user_profile.uploads)
+KYC_UPLOADS = {
+    "WORKERS": int(getenv("KYC_UPLOAD_WORKERS", "2")), # threads re-encoding images
+    # Re-encoded images wait here for the upload task, it must be shared with
+    # the Celery workers
+    "STAGING_DIR": getenv("KYC_UPLOAD_STAGING_DIR", str(BASE_DIR / "media" / "kyc_staging")),
+    "STORAGE": {
+        "BACKEND": "core_apps.user_profile.uploads.CloudinaryStorage",
+        "OPTIONS": {"folder": "bank_photos"},
+    },
+}
+
+# KYC dossiers rendered as PDF (see core_apps.user_profile.dossiers)
+DOSSIERS = {
+    "WORKERS": int(getenv("DOSSIER_WORKERS", "2")), # processes rendering month-end runs
+    "STAGING_DIR": getenv("DOSSIER_STAGING_DIR", str(BASE_DIR / "media" / "dossier_staging")),
+    "STORAGE": {
+        "BACKEND": "core_apps.user_profile.uploads.CloudinaryStorage",
+        "OPTIONS": {"folder": "kyc_dossiers"},
+    },
+}
+
 CLOUDINARY_CLOUD_NAME = getenv("CLOUDINARY_CLOUD_NAME")
 CLOUDINARY_API_KEY = getenv("CLOUDINARY_API_KEY")
 CLOUDINARY_API_SECRET = getenv("CLOUDINARY_API_SECRET")
@@ -270,38 +450,69 @@ COOKIE_SECURE = getenv("COOKIE_SECURE", "True") == "True"
 
 LOGGING_CONFIG = None # Avoid conflicts with loguru
 
-LOGURU_LOGGING ={
-    "handlers": [
-        {
-            "sink": BASE_DIR / "logs/debug.log", # Debug logs file
-            "level": "DEBUG", # Anything above DEBUG lvl will be sent to the file
-            "filter": lambda record: record["level"].no <= logger.level("WARNING").no,
-            "format": "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - "
-            "{message}",
-            "rotation": "10 MB",
-            "retention": "30 days",
-            "compression": "zip",
-        },
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}"
+
+# Queue backed sinks: requests only enqueue messages, a background thread
+# writes, rotates and compresses the files
+LOG_ASYNC = getenv("LOG_ASYNC", "True") == "True"
+
+# Also write every record as one JSON object per line to logs/app.jsonl
+LOG_JSON = getenv("LOG_JSON", "False") == "True"
+
+# Minimum level per logger (and its children), "" is the root logger
+LOG_LEVELS = {
+    "": "DEBUG",
+    "django.db.backends": "INFO",
+    "django.utils.autoreload": "INFO",
+    "urllib3": "INFO",
+}
+
+# Keep one in N DEBUG records of these loggers
+LOG_SAMPLING = {
+    "django.template": 100,
+}
+
+LOG_HANDLERS = [
+    {
+        "sink": BASE_DIR / "logs/debug.log", # Debug logs file
+        "level": "DEBUG", # Anything from DEBUG up to WARNING will be sent to the file
+        "max_level": "WARNING",
+        "format": LOG_FORMAT,
+        "rotation": "10 MB",
+        "retention": "30 days",
+        "compression": "zip",
+    },
+    {
+        "sink": BASE_DIR / "logs/error.log", # Error logs file
+        "level": "ERROR", # Anything above ERROR lvl will be sent to the file
+        "format": LOG_FORMAT,
+        "rotation": "10 MB",
+        "retention": "30 days",
+        "compression": "zip",
+        "backtrace": True,
+        "diagnose": True,
+    },
+]
+
+if LOG_JSON:
+    LOG_HANDLERS.append(
         {
-            "sink": BASE_DIR / "logs/error.log", # Debug logs file
-            "level": "ERROR", # Anything above DEBUG lv will be sent to the file
-            "format": "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - "
-            "{message}",
-            "rotation": "10 MB",
-            "retention": "30 days",
+            "sink": BASE_DIR / "logs/app.jsonl",
+            "level": "INFO",
+            "serialize": True,
+            "rotation": "50 MB",
+            "retention": "7 days",
             "compression": "zip",
-            "backtrace": True,
-            "diagnose": True,
-        },
-    ],
-}
+        }
+    )
+
+LOGURU_LOGGING, LOGGING = build_logging(
+    LOG_HANDLERS, levels=LOG_LEVELS, sampling=LOG_SAMPLING, asynchronous=LOG_ASYNC
+)
 
 logger.configure(**LOGURU_LOGGING)
 
-LOGGING = {
-    "version":1,
-    "disable_existing_loggers": False,
-    "handlers": {"loguru":{"class": "interceptor.InterceptHandler"}},
-    "root": {"handlers": ["loguru"], "level": "DEBUG"},
-}
+# Django skips LOGGING when LOGGING_CONFIG is None, so route stdlib logging
+# into loguru here
+logging.config.dictConfig(LOGGING)
 
@@ -37,3 +37,9 @@ LOGIN_ATTEMPTS = 3
 
 OTP_EXPIRATION = timedelta(minutes=1)
 
+# Where OTPs are stored, DatabaseOTPBackend keeps them on the user row instead
+OTP_BACKEND = "core_apps.user_auth.otp.RedisOTPBackend"
+
+# Wrong codes allowed before an OTP is discarded
+OTP_MAX_ATTEMPTS = 5
+
@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from core_apps.common.views import metrics
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -10,6 +12,9 @@ from drf_spectacular.views import (
 
 urlpatterns = [
     path(settings.ADMIN_URL, admin.site.urls),
+    path("metrics", metrics, name="metrics"),
+    path("api/v1/auth/", include("core_apps.user_auth.urls")),
+    path("api/v1/profiles/", include("core_apps.user_profile.urls")),
     path("api/v1/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/v1/schema/swagger-ui/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
     path("api/v1/schema/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"),
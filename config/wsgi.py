@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
 
 application = get_wsgi_application()
+
+# Compute the migration state and first check results before the first probe
+from core_apps.common.health import warm_up  # noqa: E402
+
+warm_up()
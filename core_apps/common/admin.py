@@ -4,7 +4,7 @@ from django.contrib.contenttypes.admin import GenericTabularInline
 from django.http import HttpRequest
 from django.utils.translation import gettext_lazy as _
 
-from .models import ContentView
+from .models import ContentView, ContentViewDaily, EmailNotification
 
 @admin.register(ContentView)
 class ContentViewAdmin(admin.ModelAdmin):
@@ -46,6 +46,19 @@ class ContentViewAdmin(admin.ModelAdmin):
     def has_change_permission(self, request: HttpRequest, obj: Any | None = ...) -> bool:
         return False
 
+@admin.register(ContentViewDaily)
+class ContentViewDailyAdmin(admin.ModelAdmin):
+    list_display = ["content_type", "object_id", "day", "views", "unique_viewers"]
+    list_filter = ["content_type", "day"]
+    date_hierarchy = "day"
+    readonly_fields = ["content_type", "object_id", "day", "views", "unique_viewers"]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
+
+    def has_change_permission(self, request: HttpRequest, obj: Any | None = ...) -> bool:
+        return False
+
 class ContentViewInline(GenericTabularInline):
     model = ContentView
     extra = 0
@@ -53,4 +66,24 @@ class ContentViewInline(GenericTabularInline):
     can_delete = False
 
     def has_add_permission(self, request: HttpRequest) -> bool:
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(EmailNotification)
+class EmailNotificationAdmin(admin.ModelAdmin):
+    list_display = ["recipient", "subject", "template_name", "status", "sent_at", "created_at"]
+    list_filter = ["status", "template_name"]
+    search_fields = ["recipient"]
+    # Bodies may hold OTP codes
+    exclude = ["html_body"]
+    readonly_fields = [
+        "recipient",
+        "subject",
+        "template_name",
+        "status",
+        "error",
+        "sent_at",
+        "created_at",
+    ]
+
+    def has_add_permission(self, request: HttpRequest) -> bool:
+        return False
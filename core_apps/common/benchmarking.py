@@ -0,0 +1,161 @@
+"""
+Micro-benchmarks of hot code paths.
+
+Apps declare benchmarks in a ``benchmarks`` module, found like Celery tasks:
+
+    @benchmark("user.set_otp", setup=make_user)
+    def set_otp(user):
+        user.set_otp("123456")
+
+``setup`` builds what the operation needs and its result is passed to it.
+Each benchmark runs inside a transaction that is rolled back, with Redis,
+SMTP, the view buffer and sketches swapped for in-process stand-ins
+(``isolated_settings``), so only a database is needed. It is measured as:
+
+- time: the median, over ``rounds``, of the mean time of ``number`` calls;
+- queries: the queries one call makes;
+- allocations: the memory one call allocates at its peak and the number of
+  memory blocks it leaves allocated, from ``tracemalloc``.
+
+Results are compared with a stored baseline (``run_benchmarks --check``):
+a benchmark regresses when it makes more queries, or is slower or allocates
+more than the baseline by more than the tolerance.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.module_loading import autodiscover_modules
+
+
+def isolated_settings() -> dict[str, Any]:
+    return {
+        "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        "EMAIL_BACKEND": "django.core.mail.backends.locmem.EmailBackend",
+        "OTP_BACKEND": "core_apps.user_auth.otp.DatabaseOTPBackend",
+        "CONTENT_VIEW_INGESTION": {**settings.CONTENT_VIEW_INGESTION, "MODE": "sync"},
+        "CONTENT_VIEW_SKETCHES": {**settings.CONTENT_VIEW_SKETCHES, "BACKEND": "local"},
+    }
+
+
+@dataclass
+class Benchmark:
+    name: str
+    func: Callable[..., Any]
+    setup: Optional[Callable[[], Any]] = None
+    number: int = 100
+    overrides: Optional[dict] = None
+
+
+@dataclass
+class Result:
+    time_us: float
+    queries: int
+    peak_kib: float
+    blocks: int
+
+
+registry: dict[str, Benchmark] = {}
+
+
+def benchmark(
+    name: str,
+    setup: Optional[Callable[[], Any]] = None,
+    number: int = 100,
+    overrides: Optional[dict] = None,
+) -> Callable:
+    """Register a benchmark, with settings ``overrides`` applied while it runs"""
+
+    def register(func: Callable) -> Callable:
+        registry[name] = Benchmark(name, func, setup, number, overrides)
+        return func
+
+    return register
+
+
+def discover() -> dict[str, Benchmark]:
+    autodiscover_modules("benchmarks")
+    return registry
+
+
+class _Rollback(Exception):
+    pass
+
+
+def run(bench: Benchmark, rounds: int = 5) -> Result:
+    result = None
+    overrides = {**isolated_settings(), **(bench.overrides or {})}
+    try:
+        with override_settings(**overrides), transaction.atomic():
+            context = bench.setup() if bench.setup else None
+            operation = partial(bench.func, context) if bench.setup else bench.func
+            operation()  # Warm up caches and lazy imports
+
+            with CaptureQueriesContext(connection) as queries:
+                operation()
+
+            tracemalloc.start()
+            try:
+                before = tracemalloc.take_snapshot()
+                tracemalloc.reset_peak()
+                start, _ = tracemalloc.get_traced_memory()
+                operation()
+                _, peak = tracemalloc.get_traced_memory()
+                after = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+            blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                for _ in range(bench.number):
+                    operation()
+                timings.append((time.perf_counter() - started) / bench.number)
+
+            result = Result(
+                time_us=round(statistics.median(timings) * 1e6, 1),
+                queries=len(queries),
+                peak_kib=round((peak - start) / 1024, 1),
+                blocks=blocks,
+            )
+            raise _Rollback
+    except _Rollback:
+        pass
+    return result
+
+
+def regressions(
+    result: Result, baseline: Optional[dict], time_tolerance: float, memory_tolerance: float
+) -> list[str]:
+    if baseline is None:
+        return []
+    found = []
+    if result.queries > baseline["queries"]:
+        found.append(f"queries {baseline['queries']} -> {result.queries}")
+    if result.time_us > baseline["time_us"] * (1 + time_tolerance):
+        found.append(f"time {baseline['time_us']}us -> {result.time_us}us")
+    if result.peak_kib > baseline["peak_kib"] * (1 + memory_tolerance) + 1:
+        found.append(f"peak {baseline['peak_kib']}KiB -> {result.peak_kib}KiB")
+    return found
+
+
+def load_baseline(path: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_baseline(path: Path, results: dict[str, Result]) -> None:
+    baseline = load_baseline(path)
+    baseline.update({name: asdict(result) for name, result in results.items()})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
@@ -0,0 +1,17 @@
+from core_apps.user_auth.benchmarks import benchmark_user
+from core_apps.user_profile.models import Profile
+
+from .benchmarking import benchmark
+from .models import ContentView
+
+
+def viewed_profile():
+    user = benchmark_user()
+    return Profile.objects.get(user=user), user
+
+
+# Synchronous ingestion: the view is written in the request
+@benchmark("content_view.record_view", setup=viewed_profile)
+def record_view(context):
+    profile, user = context
+    ContentView.record_view(profile, user, "10.0.0.1")
@@ -0,0 +1,31 @@
+"""
+Version stamps for invalidating cache entries.
+
+An entry is stored with, or under, the version of its source read in the
+same round trip, and invalidating replaces the version: entries written with
+the old one, including those of loads racing with the invalidation, are no
+longer served. Stamps are random and never reused, so an evicted version
+can't bring a stale entry back to life.
+"""
+import uuid
+from typing import Iterable
+
+from django.core.cache import cache
+
+
+def new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def current_version(key: str) -> str:
+    """The version stored under ``key``, a new one if there was none"""
+    version = cache.get(key)
+    if version is None:
+        # Another process may be adding one at the same time, the first wins
+        cache.add(key, new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def replace_versions(keys: Iterable[str]) -> None:
+    cache.set_many({key: new_version() for key in keys}, timeout=None)
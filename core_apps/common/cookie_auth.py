@@ -1,11 +1,16 @@
 from typing import Optional, Tuple
 
 from django.conf import settings
+from django.utils.translation import gettext_lazy as _
 from loguru import logger
 from rest_framework.request import Request
 from rest_framework_simplejwt.authentication import AuthUser, JWTAuthentication
-from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import user_cache
 
 class CookieAuth(JWTAuthentication):
 
@@ -26,4 +31,36 @@ class CookieAuth(JWTAuthentication):
             except TokenError as e:
                 logger.error(f"Token validation error: {str(e)}")
         
-        return None
\ No newline at end of file
+        return None
+
+    def get_user(self, validated_token: Token) -> AuthUser:
+        """
+        Same checks as JWTAuthentication.get_user, but the user is resolved
+        through the user cache instead of a database query per request.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+        try:
+            user = user_cache.get_user(user_id)
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,12 @@
+"""
+PostgreSQL backend with an in-process connection pool.
+
+Django 4.2 only knows persistent connections: with ``CONN_MAX_AGE`` each
+thread keeps its own connection, so a process holds as many connections as
+it ever had threads, and an idle thread's connection is wasted while a busy
+one waits for its own. With ``ENGINE`` set to ``core_apps.common.db`` the
+threads of a process share one bounded pool instead: a connection is taken
+on the first query of a request and handed back when Django would close it,
+so ``CONN_MAX_AGE`` must be 0. The pool is configured by the ``POOL`` entry
+of the database settings, see ``ConnectionPool``.
+"""
@@ -0,0 +1,44 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.db.backends.postgresql.creation import (
+    DatabaseCreation as PostgresDatabaseCreation,
+)
+
+from .pool import ConnectionPool, get_pool
+
+
+class DatabaseCreation(PostgresDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would make DROP DATABASE fail
+        self.connection.get_pool(test_database_name).close()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    """``django.db.backends.postgresql`` taking its connections from a pool"""
+
+    creation_class = DatabaseCreation
+
+    def get_pool(self, name: str) -> ConnectionPool:
+        target = (name, *(self.settings_dict[key] for key in ("USER", "HOST", "PORT")))
+        return get_pool(self.alias, target, self.settings_dict.get("POOL", {}))
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return self.get_pool(self.settings_dict["NAME"])
+
+    def check_settings(self):
+        super().check_settings()
+        if self.settings_dict["CONN_MAX_AGE"] != 0:
+            raise ImproperlyConfigured(
+                f"Database {self.alias} is pooled, its CONN_MAX_AGE must be 0 so "
+                "connections go back to the pool at the end of each request."
+            )
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,257 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Open pooled connections",
+    ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent getting a connection from the pool, connecting included",
+    ["alias"],
+    buckets=WAIT_BUCKETS,
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts", "Connection requests that timed out", ["alias"])
+
+_pools: dict[tuple, "ConnectionPool"] = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class _Waiter:
+    def __init__(self):
+        self.ready = threading.Event()
+        self.connection = None
+
+
+class ConnectionPool:
+    """
+    At most ``max_size`` connections shared by the threads of a process.
+    When all of them are in use, ``acquire`` waits up to ``timeout`` seconds
+    for one to be released, first come first served. Idle connections above ``min_size`` are closed
+    after ``max_idle`` seconds, and one that sat idle for more than
+    ``check_after`` seconds is pinged before being handed out. A forked
+    child starts with an empty pool of its own.
+    """
+
+    def __init__(
+        self,
+        alias: str,
+        min_size: int = 0,
+        max_size: int = 10,
+        timeout: float = 5,
+        max_idle: float = 600,
+        check_after: Optional[float] = 30,
+    ):
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._idle: deque[tuple[Any, float]] = deque()
+        self._size = 0
+        self._waiters: deque[_Waiter] = deque()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiting": len(self._waiters),
+                "max_size": self.max_size,
+            }
+
+    def _publish(self) -> None:
+        # Called with the lock held
+        POOL_CONNECTIONS.labels(self.alias, "idle").set(len(self._idle))
+        POOL_CONNECTIONS.labels(self.alias, "in_use").set(self._size - len(self._idle))
+
+    def acquire(self, connect: Callable[[], Any]) -> Any:
+        """A pooled connection, or a new one made by ``connect`` if there is room"""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    # The parent's connections can't be shared, leave them alone
+                    self._reset()
+                expired = self._trim_idle()
+                # Queue behind earlier waiters rather than overtaking them. Most
+                # recently used first, its backend is the warmest
+                idle = self._idle.pop() if self._idle and not self._waiters else None
+                waiter = None
+                if idle is None:
+                    if not self._waiters and self._size < self.max_size:
+                        self._size += 1
+                    else:
+                        waiter = _Waiter()
+                        self._waiters.append(waiter)
+            # Closing and pinging are round trips, other threads don't wait on them
+            for connection in expired:
+                self._close(connection)
+            if idle is None or self._usable(*idle):
+                break
+            self._drop(idle[0])
+        connection = idle[0] if idle else None
+
+        if waiter is not None:
+            waiter.ready.wait(self.timeout)
+            with self._lock:
+                if not waiter.ready.is_set():
+                    self._waiters.remove(waiter)
+                    POOL_TIMEOUTS.labels(self.alias).inc()
+                    raise PoolTimeout(
+                        f"No connection available in the {self.alias} pool "
+                        f"after {self.timeout}s ({self.max_size} in use)"
+                    )
+            # Handed over by release: a connection, or the slot of a dropped one
+            connection = waiter.connection
+
+        if connection is None:
+            # Connect outside the lock, the slot is already ours
+            try:
+                connection = connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._hand_over(None)
+                raise
+
+        with self._lock:
+            self._publish()
+        POOL_WAIT.labels(self.alias).observe(time.monotonic() - started)
+        return connection
+
+    def _trim_idle(self) -> list:
+        """
+        Take the connections idle for more than max_idle above min_size out
+        of the pool, for the caller to close. Called with the lock held.
+        """
+        now = time.monotonic()
+        expired = []
+        # From the cold end
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+        return expired
+
+    def _usable(self, connection, released: float) -> bool:
+        if connection.closed:
+            return False
+        if self.check_after is None or time.monotonic() - released <= self.check_after:
+            return True
+        return self._ping(connection)
+
+    def _ping(self, connection) -> bool:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except Exception as e:
+            logger.warning(f"Dropping broken pooled connection to {self.alias}: {e}")
+            return False
+
+    def _drop(self, connection) -> None:
+        """Close a connection taken from the pool, giving its slot to a waiter"""
+        with self._lock:
+            self._size -= 1
+            self._hand_over(None)
+        self._close(connection)
+
+    def _close(self, connection) -> None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def release(self, connection) -> None:
+        """Give a connection back, rolling back anything left open"""
+        reusable = not connection.closed
+        if reusable:
+            status = connection.info.transaction_status
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                reusable = False
+            elif status != TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except Exception:
+                    reusable = False
+        if not reusable:
+            self._close(connection)
+
+        with self._lock:
+            if self._pid != os.getpid():
+                connection.close()
+                return
+            if not reusable:
+                self._size -= 1
+                connection = None
+            if not self._hand_over(connection) and connection is not None:
+                self._idle.append((connection, time.monotonic()))
+            self._publish()
+
+    def _hand_over(self, connection) -> bool:
+        """
+        Give a connection, or a free slot when ``connection`` is None, to the
+        longest waiting thread. Called with the lock held.
+        """
+        if not self._waiters or (connection is None and self._size >= self.max_size):
+            return False
+        waiter = self._waiters.popleft()
+        if connection is None:
+            self._size += 1
+        waiter.connection = connection
+        waiter.ready.set()
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._publish()
+        for connection in idle:
+            self._close(connection)
+
+
+def get_pool(alias: str, target: tuple, options: dict) -> ConnectionPool:
+    """
+    The pool of a database alias, created from its ``POOL`` settings on first
+    use. ``target`` tells apart the databases an alias points to over time,
+    like the test database.
+    """
+    key = (alias, *target)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(
+                    alias, **{name.lower(): value for name, value in options.items()}
+                )
+    return pool
+
+
+def pool_stats() -> dict[str, dict]:
+    return {pool.alias: pool.stats() for pool in list(_pools.values())}
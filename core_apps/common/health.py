@@ -0,0 +1,221 @@
+"""
+Liveness and readiness probes.
+
+``/healthz`` only proves the process is serving requests. ``/readyz`` runs the
+checks listed in ``HEALTH_CHECKS``; each one has its own timeout and keeps its
+result for ``CACHE_TTL`` seconds. Expired results are refreshed on a small
+background thread pool while the previous result keeps being served, so
+probes are answered from memory; a dependency that hangs past its timeout is
+reported as failed without making the probe wait for it.
+
+The migration state is computed once per process (``warm_up`` does it at
+startup) and only recomputed while migrations are still pending.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Optional, Union
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+from loguru import logger
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="health")
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    healthy: bool
+    detail: str
+    duration: float
+    checked_at: float
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "status": "ok" if self.healthy else "fail",
+            "detail": self.detail,
+            "duration_ms": round(self.duration * 1000, 2),
+        }
+
+
+class HealthCheck:
+    """
+    Subclasses implement ``check``, which raises or returns a short detail
+    string. Non critical checks are reported without failing readiness.
+    """
+
+    name = "check"
+
+    def __init__(self, timeout: float = 2, cache_ttl: float = 5, critical: bool = True) -> None:
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.critical = critical
+        self._result: Optional[CheckResult] = None
+        self._running = None
+        self._running_since = 0.0
+        self._lock = threading.Lock()
+
+    def check(self) -> str:
+        raise NotImplementedError
+
+    def _run(self) -> CheckResult:
+        start = time.monotonic()
+        try:
+            detail, healthy = self.check() or "ok", True
+        except Exception as e:
+            detail, healthy = f"{type(e).__name__}: {e}", False
+            logger.warning(f"Health check {self.name} failed: {detail}")
+        finally:
+            # Checker threads never see request_finished, don't keep their
+            # connections open (or out of the pool) between checks
+            connections.close_all()
+        result = CheckResult(healthy, detail, time.monotonic() - start, time.monotonic())
+        with self._lock:
+            self._result = result
+            self._running = None
+        return result
+
+    def poll(self) -> Union[CheckResult, Future]:
+        """A fresh cached result, or the run in progress (started if needed)"""
+        result = self._result
+        if result is not None and time.monotonic() - result.checked_at < self.cache_ttl:
+            return result
+        with self._lock:
+            if self._running is None:
+                self._running_since = time.monotonic()
+                self._running = _executor.submit(self._run)
+            return self._running
+
+    def result(self, started: Optional[float] = None) -> CheckResult:
+        now = time.monotonic()
+        outcome = self.poll()
+        if isinstance(outcome, CheckResult):
+            return outcome
+
+        # While a refresh runs in the background the previous result is still
+        # served, until the refresh is overdue
+        previous = self._result
+        if previous is not None and now - previous.checked_at < self.cache_ttl + self.timeout:
+            return previous
+
+        deadline = min(now if started is None else started, self._running_since) + self.timeout
+        try:
+            return outcome.result(timeout=max(0, deadline - now))
+        except TimeoutError:
+            # A stuck run keeps its slot, so later probes don't pile up behind it
+            return CheckResult(False, f"timed out after {self.timeout}s", self.timeout, now)
+
+
+class DatabaseCheck(HealthCheck):
+    name = "database"
+
+    def check(self) -> str:
+        connection = connections[DEFAULT_DB_ALIAS]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception:
+            # Don't keep a broken connection in the checker thread
+            connection.close()
+            raise
+        return "ok"
+
+
+class MigrationsCheck(HealthCheck):
+    name = "migrations"
+
+    def check(self) -> str:
+        pending = pending_migrations()
+        if pending:
+            raise RuntimeError(f"{pending} unapplied migrations")
+        return "ok"
+
+
+class CacheCheck(HealthCheck):
+    name = "cache"
+
+    def check(self) -> str:
+        from django_redis import get_redis_connection
+
+        get_redis_connection("default").ping()
+        return "ok"
+
+
+class BrokerCheck(HealthCheck):
+    name = "broker"
+
+    def check(self) -> str:
+        from kombu import Connection
+
+        with Connection(settings.CELERY_BROKER_URL, connect_timeout=self.timeout) as broker:
+            broker.ensure_connection(max_retries=1)
+        return "ok"
+
+
+class CeleryWorkerCheck(HealthCheck):
+    name = "celery"
+
+    def check(self) -> str:
+        from config.celery_app import app
+
+        replies = app.control.ping(timeout=self.timeout / 2)
+        if not replies:
+            raise RuntimeError("no worker replied")
+        return f"{len(replies)} workers"
+
+
+_migrations_lock = threading.Lock()
+_pending_migrations: Optional[int] = None
+
+
+def pending_migrations() -> int:
+    """
+    Number of unapplied migrations. Building the plan loads the whole
+    migration graph, so a clean result is kept for the life of the process.
+    """
+    global _pending_migrations
+    if _pending_migrations == 0:
+        return 0
+    with _migrations_lock:
+        if _pending_migrations != 0:
+            from django.db.migrations.executor import MigrationExecutor
+
+            executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+            plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+            _pending_migrations = len(plan)
+        return _pending_migrations
+
+
+@lru_cache(maxsize=None)
+def get_checks() -> tuple[HealthCheck, ...]:
+    return tuple(
+        import_string(check["BACKEND"])(
+            timeout=check.get("TIMEOUT", 2),
+            cache_ttl=check.get("CACHE_TTL", 5),
+            critical=check.get("CRITICAL", True),
+        )
+        for check in settings.HEALTH_CHECKS
+    )
+
+
+def readiness() -> tuple[bool, dict[str, Any]]:
+    checks = get_checks()
+    started = time.monotonic()
+    # Start every stale check before waiting on any, so their timeouts overlap
+    for check in checks:
+        check.poll()
+    report, ready = {}, True
+    for check in checks:
+        result = check.result(started)
+        report[check.name] = result.as_dict()
+        ready = ready and (result.healthy or not check.critical)
+    return ready, report
+
+
+def warm_up() -> None:
+    """Start the checks in the background so the first probe is answered from cache"""
+    for check in get_checks():
+        check.poll()
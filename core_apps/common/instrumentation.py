@@ -0,0 +1,153 @@
+"""
+Per-request performance counters.
+
+``InstrumentationMiddleware`` (core_apps.user_auth.middleware) opens a
+``RequestMetrics`` for every request in a context variable, so it also
+follows the request into ``sync_to_async`` and offload threads. Database time
+and query count come from ``record_query``, an execute wrapper installed on
+every new connection, cache hits and misses from the instrumented cache
+backends below. At the end of the request they are sent
+as a ``Server-Timing`` header and observed into Prometheus histograms labelled
+by view, exported on ``/metrics``.
+
+Set ``PROMETHEUS_MULTIPROC_DIR`` when running several worker processes so a
+scrape sees all of them, see prometheus_client's multiprocess mode.
+"""
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from django.core.cache.backends.locmem import LocMemCache
+from django_redis.cache import RedisCache
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Wall time spent handling the request",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in database queries per request",
+    ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries per request",
+    ["view", "method"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUESTS = Counter("http_requests", "Requests handled", ["view", "method", "status"])
+REQUEST_CACHE = Counter(
+    "http_request_cache_lookups", "Cache lookups made by requests", ["view", "result"]
+)
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    def server_timing(self, total: float) -> str:
+        return ", ".join(
+            [
+                f"total;dur={total * 1000:.1f}",
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+                f'cache;desc="{self.cache_hits} hits / {self.cache_misses} misses"',
+            ]
+        )
+
+    def observe(self, view: str, method: str, status: int, total: float) -> None:
+        REQUEST_DURATION.labels(view, method).observe(total)
+        REQUEST_DB_DURATION.labels(view, method).observe(self.db_time)
+        REQUEST_DB_QUERIES.labels(view, method).observe(self.db_queries)
+        REQUESTS.labels(view, method, status).inc()
+        if self.cache_hits:
+            REQUEST_CACHE.labels(view, "hit").inc(self.cache_hits)
+        if self.cache_misses:
+            REQUEST_CACHE.labels(view, "miss").inc(self.cache_misses)
+
+
+current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "current_metrics", default=None
+)
+
+_MISSING = object()
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.db_queries += 1
+
+
+def record_cache_lookups(hits: int, misses: int) -> None:
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class InstrumentedCacheMixin:
+    """Counts hits and misses of ``get``/``get_many`` for the current request"""
+
+    def get(self, key: Any, default: Any = None, version: Optional[int] = None, **kwargs):
+        value = super().get(key, _MISSING, version=version, **kwargs)
+        if value is _MISSING:
+            record_cache_lookups(0, 1)
+            return default
+        record_cache_lookups(1, 0)
+        return value
+
+    def get_many(self, keys: Any, version: Optional[int] = None, **kwargs) -> dict:
+        keys = list(keys)
+        # Some backends implement get_many with get, don't count those twice
+        token = current_metrics.set(None)
+        try:
+            values = super().get_many(keys, version=version, **kwargs)
+        finally:
+            current_metrics.reset(token)
+        record_cache_lookups(len(values), len(keys) - len(values))
+        return values
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+def export() -> tuple[bytes, str]:
+    """The metrics of this process, or of all of them in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
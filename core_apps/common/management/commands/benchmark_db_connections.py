@@ -0,0 +1,111 @@
+import threading
+import time
+from statistics import quantiles
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core_apps.common.db.base import DatabaseWrapper as PooledDatabaseWrapper
+
+MODES = {
+    "new": {"CONN_MAX_AGE": 0},
+    "persistent": {"CONN_MAX_AGE": 60, "CONN_HEALTH_CHECKS": True},
+    "pooled": {"ENGINE": "core_apps.common.db", "CONN_MAX_AGE": 0},
+}
+
+
+class Command(BaseCommand):
+    """
+    Request latency with a new connection per request, persistent
+    connections and the shared pool, against the configured database.
+    ``--concurrency`` threads run simulated requests: the request_started and
+    request_finished signals the handler sends, around ``--queries`` small
+    queries. "connect" is the time the first query waited for a connection.
+    """
+
+    help = "Benchmark per-request database connection handling"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--queries", type=int, default=3)
+        parser.add_argument(
+            "--pool-size", type=int, help="Pool MAX_SIZE, --concurrency by default"
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+        original = dict(settings_dict)
+        pool_size = options["pool_size"] or options["concurrency"]
+
+        results = []
+        try:
+            for label, overrides in MODES.items():
+                settings_dict.clear()
+                settings_dict.update(original, **overrides)
+                settings_dict["POOL"] = {"MIN_SIZE": 0, "MAX_SIZE": pool_size}
+                results.append((label, *self.measure(options)))
+                if label == "pooled":
+                    pool = PooledDatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS).pool
+                    stats = pool.stats()
+                    pool.close()
+        finally:
+            settings_dict.clear()
+            settings_dict.update(original)
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} threads, "
+            f"{options['queries']} queries each"
+        )
+        self.stdout.write(
+            f"  {'':<11} {'req/s':>7} {'p50':>8} {'p99':>8} {'connect p99':>12} {'connections':>12}"
+        )
+        for label, elapsed, latencies, waits, opened in results:
+            self.stdout.write(
+                f"  {label:<11} {len(latencies) / elapsed:7.0f} "
+                f"{self.p(latencies, 50):6.2f}ms {self.p(latencies, 99):6.2f}ms "
+                f"{self.p(waits, 99):10.2f}ms {opened:12}"
+            )
+        self.stdout.write(f"  pool after the run: {stats}")
+
+    @staticmethod
+    def p(values, percentile):
+        return quantiles(values, n=100)[percentile - 1] * 1000
+
+    def measure(self, options):
+        remaining = iter(range(options["requests"]))
+        lock = threading.Lock()
+        # Raw connections used, kept referenced so their ids stay distinct
+        latencies, waits, used = [], [], []
+
+        def worker():
+            connection = connections[DEFAULT_DB_ALIAS]
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                try:
+                    connection.ensure_connection()
+                    waited = time.perf_counter() - start
+                    used.append(connection.connection)
+                    with connection.cursor() as cursor:
+                        for _ in range(options["queries"]):
+                            cursor.execute("SELECT 1")
+                            cursor.fetchone()
+                finally:
+                    request_finished.send(sender=self.__class__)
+                latencies.append(time.perf_counter() - start)
+                waits.append(waited)
+            connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return elapsed, latencies, waits, len({id(raw) for raw in used})
@@ -0,0 +1,123 @@
+import logging
+import logging.config
+import tempfile
+import time
+from pathlib import Path
+from statistics import mean, quantiles
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from loguru import logger
+
+from interceptor import build_logging
+
+
+class LegacyInterceptHandler(logging.Handler):
+    # What every stdlib record used to go through: a level lookup and a walk
+    # back up the stack out of the logging module
+    def emit(self, record):
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+
+        frame, depth = logging.currentframe(), 2
+        while frame.f_code.co_filename == logging.__file__:
+            frame = frame.f_back
+            depth += 1
+
+        logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
+
+
+class Command(BaseCommand):
+    """
+    Measures the logging cost a request pays, with the old synchronous
+    pipeline and the current one in sync and async mode. Each simulated
+    request logs like a busy view: SQL and template DEBUG chatter from Django,
+    a couple of app messages and the request line. Sinks are written to a
+    temporary directory and the configured logging is restored afterwards.
+    """
+
+    help = "Benchmark the per-request logging overhead"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--json", action="store_true", help="Add the JSON-lines sink")
+        parser.add_argument(
+            "--rotation", help='Override the sinks\' rotation, e.g. "1 MB" to include rotations'
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                for label in ("legacy", "sync", "async"):
+                    self.configure(label, Path(tmp) / label, options["json"], options["rotation"])
+                    results.append((label, *self.measure(options["requests"])))
+        finally:
+            logger.configure(**settings.LOGURU_LOGGING)
+            logging.config.dictConfig(settings.LOGGING)
+
+        self.stdout.write(f"Logging overhead per request ({options['requests']} requests)")
+        self.stdout.write(f"  {'':<7} {'mean':>10} {'p99':>10} {'max':>10}   drain")
+        for label, timings, drain in results:
+            self.stdout.write(
+                f"  {label:<7} {self.us(mean(timings))} {self.us(quantiles(timings, n=100)[98])} "
+                f"{self.us(max(timings))}   {drain * 1000:.1f} ms"
+            )
+
+    @staticmethod
+    def us(seconds):
+        return f"{seconds * 1e6:7.1f} us"
+
+    def configure(self, label, directory, json_sink, rotation):
+        handlers = []
+        for handler in settings.LOG_HANDLERS:
+            handler = dict(handler, sink=directory / Path(handler["sink"]).name)
+            if rotation:
+                handler["rotation"] = rotation
+            if handler.get("serialize") and not json_sink:
+                continue
+            handlers.append(handler)
+        if json_sink and not any(h.get("serialize") for h in handlers):
+            handlers.append({"sink": directory / "app.jsonl", "level": "INFO", "serialize": True})
+
+        if label == "legacy":
+            # DEBUG everywhere, no sampling, file writes in the calling thread
+            loguru_logging, logging_config = build_logging(handlers, asynchronous=False)
+            logging_config["handlers"]["loguru"] = {
+                "class": f"{__name__}.LegacyInterceptHandler"
+            }
+        else:
+            loguru_logging, logging_config = build_logging(
+                handlers,
+                levels=settings.LOG_LEVELS,
+                sampling=settings.LOG_SAMPLING,
+                asynchronous=label == "async",
+            )
+        logger.configure(**loguru_logging)
+        logging.config.dictConfig(logging_config)
+
+    def measure(self, requests):
+        sql = logging.getLogger("django.db.backends")
+        template = logging.getLogger("django.template")
+        request_log = logging.getLogger("django.request")
+
+        timings = []
+        for i in range(requests):
+            start = time.perf_counter()
+            for query in range(8):
+                sql.debug("(0.001) SELECT * FROM user_auth_customuser WHERE id = %s", query)
+            for variable in range(10):
+                template.debug("Exception while resolving variable '%s'", variable)
+            logger.debug(f"Loaded profile for request {i}")
+            logger.info(f"Profile {i} updated")
+            request_log.info("GET /api/v1/profiles/%s/ 200", i)
+            timings.append(time.perf_counter() - start)
+
+        # Removing the handlers waits for the writer threads to catch up, the
+        # request threads never do this
+        start = time.perf_counter()
+        logger.remove()
+        drain = time.perf_counter() - start
+        return timings, drain
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core_apps.common import partitions
+
+
+class Command(BaseCommand):
+    """
+    Keeps the monthly partitions of the ContentView table, see
+    core_apps.common.partitions. ``--convert`` partitions the table first,
+    once, after CONTENT_VIEW_PARTITIONING["ENABLED"] has been deployed.
+    """
+
+    help = "Create the coming ContentView partitions and expire the old ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert", action="store_true", help="Partition the table, keeping its rows"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.CONTENT_VIEW_PARTITIONING["ENABLED"]:
+            raise CommandError('CONTENT_VIEW_PARTITIONING["ENABLED"] is off')
+        if options["convert"]:
+            if partitions.is_partitioned():
+                raise CommandError("The ContentView table is already partitioned")
+            partitions.convert()
+        elif not partitions.is_partitioned():
+            raise CommandError("The ContentView table isn't partitioned, see --convert")
+
+        done = partitions.maintain_partitions()
+        for action, names in done.items():
+            for name in names:
+                self.stdout.write(f"{action.capitalize()} {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(partitions.partitions())} partitions"))
@@ -0,0 +1,71 @@
+from fnmatch import fnmatch
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core_apps.common import benchmarking
+
+
+class Command(BaseCommand):
+    """
+    Runs the micro-benchmarks declared in the apps' ``benchmarks`` modules
+    (see core_apps.common.benchmarking) and compares them with the baseline.
+    Times depend on the machine, record a baseline where you compare.
+    """
+
+    help = "Run the hot path micro-benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("patterns", nargs="*", help='Benchmarks to run, e.g. "user.*"')
+        parser.add_argument("--rounds", type=int, default=5)
+        parser.add_argument(
+            "--baseline", type=Path, default=settings.BASE_DIR / "benchmarks" / "baseline.json"
+        )
+        parser.add_argument("--save", action="store_true", help="Store the results as baseline")
+        parser.add_argument("--check", action="store_true", help="Fail on any regression")
+        parser.add_argument("--time-tolerance", type=float, default=0.25)
+        parser.add_argument("--memory-tolerance", type=float, default=0.25)
+
+    def handle(self, *args, **options):
+        benchmarks = [
+            bench
+            for name, bench in sorted(benchmarking.discover().items())
+            if not options["patterns"] or any(fnmatch(name, p) for p in options["patterns"])
+        ]
+        baseline = benchmarking.load_baseline(options["baseline"])
+
+        self.stdout.write(
+            f"{'':<36} {'time/op':>11} {'queries':>8} {'peak':>10} {'blocks':>7}  vs baseline"
+        )
+        results, failed = {}, []
+        for bench in benchmarks:
+            result = results[bench.name] = benchmarking.run(bench, options["rounds"])
+            previous = baseline.get(bench.name)
+            found = benchmarking.regressions(
+                result, previous, options["time_tolerance"], options["memory_tolerance"]
+            )
+            if found:
+                failed.append(bench.name)
+                comparison = self.style.ERROR("; ".join(found))
+            elif previous:
+                change = result.time_us / previous["time_us"] - 1
+                comparison = f"{change:+.0%}"
+            else:
+                comparison = "new"
+            self.stdout.write(
+                f"{bench.name:<36} {self.duration(result.time_us):>11} {result.queries:>8} "
+                f"{result.peak_kib:>7.1f}KiB {result.blocks:>7}  {comparison}"
+            )
+
+        if options["save"]:
+            benchmarking.save_baseline(options["baseline"], results)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+        if failed and options["check"]:
+            raise CommandError(f"Regressions in {', '.join(failed)}")
+
+    @staticmethod
+    def duration(microseconds: float) -> str:
+        if microseconds >= 1000:
+            return f"{microseconds / 1000:.2f}ms"
+        return f"{microseconds:.1f}us"
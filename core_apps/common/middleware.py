@@ -0,0 +1,45 @@
+"""
+Answers the orchestrator's probes before the rest of the middleware stack, so
+they never touch sessions, authentication or the URL resolver.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.http import HttpResponse, JsonResponse
+
+from .health import readiness
+
+LIVENESS_PATH = "/healthz"
+READINESS_PATH = "/readyz"
+
+
+class HealthProbeMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == LIVENESS_PATH:
+            return HttpResponse("ok", content_type="text/plain")
+        if request.path == READINESS_PATH:
+            return readiness_response(*readiness())
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path == LIVENESS_PATH:
+            return HttpResponse("ok", content_type="text/plain")
+        if request.path == READINESS_PATH:
+            # May wait on a check's timeout, keep that off the event loop
+            return readiness_response(*await sync_to_async(readiness, thread_sensitive=False)())
+        return await self.get_response(request)
+
+
+def readiness_response(ready, checks):
+    return JsonResponse(
+        {"status": "ok" if ready else "fail", "checks": checks},
+        status=200 if ready else 503,
+    )
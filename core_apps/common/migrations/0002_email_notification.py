@@ -0,0 +1,62 @@
+# Generated by Django 4.2.15 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailNotification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "recipient",
+                    models.EmailField(max_length=254, verbose_name="Recipient"),
+                ),
+                ("subject", models.CharField(max_length=255, verbose_name="Subject")),
+                (
+                    "template_name",
+                    models.CharField(max_length=100, verbose_name="Template"),
+                ),
+                ("html_body", models.TextField(verbose_name="HTML body")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("sent", "Sent"),
+                            ("failed", "Failed"),
+                        ],
+                        db_index=True,
+                        default="queued",
+                        max_length=10,
+                        verbose_name="Status",
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Error")),
+                (
+                    "sent_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Sent at"),
+                ),
+            ],
+            options={
+                "verbose_name": "Email Notification",
+                "verbose_name_plural": "Email Notifications",
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.15 on 2026-10-18 02:34
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # The index is built without locking the table against writes
+    atomic = False
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("common", "0002_email_notification"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContentViewDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_id", models.UUIDField(verbose_name="object id")),
+                ("day", models.DateField(verbose_name="Day")),
+                ("views", models.PositiveIntegerField(default=0, verbose_name="Views")),
+                (
+                    "unique_viewers",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Unique viewers"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Daily Content Views",
+                "verbose_name_plural": "Daily Content Views",
+            },
+        ),
+        migrations.CreateModel(
+            name="Watermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=100, unique=True, verbose_name="Name"),
+                ),
+                (
+                    "position",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Position"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="contentview",
+            name="counted_day",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name="contentview",
+            index=models.Index(fields=["updated_at"], name="content_view_updated_at"),
+        ),
+        migrations.AddField(
+            model_name="contentviewdaily",
+            name="content_type",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                to="contenttypes.contenttype",
+                verbose_name="content type",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="contentviewdaily",
+            constraint=models.UniqueConstraint(
+                fields=("content_type", "object_id", "day"),
+                name="unique_content_view_day",
+            ),
+        ),
+    ]
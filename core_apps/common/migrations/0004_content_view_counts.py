@@ -0,0 +1,23 @@
+# Generated by Django 4.2.15 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0003_content_view_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contentview",
+            name="counted_views",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="contentview",
+            name="view_count",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -1,11 +1,21 @@
+import hashlib
 import uuid
-from typing import Any, Optional
+from collections import Counter
+from contextlib import nullcontext
+from datetime import date, datetime
+from typing import Any, Iterable, Optional
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import IntegrityError, models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import F, Q, Sum
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from loguru import logger
+
+from .view_buffer import ViewEntry, get_view_buffer
+from .view_sketches import approx_unique_viewers, get_view_sketches
 
 User = get_user_model()
 
@@ -17,6 +27,27 @@ class TimeStampedModel(models.Model):
         # Tells django to not create a table for this model
         abstract = True 
 
+
+def _lock_viewers(keys: Iterable[tuple]) -> None:
+    """
+    Lock viewers' rows until the transaction ends, whether they exist or
+    not, in place of the unique constraint a partitioned table can't have.
+    """
+    ids = sorted(
+        {
+            int.from_bytes(
+                hashlib.blake2b("|".join(map(str, key)).encode(), digest_size=8).digest(),
+                "big",
+                signed=True,
+            )
+            for key in keys
+        }
+    )
+    with connection.cursor() as cursor:
+        # Taken in order, so concurrent flushes can't deadlock
+        cursor.execute("SELECT pg_advisory_xact_lock(id) FROM unnest(%s::bigint[]) AS id", [ids])
+
+
 class ContentView(TimeStampedModel):
     """
     Designed to track a single user's view of a content object
@@ -41,11 +72,21 @@ class ContentView(TimeStampedModel):
         blank=True
     )
     last_viewed = models.DateTimeField()
+    # Every view of this viewer, the daily rollup adds those since it last
+    # counted the row, and counts a viewer once per day (see rollups.py)
+    view_count = models.PositiveIntegerField(default=1, editable=False)
+    counted_views = models.PositiveIntegerField(default=0, editable=False)
+    counted_day = models.DateField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = _("Content View")
         verbose_name_plural = _("Content Views")
+        # Dropped from the database when the table is partitioned (see
+        # partitions.py), viewers are then kept unique by _lock_viewers. Write
+        # migrations altering it by hand for partitioned deployments
         unique_together = ("content_type", "object_id", "user", "viewer_ip")
+        # The rollup reads the rows changed since its watermark
+        indexes = [models.Index(fields=["updated_at"], name="content_view_updated_at")]
     
     def __str__(self) -> str:
         return (
@@ -56,18 +97,246 @@ class ContentView(TimeStampedModel):
     @classmethod
     def record_view(cls, content_object: Any, user: Optional[User], viewer_ip: Optional[str]) -> None:
         content_type = ContentType.objects.get_for_model(content_object)
+        user_id = getattr(user, "pk", None)
+        entry = ViewEntry(
+            content_type_id=content_type.pk,
+            object_id=cls._object_id(content_object),
+            user_id=user_id,
+            viewer_ip=viewer_ip,
+            viewed_at=timezone.now(),
+        )
         try:
-            view, created = cls.objects.get_or_create(
-                content_type=content_type,
-                object_id=content_object.id,
-                defaults={
-                    "user": user,
-                    "viewer_ip": viewer_ip,
-                    "last_viewed": timezone.now()
-                }
-            )
-            if not created:
-                view.last_viewed = timezone.now()
-                view.save()
+            get_view_sketches().add(entry)
+        except Exception as e:
+            # Approximate counts must not cost the view itself
+            logger.warning(f"Failed to add a content view to its sketches: {e}")
+
+        if settings.CONTENT_VIEW_INGESTION["MODE"] == "buffered":
+            # Write-behind: the flusher persists the view, the request does no queries
+            try:
+                get_view_buffer().push(entry)
+                return
+            except Exception as e:
+                # Written in the request instead, the view must not fail with the buffer
+                logger.warning(f"Failed to buffer a content view, writing it directly: {e}")
+
+        partitioned = settings.CONTENT_VIEW_PARTITIONING["ENABLED"]
+        try:
+            with transaction.atomic() if partitioned else nullcontext():
+                if partitioned:
+                    _lock_viewers([entry.key])
+                view, created = cls.objects.get_or_create(
+                    content_type=content_type,
+                    object_id=content_object.pk,
+                    user_id=user_id,
+                    viewer_ip=viewer_ip,
+                    defaults={"last_viewed": timezone.now()}
+                )
+                if not created:
+                    view.last_viewed = timezone.now()
+                    view.view_count = F("view_count") + 1
+                    view.save(update_fields=["last_viewed", "view_count", "updated_at"])
         except IntegrityError:
             pass
+
+    @classmethod
+    def approx_unique_viewers(cls, content_object: Any, since: Optional[date] = None) -> int:
+        """
+        About how many viewers ``content_object`` had since the day ``since``,
+        or ever, within 2.4% (see view_sketches.py). No queries once the
+        content type is cached.
+        """
+        if isinstance(since, datetime):
+            since = timezone.localdate(since)
+        content_type = ContentType.objects.get_for_model(content_object)
+        return approx_unique_viewers(content_type.pk, cls._object_id(content_object), since)
+
+    @classmethod
+    def _object_id(cls, content_object: Any) -> uuid.UUID:
+        # Integer primary keys are stored as the UUID of the number, buffered
+        # entries and sketches have to name the object the same way
+        return cls._meta.get_field("object_id").to_python(content_object.pk)
+
+    @classmethod
+    def bulk_record_views(cls, entries: list[ViewEntry]) -> None:
+        """
+        Persist a batch of buffered views, keeping the latest timestamp per viewer.
+        """
+        counts = Counter(entry.key for entry in entries)
+        latest: dict[tuple, ViewEntry] = {}
+        for entry in entries:
+            current = latest.get(entry.key)
+            if current is None or entry.viewed_at > current.viewed_at:
+                latest[entry.key] = entry
+
+        # Partitioned, the table has no unique constraint to upsert against
+        partitioned = settings.CONTENT_VIEW_PARTITIONING["ENABLED"]
+        keyed, anonymous = [], []
+        for entry in latest.values():
+            if partitioned or entry.user_id is None or entry.viewer_ip is None:
+                anonymous.append(entry)
+            else:
+                keyed.append(entry)
+
+        if keyed:
+            cls._upsert_views(keyed, counts)
+
+        if anonymous:
+            with transaction.atomic() if partitioned else nullcontext():
+                if partitioned:
+                    _lock_viewers(entry.key for entry in anonymous)
+                # NULLs never conflict in a unique index, and partitioned there is
+                # none, so match existing rows by hand
+                lookup = Q()
+                for entry in anonymous:
+                    lookup |= Q(
+                        content_type_id=entry.content_type_id,
+                        object_id=entry.object_id,
+                        user_id=entry.user_id,
+                        viewer_ip=entry.viewer_ip,
+                    )
+                existing = {
+                    (view.content_type_id, view.object_id, view.user_id, view.viewer_ip): view
+                    for view in cls.objects.filter(lookup)
+                }
+                now = timezone.now()
+                to_update, to_create = [], []
+                for entry in anonymous:
+                    view = existing.get(entry.key)
+                    if view is None:
+                        to_create.append(cls._from_entry(entry, counts[entry.key]))
+                        continue
+                    # Late entries still count, without moving last_viewed back
+                    view.last_viewed = max(view.last_viewed, entry.viewed_at)
+                    view.view_count += counts[entry.key]
+                    view.updated_at = now
+                    to_update.append(view)
+                if to_update:
+                    cls.objects.bulk_update(to_update, ["last_viewed", "view_count", "updated_at"])
+                if to_create:
+                    cls.objects.bulk_create(to_create)
+
+    @classmethod
+    def _upsert_views(cls, entries: list[ViewEntry], counts: Counter) -> None:
+        """
+        Insert or update the rows of keyed viewers in one statement, adding
+        up their views, which bulk_create(update_conflicts=True) can't do.
+        """
+        meta = cls._meta
+        key = ", ".join(
+            meta.get_field(name).column
+            for name in ("content_type", "object_id", "user", "viewer_ip")
+        )
+        now = timezone.now()
+        rows = [
+            (*entry.key, entry.viewed_at, counts[entry.key], 0, now, now) for entry in entries
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {meta.db_table} AS view "
+                f"({key}, last_viewed, view_count, counted_views, created_at, updated_at) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(rows))} "
+                f"ON CONFLICT ({key}) DO UPDATE SET "
+                "last_viewed = GREATEST(view.last_viewed, EXCLUDED.last_viewed), "
+                "view_count = view.view_count + EXCLUDED.view_count, "
+                "updated_at = EXCLUDED.updated_at",
+                [value for row in rows for value in row],
+            )
+
+    @classmethod
+    def _from_entry(cls, entry: ViewEntry, view_count: int = 1) -> "ContentView":
+        return cls(
+            content_type_id=entry.content_type_id,
+            object_id=entry.object_id,
+            user_id=entry.user_id,
+            viewer_ip=entry.viewer_ip,
+            last_viewed=entry.viewed_at,
+            view_count=view_count,
+        )
+
+
+class EmailNotification(TimeStampedModel):
+    """
+    A single outgoing email and its delivery status
+    """
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        SENT = "sent", _("Sent")
+        FAILED = "failed", _("Failed")
+
+    recipient = models.EmailField(_("Recipient"))
+    subject = models.CharField(_("Subject"), max_length=255)
+    template_name = models.CharField(_("Template"), max_length=100)
+    html_body = models.TextField(_("HTML body"))
+    status = models.CharField(
+        _("Status"),
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        db_index=True,
+    )
+    error = models.TextField(_("Error"), blank=True)
+    sent_at = models.DateTimeField(_("Sent at"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Email Notification")
+        verbose_name_plural = _("Email Notifications")
+
+    def __str__(self) -> str:
+        return f"{self.subject} to {self.recipient} ({self.get_status_display()})"
+
+
+class ContentViewDailyQuerySet(models.QuerySet):
+    def for_object(self, content_object: Any) -> "ContentViewDailyQuerySet":
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(content_object),
+            object_id=content_object.pk,
+        )
+
+    def between(self, start: date, end: date) -> "ContentViewDailyQuerySet":
+        """Days from ``start`` to ``end``, both included"""
+        return self.filter(day__range=(start, end))
+
+    def totals(self) -> dict[str, int]:
+        totals = self.aggregate(views=Sum("views"), viewer_days=Sum("unique_viewers"))
+        return {key: value or 0 for key, value in totals.items()}
+
+
+class ContentViewDaily(models.Model):
+    """
+    Views of a content object per day, maintained from ContentView by
+    ``common.rollup_content_views``. Dashboards read these, never the raw
+    table.
+    """
+
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, verbose_name=_("content type")
+    )
+    object_id = models.UUIDField(verbose_name=_("object id"))
+    day = models.DateField(_("Day"))
+    views = models.PositiveIntegerField(_("Views"), default=0)
+    unique_viewers = models.PositiveIntegerField(_("Unique viewers"), default=0)
+
+    objects = ContentViewDailyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Daily Content Views")
+        verbose_name_plural = _("Daily Content Views")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_type", "object_id", "day"], name="unique_content_view_day"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.content_type} {self.object_id} on {self.day}: {self.views} views"
+
+
+class Watermark(models.Model):
+    """How far an incremental job has processed its source, by job name"""
+
+    name = models.CharField(_("Name"), max_length=100, unique=True)
+    position = models.DateTimeField(_("Position"), null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} at {self.position}"
@@ -0,0 +1,187 @@
+"""
+Email notification dispatch.
+
+Messages are rendered from cached compiled templates, stored as
+``EmailNotification`` rows and sent in chunks, each chunk over a single SMTP
+connection. A context shared by many recipients is rendered only once, so bulk
+notifications cost one render and one connection per chunk instead of one
+template render, one Celery task and one SMTP handshake per recipient.
+
+When ``EMAIL_BACKEND`` is djcelery_email's backend, chunks are sent by the
+``send_email_chunk`` task through ``CELERY_EMAIL_BACKEND``, retried with
+backoff while the mail server can't be reached. Any other backend (console,
+locmem in tests) is used inline, once. A chunk whose connection fails on its
+last attempt is marked failed rather than failing the request that sent it.
+
+Bodies are only kept until the message is sent or given up on: they may hold
+OTP codes, which must not outlive their TTL.
+"""
+import smtplib
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import strip_tags
+from loguru import logger
+
+from .models import EmailNotification
+
+CELERY_EMAIL_BACKEND = "djcelery_email.backends.CeleryEmailBackend"
+
+# Errors that lose the connection, not just one message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class EmailConnectionError(Exception):
+    """The mail server couldn't be reached, unsent notifications are still queued"""
+
+
+@lru_cache(maxsize=None)
+def _compiled_template(template_name: str) -> Any:
+    return get_template(template_name)
+
+
+def render_email(template_name: str, context: dict[str, Any]) -> str:
+    return _compiled_template(template_name).render(context)
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterable[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def queue_email(
+    template_name: str, subject: str, recipient: str, context: dict[str, Any]
+) -> EmailNotification:
+    notification = EmailNotification.objects.create(
+        recipient=recipient,
+        subject=subject,
+        template_name=template_name,
+        html_body=render_email(template_name, context),
+    )
+    dispatch([notification.pk])
+    return notification
+
+
+def queue_bulk_email(
+    template_name: str,
+    subject: str,
+    recipients: Iterable[str],
+    context: Optional[dict[str, Any]] = None,
+    context_for: Optional[Callable[[str], dict[str, Any]]] = None,
+) -> int:
+    """
+    Queue one email per recipient and return how many were queued.
+    ``context`` is shared by every recipient and rendered once;
+    ``context_for(recipient)`` adds per-recipient values and makes each
+    message render on its own.
+    """
+    context = context or {}
+    shared_body = render_email(template_name, context) if context_for is None else None
+    queued = 0
+
+    for chunk in _chunks(recipients, settings.NOTIFICATIONS["CHUNK_SIZE"]):
+        notifications = EmailNotification.objects.bulk_create(
+            [
+                EmailNotification(
+                    recipient=recipient,
+                    subject=subject,
+                    template_name=template_name,
+                    html_body=(
+                        shared_body
+                        if context_for is None
+                        else render_email(template_name, {**context, **context_for(recipient)})
+                    ),
+                )
+                for recipient in chunk
+            ]
+        )
+        dispatch([notification.pk for notification in notifications])
+        queued += len(notifications)
+    return queued
+
+
+def dispatch(notification_ids: list[int]) -> None:
+    if settings.EMAIL_BACKEND == CELERY_EMAIL_BACKEND:
+        from .tasks import send_email_chunk
+
+        transaction.on_commit(lambda: send_email_chunk.delay(notification_ids))
+    else:
+        deliver(notification_ids, settings.EMAIL_BACKEND)
+
+
+def deliver(notification_ids: list[int], backend: str, final: bool = True) -> dict[str, int]:
+    """
+    Send the queued notifications over one connection and record the outcome
+    of every message. When the connection fails, the notifications not sent
+    yet are marked failed on the ``final`` attempt, otherwise they stay
+    queued and ``EmailConnectionError`` is raised for the caller to retry.
+    """
+    notifications = list(
+        EmailNotification.objects.filter(
+            pk__in=notification_ids, status=EmailNotification.Status.QUEUED
+        )
+    )
+    plain_bodies: dict[str, str] = {}
+    sent, failed = [], {}
+    connection_error = None
+
+    connection = get_connection(backend=backend)
+    try:
+        connection.open()
+        for notification in notifications:
+            body = notification.html_body
+            if body not in plain_bodies:
+                # Some email clients can’t or won’t render HTML emails properly
+                plain_bodies[body] = strip_tags(body)
+            email = EmailMultiAlternatives(
+                notification.subject,
+                plain_bodies[body],
+                settings.DEFAULT_FROM_EMAIL,
+                [notification.recipient],
+                connection=connection,
+            )
+            email.attach_alternative(body, "text/html")
+            try:
+                email.send()
+                sent.append(notification.pk)
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to send {notification}: Error: {e}")
+                failed[notification.pk] = str(e)
+    except Exception as e:
+        connection_error = e
+        logger.error(
+            f"Email connection failed after {len(sent) + len(failed)} of "
+            f"{len(notifications)} emails: {e}"
+        )
+    finally:
+        connection.close()
+
+    unsent = [
+        notification.pk
+        for notification in notifications
+        if notification.pk not in sent and notification.pk not in failed
+    ]
+    if connection_error is not None and final:
+        failed.update(dict.fromkeys(unsent, f"Connection failed: {connection_error}"))
+
+    if sent:
+        EmailNotification.objects.filter(pk__in=sent).update(
+            status=EmailNotification.Status.SENT, sent_at=timezone.now(), html_body=""
+        )
+    for pk, error in failed.items():
+        EmailNotification.objects.filter(pk=pk).update(
+            status=EmailNotification.Status.FAILED, error=error, html_body=""
+        )
+    logger.info(f"Sent {len(sent)} emails, {len(failed)} failed")
+    if connection_error is not None and not final:
+        raise EmailConnectionError(str(connection_error)) from connection_error
+    return {"sent": len(sent), "failed": len(failed)}
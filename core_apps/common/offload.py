@@ -0,0 +1,42 @@
+"""
+Bounded thread pool for blocking work started from async views.
+
+Password hashing and email delivery would stall the event loop, and run
+through ``sync_to_async`` they would queue behind every ORM call on Django's
+single thread-sensitive executor. They run here instead, on at most
+``ASYNC_OFFLOAD["MAX_WORKERS"]`` threads: argon2 releases the GIL, so hashes
+really run in parallel, and a burst of logins queues instead of spawning
+threads without limit.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connections
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_OFFLOAD["MAX_WORKERS"], thread_name_prefix="offload"
+)
+
+
+def _run(func: Callable, args: tuple, kwargs: dict) -> Any:
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool threads never see request_finished, close what the job opened
+        # rather than keep idle persistent connections in every thread. With
+        # the pooled database engine this just hands them back to the pool.
+        connections.close_all()
+
+
+async def offload(func: Callable, *args, **kwargs) -> Any:
+    """Run ``func`` on the pool and wait for its result without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    # Keep contextvars (request metrics) visible to the job
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor, functools.partial(context.run, _run, func, args, kwargs)
+    )
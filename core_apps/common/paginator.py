@@ -0,0 +1,37 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large tables. An unfiltered queryset is counted with
+    the planner's row estimate from ``pg_class`` instead of ``COUNT(*)``,
+    which has to scan the whole table. Filtered querysets and small tables
+    still get an exact count.
+    """
+
+    # Below this estimate an exact count is cheap enough
+    exact_count_threshold = 100_000
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if getattr(queryset, "query", None) is not None and not queryset.query.where:
+            estimate = self.estimated_count(queryset)
+            if estimate >= self.exact_count_threshold:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimated_count(queryset) -> int:
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return -1
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else -1
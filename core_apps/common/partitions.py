@@ -0,0 +1,191 @@
+"""
+Monthly partitions of the ContentView table.
+
+With ``CONTENT_VIEW_PARTITIONING["ENABLED"]``, ``common_contentview`` is a
+Postgres table partitioned by range of ``created_at``, one partition per
+month. Queries filtered on ``created_at`` only read the matching months, and
+expired months are detached, then dropped, instead of being deleted row by
+row.
+
+``convert`` switches the existing table over, once (``partition_content_views
+--convert``): it becomes the first partition, holding every month up to the
+next one. The indexes it needs are built beforehand without blocking
+writes, so the table is only locked for the catalog changes.
+``maintain_partitions`` (``common.maintain_content_view_partitions``) then
+creates the partitions of the coming ``PREMAKE_MONTHS`` months and expires
+those older than ``RETENTION_MONTHS``.
+
+A unique constraint on a partitioned table has to include ``created_at``, so
+viewers are no longer unique in the database: ``ContentView`` matches them
+by hand, as it does for anonymous viewers, holding an advisory lock on each
+viewer while it does, and ``Meta.unique_together`` no longer matches the
+schema. A viewer's row stays in the month of its first view, and is dropped
+with it. The daily rollups have counted it by then. Postgres can't build indexes concurrently on a partitioned table,
+migrations adding one to ContentView have to build them per partition.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from loguru import logger
+
+from .models import ContentView
+
+TABLE = ContentView._meta.db_table
+LEGACY = f"{TABLE}_legacy"
+
+
+def _month(moment: datetime, offset: int = 0) -> datetime:
+    """The start of the month ``offset`` months from the one of ``moment``"""
+    local = timezone.localtime(moment)
+    months = local.year * 12 + local.month - 1 + offset
+    return local.replace(
+        year=months // 12, month=months % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def _concurrently() -> str:
+    # Only possible outside a transaction, not in tests
+    return "" if connection.in_atomic_block else " CONCURRENTLY"
+
+
+def is_partitioned() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def partitions() -> dict[str, Optional[datetime]]:
+    """The partitions, by name, with the end of their range"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+    ends = {}
+    for name, bound in rows:
+        end = re.search(r"TO \('([^']+)'\)", bound)
+        ends[name] = datetime.fromisoformat(end.group(1)) if end else None
+    return ends
+
+
+def convert(now: Optional[datetime] = None) -> None:
+    """Partition the ContentView table, keeping its rows in a first partition"""
+    now = now or timezone.now()
+    # Leave a day's margin for the rows written while converting
+    end = _month(now + timedelta(days=1), 1)
+    with connection.cursor() as cursor:
+        # Indexes matching those of the partitioned table, and a constraint
+        # proving the rows fit the partition, so attaching it scans nothing
+        cursor.execute(
+            f"CREATE UNIQUE INDEX{_concurrently()} IF NOT EXISTS {LEGACY}_key "
+            f"ON {TABLE} (id, created_at)"
+        )
+        cursor.execute(
+            f"CREATE INDEX{_concurrently()} IF NOT EXISTS {LEGACY}_viewer "
+            f"ON {TABLE} (content_type_id, object_id, user_id, viewer_ip)"
+        )
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {LEGACY}_bound "
+            "CHECK (created_at < %s) NOT VALID",
+            [end],
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} VALIDATE CONSTRAINT {LEGACY}_bound")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT LIKE %s",
+            [TABLE, f"{LEGACY}%"],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')",
+            [TABLE],
+        )
+        constraints = cursor.fetchall()
+        unique = {name for name, kind, _ in constraints if kind in ("p", "u")}
+        cursor.execute(f"SELECT coalesce(max(id), 0) + 1 FROM {TABLE}")
+        next_id = cursor.fetchone()[0]
+
+        # The existing table becomes the first partition, under its old index names
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        for name in unique:
+            cursor.execute(f"ALTER TABLE {TABLE} DROP CONSTRAINT {name}")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {LEGACY}_pkey "
+            f"PRIMARY KEY USING INDEX {LEGACY}_key"
+        )
+        for name, _ in indexes:
+            if name not in unique:
+                cursor.execute(f"ALTER INDEX {name} RENAME TO {name[:56]}_legacy")
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY}")
+
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {LEGACY} INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        sequence = f"{TABLE}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {sequence} START %s OWNED BY {TABLE}.id", [next_id])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, created_at)"
+        )
+        for name, kind, definition in constraints:
+            if kind == "f":
+                cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+        for name, definition in indexes:
+            if name != f"{TABLE}_pkey":
+                # Viewers can't be unique any more, see above
+                cursor.execute(definition.replace("CREATE UNIQUE INDEX", "CREATE INDEX"))
+
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY} FOR VALUES FROM (MINVALUE) TO (%s)",
+            [end],
+        )
+        cursor.execute(f"ALTER TABLE {LEGACY} DROP CONSTRAINT {LEGACY}_bound")
+    logger.info(f"Partitioned {TABLE}, rows before {end:%Y-%m-%d} are in {LEGACY}")
+
+
+def maintain_partitions(now: Optional[datetime] = None) -> dict[str, list[str]]:
+    """Create the coming months' partitions and expire the old ones"""
+    options = settings.CONTENT_VIEW_PARTITIONING
+    now = now or timezone.now()
+    existing = partitions()
+    done = {"created": [], "detached": [], "dropped": []}
+
+    start = max([end for end in existing.values() if end], default=_month(now))
+    with connection.cursor() as cursor:
+        while start < _month(now, options["PREMAKE_MONTHS"] + 1):
+            end = _month(start, 1)
+            name = f"{TABLE}_y{start:%Y}m{start:%m}"
+            cursor.execute(
+                f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+            done["created"].append(name)
+            start = end
+
+        # Expired once every view in them is older than the retention
+        cutoff = _month(now, -options["RETENTION_MONTHS"])
+        for name, end in sorted(existing.items()):
+            if end is None or end > cutoff:
+                continue
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}{_concurrently()}")
+            done["detached"].append(name)
+            if options["EXPIRED"] == "drop":
+                cursor.execute(f"DROP TABLE {name}")
+                done["dropped"].append(name)
+    for action, names in done.items():
+        if names:
+            logger.info(f"ContentView partitions {action}: {', '.join(names)}")
+    return done
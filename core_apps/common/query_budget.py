@@ -0,0 +1,274 @@
+"""
+Query budgets: the most queries, and optionally database time, an endpoint or
+a model method may spend.
+
+Budgets are declared next to the code they cover:
+
+    class MyProfileView(AuthenticatedView):
+        @query_budget(2)
+        async def get(self, request): ...
+
+    class Profile(TimeStampedModel):
+        @query_budget(3)
+        def save(self, *args, **kwargs): ...
+
+A view handler's budget covers the whole request, middleware and
+authentication included (``QueryBudgetMiddleware``), any other function's
+budget covers its call, signal receivers included. ``limit_queries`` budgets
+a block of code.
+
+Budgets are only enforced when ``QUERY_BUDGETS["ENFORCE"]`` is on, as it is
+for the tests (see test_runner.py): a breach raises
+``QueryBudgetExceeded``, listing every query of the scope and the project
+code it came from. Otherwise they cost nothing. Every URL declares a budget
+unless it matches ``QUERY_BUDGETS["EXEMPT_URLS"]``, see ``unbudgeted_urls``.
+"""
+import functools
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from typing import Callable, Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import URLPattern, URLResolver, get_resolver
+
+# Frames of these modules never tell where a query was made
+_SKIPPED_ORIGINS = ("common/query_budget.py", "common/instrumentation.py", "manage.py")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass(frozen=True)
+class Budget:
+    name: str
+    queries: int
+    db_time: Optional[float] = None  # seconds
+
+
+@dataclass
+class CapturedQuery:
+    sql: str
+    duration: float
+    origin: list[traceback.FrameSummary]
+
+
+@dataclass
+class Scope:
+    """The queries made while a budget applies"""
+
+    budget: Optional[Budget]
+    label: str
+    queries: list[CapturedQuery] = field(default_factory=list)
+
+    @property
+    def db_time(self) -> float:
+        return sum(query.duration for query in self.queries)
+
+    def breaches(self) -> list[str]:
+        if self.budget is None:
+            return []
+        found = []
+        if len(self.queries) > self.budget.queries:
+            found.append(f"{len(self.queries)} queries (budget {self.budget.queries})")
+        if self.budget.db_time is not None and self.db_time > self.budget.db_time:
+            found.append(
+                f"{self.db_time * 1000:.1f}ms in the database "
+                f"(budget {self.budget.db_time * 1000:.1f}ms)"
+            )
+        return found
+
+    def check(self) -> None:
+        if found := self.breaches():
+            raise QueryBudgetExceeded(self.report(found))
+
+    def report(self, breaches: list[str]) -> str:
+        lines = [f"{self.label} took {' and '.join(breaches)}:"]
+        for number, query in enumerate(self.queries, 1):
+            sql = query.sql if len(query.sql) <= 500 else f"{query.sql[:500]}..."
+            lines.append(f"{number:>3}. ({query.duration * 1000:.1f}ms) {sql}")
+            lines.extend(
+                f"       {frame.filename}:{frame.lineno} in {frame.name}"
+                for frame in query.origin
+            )
+        return "\n".join(lines)
+
+
+_scopes: ContextVar[tuple[Scope, ...]] = ContextVar("query_budget_scopes", default=())
+
+
+def enforced() -> bool:
+    return settings.QUERY_BUDGETS["ENFORCE"]
+
+
+@contextmanager
+def _measure(scope: Scope) -> Iterator[Scope]:
+    token = _scopes.set((*_scopes.get(), scope))
+    try:
+        yield scope
+    finally:
+        _scopes.reset(token)
+    # Only reached without an exception, which matters more than the queries
+    scope.check()
+
+
+@contextmanager
+def limit_queries(
+    queries: int, db_time: Optional[float] = None, name: str = "block"
+) -> Iterator[Optional[Scope]]:
+    """Budget the queries of a block of code"""
+    if not enforced():
+        yield None
+        return
+    with _measure(Scope(Budget(name, queries, db_time), name)) as scope:
+        yield scope
+
+
+def _origin() -> list[traceback.FrameSummary]:
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and not frame.filename.endswith(_SKIPPED_ORIGINS)
+    ]
+    # The innermost project frames are where the query was made
+    return frames[-3:]
+
+
+def record_query(execute, sql, params, many, context):
+    scopes = _scopes.get()
+    if not scopes:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        query = CapturedQuery(sql, time.perf_counter() - start, _origin())
+        for scope in scopes:
+            scope.queries.append(query)
+
+
+def query_budget(queries: int, db_time: Optional[float] = None) -> Callable:
+    """
+    Budget a function, method or view handler, sync or async, to ``queries``
+    queries and ``db_time`` seconds in the database per call.
+    """
+
+    def decorate(func: Callable) -> Callable:
+        budget = Budget(func.__qualname__, queries, db_time)
+
+        def measured() -> bool:
+            # A handler is already measured with its request by the middleware
+            return enforced() and all(scope.budget is not budget for scope in _scopes.get())
+
+        if iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not measured():
+                    return await func(*args, **kwargs)
+                with _measure(Scope(budget, budget.name)):
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not measured():
+                    return func(*args, **kwargs)
+                with _measure(Scope(budget, budget.name)):
+                    return func(*args, **kwargs)
+
+        wrapper.query_budget = budget
+        return wrapper
+
+    return decorate
+
+
+def view_budget(view: Callable, method: str) -> Optional[Budget]:
+    """The budget of the function or class-based view's handler for ``method``"""
+    view_class = getattr(view, "view_class", None)
+    if view_class is not None:
+        view = getattr(view_class, method.lower(), None)
+    return getattr(view, "query_budget", None)
+
+
+class QueryBudgetMiddleware:
+    """Holds each request to the budget of the view handling it"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enforced():
+            return self.get_response(request)
+        with _measure(self.scope(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not enforced():
+            return await self.get_response(request)
+        with _measure(self.scope(request)):
+            return await self.get_response(request)
+
+    @staticmethod
+    def scope(request) -> Scope:
+        # Its budget is known once the URL is resolved, see process_view
+        request.query_budget_scope = Scope(None, f"{request.method} {request.path}")
+        return request.query_budget_scope
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        scope = getattr(request, "query_budget_scope", None)
+        if scope is not None:
+            scope.budget = view_budget(view_func, request.method)
+        return None
+
+
+def _endpoints(
+    patterns: list, prefix: str = "", namespace: str = ""
+) -> Iterator[tuple[str, str, Callable]]:
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            inner = f"{namespace}{pattern.namespace}:" if pattern.namespace else namespace
+            yield from _endpoints(pattern.url_patterns, prefix + str(pattern.pattern), inner)
+        elif isinstance(pattern, URLPattern):
+            route = prefix + str(pattern.pattern)
+            yield route, f"{namespace}{pattern.name or route}", pattern.callback
+
+
+def unbudgeted_urls() -> list[str]:
+    """Routes, not exempt, with a view handler that has no budget"""
+    exempt = settings.QUERY_BUDGETS["EXEMPT_URLS"]
+    missing = []
+    for route, name, view in _endpoints(get_resolver().url_patterns):
+        if any(fnmatch(name, pattern) for pattern in exempt):
+            continue
+        view_class = getattr(view, "view_class", None)
+        if view_class is None:
+            methods = ["get"]
+        else:
+            methods = [
+                method
+                for method in view_class.http_method_names
+                if method != "options" and hasattr(view_class, method)
+            ]
+        missing.extend(
+            f"{method.upper()} {route} ({name})"
+            for method in methods
+            if view_budget(view, method) is None
+        )
+    return missing
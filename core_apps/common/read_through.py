@@ -0,0 +1,144 @@
+"""
+Read-through caching of values derived from the database.
+
+``ReadThroughCache`` keeps what a loader returns for an id in the default
+cache. Like the user cache, invalidation replaces a version stamp (see
+cache_versions.py), read in the same round trip as the entry: an entry
+written by a load that raced with an invalidation carries the old stamp and
+is never served. When the cache can't be reached, values are loaded straight
+from the database.
+
+Two things keep a popular key from sending every worker to the database at
+once. An entry is refreshed a little before it expires, by a single worker
+and more likely the closer expiry is and the longer the load takes
+("probabilistic early expiration"), and a missing entry is loaded under a
+short lock while other workers wait for it.
+
+Lookups are counted in ``read_through_cache_lookups``, by cache and result,
+and load times observed in ``read_through_cache_load_seconds``.
+"""
+import math
+import random
+import time
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from loguru import logger
+from prometheus_client import Counter, Histogram
+
+from .cache_versions import current_version, replace_versions
+
+LOOKUPS = Counter(
+    "read_through_cache_lookups",
+    "Read-through cache lookups: hit, miss, early_refresh, waited (served "
+    "the entry another worker loaded) or unavailable (loaded without the cache)",
+    ["cache", "result"],
+)
+LOAD_DURATION = Histogram(
+    "read_through_cache_load_seconds",
+    "Time spent loading cache entries from the database",
+    ["cache"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+
+class ReadThroughCache:
+    def __init__(self, name: str, loader: Callable[[Any], Any]) -> None:
+        self.name = name
+        self.loader = loader
+
+    @property
+    def options(self) -> dict[str, Any]:
+        return settings.READ_THROUGH_CACHE
+
+    def _key(self, key_id: Any, part: str = "") -> str:
+        return f"{self.options['KEY_PREFIX']}:{self.name}{part}:{key_id}"
+
+    def get(self, key_id: Any) -> Any:
+        """The loader's value for ``key_id``, from the cache when possible"""
+        key, version_key = self._key(key_id), self._key(key_id, ":version")
+        try:
+            values = cache.get_many([key, version_key])
+            version = values.get(version_key) or current_version(version_key)
+
+            entry = values.get(key)
+            if entry is not None and entry["version"] == version:
+                if not self._expires_early(entry) or not self._lock(key_id):
+                    LOOKUPS.labels(self.name, "hit").inc()
+                    return entry["value"]
+                LOOKUPS.labels(self.name, "early_refresh").inc()
+                return self._load(key_id, version, locked=True)
+
+            locked = self._lock(key_id)
+            if not locked:
+                entry = self._wait_for(key, version)
+                if entry is not None:
+                    LOOKUPS.labels(self.name, "waited").inc()
+                    return entry["value"]
+        except Exception as e:
+            logger.warning(f"{self.name} cache skipped, Redis unavailable: {e}")
+            LOOKUPS.labels(self.name, "unavailable").inc()
+            return self.loader(key_id)
+        LOOKUPS.labels(self.name, "miss").inc()
+        return self._load(key_id, version, locked)
+
+    def invalidate(self, key_ids: Iterable[Any]) -> None:
+        key_ids = list(key_ids)
+        if not key_ids:
+            return
+        try:
+            replace_versions(self._key(key_id, ":version") for key_id in key_ids)
+            cache.delete_many([self._key(key_id) for key_id in key_ids])
+        except Exception as e:
+            # Other processes may serve the old values until they expire
+            logger.error(f"Failed to invalidate {self.name} cache entries, Redis unavailable: {e}")
+
+    def _expires_early(self, entry: dict) -> bool:
+        # XFetch: -log(random) is usually small, rarely large, so a refresh
+        # gets likelier as expiry nears, earlier for entries slow to load
+        beta = self.options["EARLY_REFRESH_BETA"]
+        return time.time() - entry["delta"] * beta * math.log(1 - random.random()) >= (
+            entry["expires"]
+        )
+
+    def _lock(self, key_id: Any) -> bool:
+        return cache.add(self._key(key_id, ":lock"), 1, timeout=self.options["LOCK_TIMEOUT"])
+
+    def _wait_for(self, key: str, version: str) -> dict | None:
+        deadline = time.monotonic() + self.options["LOCK_WAIT"]
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            entry = cache.get(key)
+            if entry is not None and entry["version"] == version:
+                return entry
+        # The loading worker is slow or gone, load it ourselves
+        return None
+
+    def _load(self, key_id: Any, version: str, locked: bool) -> Any:
+        try:
+            start = time.monotonic()
+            value = self.loader(key_id)
+            delta = time.monotonic() - start
+            LOAD_DURATION.labels(self.name).observe(delta)
+
+            timeout = self.options["TIMEOUT"]
+            entry = {
+                "value": value,
+                "version": version,
+                "delta": delta,
+                "expires": time.time() + timeout,
+            }
+            try:
+                # Kept a little past its expiry, for the refresh to happen early
+                cache.set(self._key(key_id), entry, timeout + self.options["LOCK_TIMEOUT"])
+            except Exception as e:
+                logger.warning(f"{self.name} {key_id} not cached, Redis unavailable: {e}")
+            return value
+        finally:
+            if locked:
+                try:
+                    cache.delete(self._key(key_id, ":lock"))
+                except Exception as e:
+                    # The lock expires after LOCK_TIMEOUT
+                    logger.warning(f"Failed to release the {self.name} {key_id} lock: {e}")
@@ -0,0 +1,105 @@
+"""
+Daily rollups of content views.
+
+ContentView keeps one row per viewer of an object, with the last time they
+viewed it and how many times (``view_count``). ``rollup_content_views``
+folds the rows changed since its last run into ContentViewDaily: the views
+added since the row was last counted (``counted_views``) go to the day of
+``last_viewed``, and the viewer is a new unique viewer of that day unless
+the row was already counted on it (``counted_day``). Every view is counted
+once, however often the rollup runs. Only the day is approximate: the views
+a viewer made either side of midnight between two runs all go to the second
+day, and the first day misses that viewer.
+
+A run reads the rows whose ``updated_at`` is past the watermark and older
+than ``LAG`` seconds, so rows of transactions still in flight are left for
+the next run, ``WINDOW`` seconds of changes at a time. Each window is folded
+with one statement and committed with the watermark, whose row lock keeps
+runs from overlapping. The sketches of view_sketches.py are a faster,
+approximate read of the same views, never a source of the rollups.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import ContentView, ContentViewDaily, Watermark
+
+WATERMARK = "content_view_daily"
+
+
+def _fold(since: Optional[datetime], until: datetime) -> int:
+    views, daily = ContentView._meta, ContentViewDaily._meta
+    names = (
+        "content_type",
+        "object_id",
+        "last_viewed",
+        "updated_at",
+        "view_count",
+        "counted_views",
+        "counted_day",
+    )
+    content_type, object_id, last_viewed, updated_at, view_count, counted_views, counted_day = (
+        views.get_field(name).column for name in names
+    )
+    key = f"{daily.get_field('content_type').column}, {daily.get_field('object_id').column}, day"
+    # Days start at midnight in TIME_ZONE
+    day = f"(view.{last_viewed} AT TIME ZONE %(tz)s)::date"
+    window = f"{updated_at} <= %(until)s"
+    if since is not None:
+        window += f" AND {updated_at} > %(since)s"
+
+    with connection.cursor() as cursor:
+        # Rows are counted and marked counted in one statement: a view landing
+        # meanwhile waits for the row lock, then leaves the window
+        cursor.execute(
+            "WITH changed AS ("
+            f"SELECT id, {counted_views}, {counted_day} FROM {views.db_table} "
+            f"WHERE {window} FOR UPDATE"
+            "), folded AS ("
+            f"UPDATE {views.db_table} AS view "
+            f"SET {counted_views} = view.{view_count}, {counted_day} = {day} "
+            "FROM changed WHERE view.id = changed.id "
+            f"RETURNING view.{content_type}, view.{object_id}, {day} AS day, "
+            f"view.{view_count} - changed.{counted_views} AS views, "
+            f"changed.{counted_day} IS DISTINCT FROM {day} AS new_viewer"
+            ") "
+            f"INSERT INTO {daily.db_table} AS daily ({key}, views, unique_viewers) "
+            f"SELECT {content_type}, {object_id}, day, sum(views), "
+            "count(*) FILTER (WHERE new_viewer) FROM folded GROUP BY 1, 2, 3 "
+            f"ON CONFLICT ({key}) DO UPDATE SET "
+            "views = daily.views + EXCLUDED.views, "
+            "unique_viewers = daily.unique_viewers + EXCLUDED.unique_viewers",
+            {"tz": settings.TIME_ZONE, "since": since, "until": until},
+        )
+        return cursor.rowcount
+
+
+def rollup_content_views(now: Optional[datetime] = None) -> int:
+    """Fold the views changed since the last run in, return how many rollups changed"""
+    options = settings.CONTENT_VIEW_ROLLUPS
+    cutoff = (now or timezone.now()) - timedelta(seconds=options["LAG"])
+    folded = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = Watermark.objects.select_for_update().get_or_create(name=WATERMARK)
+            since = watermark.position
+            if since is not None and since >= cutoff:
+                return folded
+            changes = ContentView.objects.filter(updated_at__lte=cutoff)
+            if since is not None:
+                changes = changes.filter(updated_at__gt=since)
+            first = changes.aggregate(first=Min("updated_at"))["first"]
+            # Quiet periods are skipped in one step
+            if first is None:
+                until = cutoff
+            else:
+                until = min(first + timedelta(seconds=options["WINDOW"]), cutoff)
+                folded += _fold(since, until)
+            watermark.position = until
+            watermark.save(update_fields=["position"])
+        if until >= cutoff:
+            return folded
@@ -0,0 +1,24 @@
+from typing import Any, Type
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.base import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core_apps.common import user_cache
+from core_apps.common import query_budget
+from core_apps.common.instrumentation import record_query
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender: Type[Model], instance: Model, **kwargs: Any) -> None:
+    user_cache.invalidate_user_on_commit(instance.pk)
+
+
+@receiver(connection_created)
+def instrument_connection(sender: Any, connection: Any, **kwargs: Any) -> None:
+    # Counts queries into the current request's metrics and query budgets, if
+    # any. The wrappers outlive their connections, install them once
+    for wrapper in (record_query, query_budget.record_query):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
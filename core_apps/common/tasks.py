@@ -0,0 +1,50 @@
+from celery import shared_task
+from django.conf import settings
+from djcelery_email.conf import settings as celery_email_settings
+from loguru import logger
+
+from .notifications import EmailConnectionError, deliver
+from .partitions import maintain_partitions
+from .rollups import rollup_content_views as fold_content_views
+from .view_buffer import flush_view_buffer
+
+
+@shared_task(name="common.flush_content_views", ignore_result=True)
+def flush_content_views() -> int:
+    """Drain the shared content view buffer into the database"""
+    flushed = flush_view_buffer()
+    if flushed:
+        logger.info(f"Flushed {flushed} buffered content views")
+    return flushed
+
+
+@shared_task(name="common.rollup_content_views", ignore_result=True)
+def rollup_content_views() -> int:
+    """Fold the content views changed since the last run into the daily rollups"""
+    folded = fold_content_views()
+    if folded:
+        logger.info(f"Updated {folded} daily content view rollups")
+    return folded
+
+
+@shared_task(name="common.maintain_content_view_partitions", ignore_result=True)
+def maintain_content_view_partitions() -> None:
+    """Create the coming months' ContentView partitions, expire the old ones"""
+    if settings.CONTENT_VIEW_PARTITIONING["ENABLED"]:
+        maintain_partitions()
+
+
+@shared_task(
+    name="common.send_email_chunk",
+    bind=True,
+    autoretry_for=(EmailConnectionError,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def send_email_chunk(self, notification_ids: list[int]) -> dict[str, int]:
+    """Send a chunk of queued notifications over a single SMTP connection"""
+    return deliver(
+        notification_ids,
+        celery_email_settings.CELERY_EMAIL_BACKEND,
+        final=self.request.retries >= self.max_retries,
+    )
@@ -0,0 +1,17 @@
+from typing import Any
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+    """Runs the tests with query budgets enforced"""
+
+    def setup_test_environment(self, **kwargs: Any) -> None:
+        super().setup_test_environment(**kwargs)
+        self._query_budgets = settings.QUERY_BUDGETS
+        settings.QUERY_BUDGETS = {**self._query_budgets, "ENFORCE": True}
+
+    def teardown_test_environment(self, **kwargs: Any) -> None:
+        settings.QUERY_BUDGETS = self._query_budgets
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,858 @@
+import logging
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import replace
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
+from loguru import logger
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core_apps.user_auth.models import CustomUser
+from core_apps.user_auth.tests import make_user, redis_available
+from core_apps.user_profile.models import Profile
+from core_apps.user_profile.views import MyProfileView
+from interceptor import QueueFileSink, SamplingFilter, build_logging
+
+from . import (
+    benchmarking,
+    health,
+    partitions,
+    query_budget,
+    read_through,
+    rollups,
+    throttling,
+    user_cache,
+    view_sketches,
+)
+from .instrumentation import RequestMetrics, current_metrics
+from .cookie_auth import CookieAuth
+from .db.base import DatabaseWrapper as PooledDatabaseWrapper
+from .models import ContentView, ContentViewDaily, EmailNotification
+from .notifications import EmailConnectionError, deliver, queue_bulk_email, queue_email
+from .view_buffer import LocalViewBuffer, RedisViewBuffer, ViewEntry, flush_view_buffer
+
+
+class CookieAuthUserCacheTests(TestCase):
+    def setUp(self):
+        user_cache.reset()
+        self.user = make_user()
+        self.request = APIRequestFactory().get("/")
+        self.request.COOKIES[settings.COOKIE_NAME] = str(AccessToken.for_user(self.user))
+
+    def test_repeated_requests_skip_the_database(self):
+        CookieAuth().authenticate(self.request)
+        with self.assertNumQueries(0):
+            user, _ = CookieAuth().authenticate(self.request)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user_cache.stats()["misses"], 1)
+        self.assertEqual(user_cache.stats()["local_hits"], 1)
+
+    def test_lockout_is_visible_immediately(self):
+        CookieAuth().authenticate(self.request)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(settings.LOGIN_ATTEMPTS):
+                self.user.handle_failed_login_attempt()
+
+        user, _ = CookieAuth().authenticate(self.request)
+        self.assertTrue(user.is_locked)
+
+    def test_saving_the_user_invalidates_the_cache_on_commit(self):
+        CookieAuth().authenticate(self.request)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = self.user.RoleChoices.TELLER
+            self.user.save()
+            # Uncommitted, a concurrent request must not cache the old row again
+            user, _ = CookieAuth().authenticate(self.request)
+            self.assertEqual(user.role, self.user.RoleChoices.CUSTOMER)
+
+        user, _ = CookieAuth().authenticate(self.request)
+        self.assertEqual(user.role, self.user.RoleChoices.TELLER)
+
+    def test_users_are_read_from_the_database_without_redis(self):
+        with mock.patch.object(user_cache.cache, "get", side_effect=ConnectionError("down")):
+            user, _ = CookieAuth().authenticate(self.request)
+        self.assertEqual(user.pk, self.user.pk)
+
+        with mock.patch.object(user_cache.cache, "set", side_effect=ConnectionError("down")):
+            user_cache.invalidate_user(self.user.pk)
+
+
+@override_settings(NOTIFICATIONS={"CHUNK_SIZE": 10})
+class BulkNotificationTests(TestCase):
+    def test_bulk_email_is_sent_in_chunks_with_status(self):
+        recipients = [f"customer{i}@example.com" for i in range(25)]
+        # 3 chunks: insert, select and status update each
+        with self.assertNumQueries(9):
+            queued = queue_bulk_email(
+                "emails/otp.html", "Policy update", recipients, {"otp": "000000"}
+            )
+
+        self.assertEqual(queued, 25)
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual(
+            EmailNotification.objects.filter(status=EmailNotification.Status.SENT).count(),
+            25,
+        )
+        # Bodies, OTP codes included, are not kept once sent
+        self.assertFalse(EmailNotification.objects.exclude(html_body="").exists())
+
+    def test_an_empty_shared_body_is_rendered_once(self):
+        recipients = ["customer1@example.com", "customer2@example.com"]
+        with mock.patch(
+            "core_apps.common.notifications.render_email", return_value=""
+        ) as render_email:
+            queued = queue_bulk_email("emails/otp.html", "Policy update", recipients)
+
+        self.assertEqual(queued, 2)
+        render_email.assert_called_once_with("emails/otp.html", {})
+
+    def test_unreachable_mail_server_fails_the_chunk_not_the_caller(self):
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.open",
+            side_effect=ConnectionRefusedError("Connection refused"),
+        ):
+            queue_email("emails/otp.html", "Your OTP", "customer@example.com", {"otp": "123456"})
+
+        notification = EmailNotification.objects.get()
+        self.assertEqual(notification.status, EmailNotification.Status.FAILED)
+        self.assertIn("Connection refused", notification.error)
+        self.assertEqual(notification.html_body, "")
+
+    def test_task_retries_leave_the_chunk_queued(self):
+        notification = EmailNotification.objects.create(
+            recipient="customer@example.com",
+            subject="Your OTP",
+            template_name="emails/otp.html",
+            html_body="<p>123456</p>",
+        )
+        backend = "django.core.mail.backends.locmem.EmailBackend"
+        with mock.patch(f"{backend}.open", side_effect=TimeoutError("timed out")):
+            with self.assertRaises(EmailConnectionError):
+                deliver([notification.pk], backend, final=False)
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, EmailNotification.Status.QUEUED)
+        self.assertEqual(deliver([notification.pk], backend), {"sent": 1, "failed": 0})
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def record(self, name, level=logging.DEBUG):
+        return logging.LogRecord(name, level, __file__, 1, "message", (), None)
+
+    def test_sampling_keeps_one_in_n_debug_records(self):
+        sampling = SamplingFilter({"django.template": 10})
+        kept = [sampling.filter(self.record("django.template.base")) for _ in range(100)]
+        self.assertEqual(sum(kept), 10)
+        self.assertTrue(sampling.filter(self.record("django.template", logging.INFO)))
+        self.assertTrue(sampling.filter(self.record("django.request")))
+
+    def test_queue_sink_applies_level_overrides_and_drains_on_removal(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sink = Path(tmp) / "app.log"
+            loguru_logging, _ = build_logging(
+                [{"sink": sink, "level": "DEBUG", "format": "{name} {message}"}],
+                levels={"core_apps.quiet": "WARNING"},
+            )
+            self.assertIsInstance(loguru_logging["handlers"][0]["sink"], QueueFileSink)
+            try:
+                logger.configure(**loguru_logging)
+                logger.patch(lambda r: r.update(name="core_apps.quiet.views")).info("dropped")
+                logger.patch(lambda r: r.update(name="core_apps.loud")).info("kept")
+                logger.remove()
+                lines = sink.read_text().splitlines()
+            finally:
+                logger.configure(**settings.LOGURU_LOGGING)
+
+        self.assertEqual(lines, ["core_apps.loud kept"])
+
+
+class PassingCheck(health.HealthCheck):
+    name = "passing"
+    runs = 0
+
+    def check(self):
+        PassingCheck.runs += 1
+        return "ok"
+
+
+class FailingCheck(health.HealthCheck):
+    name = "failing"
+
+    def check(self):
+        raise ConnectionError("refused")
+
+
+class HangingCheck(health.HealthCheck):
+    name = "hanging"
+    release = threading.Event()
+
+    def check(self):
+        self.release.wait(5)
+        return "ok"
+
+
+def health_checks(*checks):
+    return override_settings(
+        HEALTH_CHECKS=[{"BACKEND": f"{__name__}.{name}", **options} for name, options in checks]
+    )
+
+
+class HealthProbeTests(SimpleTestCase):
+    def setUp(self):
+        health.get_checks.cache_clear()
+        PassingCheck.runs = 0
+        self.addCleanup(health.get_checks.cache_clear)
+
+    def test_liveness_skips_every_check(self):
+        response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"ok")
+
+    @health_checks(("PassingCheck", {"CACHE_TTL": 60}))
+    def test_readiness_result_is_cached(self):
+        for _ in range(3):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["checks"]["passing"]["status"], "ok")
+        self.assertEqual(PassingCheck.runs, 1)
+
+    @health_checks(("PassingCheck", {}), ("FailingCheck", {}))
+    def test_failing_critical_check_is_not_ready(self):
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["checks"]["failing"]["detail"], "ConnectionError: refused")
+
+    @health_checks(("PassingCheck", {}), ("FailingCheck", {"CRITICAL": False}))
+    def test_failing_optional_check_is_reported_only(self):
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["checks"]["failing"]["status"], "fail")
+
+    @health_checks(("HangingCheck", {"TIMEOUT": 0.05}))
+    def test_hung_check_times_out(self):
+        HangingCheck.release.clear()
+        self.addCleanup(HangingCheck.release.set)
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["checks"]["hanging"]["detail"], "timed out after 0.05s")
+
+
+class InstrumentationTests(TestCase):
+    def test_server_timing_counts_database_queries(self):
+        user = make_user(is_staff=True, is_superuser=True)
+        self.client.force_login(user)
+        response = self.client.get(reverse("admin:user_auth_customuser_changelist"))
+
+        timing = dict(
+            metric.strip().split(";", 1) for metric in response["Server-Timing"].split(",")
+        )
+        self.assertRegex(timing["db"], r'dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertEqual(response["X-Django-User"], user.email)
+
+    def test_requests_are_exported_per_view(self):
+        self.client.get(reverse("metrics"))
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'http_request_db_queries_bucket{le="0.0",method="GET",view="metrics"}',
+            response.content.decode(),
+        )
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "core_apps.common.instrumentation.InstrumentedLocMemCache"}
+        }
+    )
+    def test_cache_lookups_are_counted(self):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            cache.set("present", 1)
+            cache.get("present")
+            cache.get("absent")
+            cache.get_many(["present", "absent", "missing"])
+        finally:
+            current_metrics.reset(token)
+
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 3))
+
+
+class TestRoleRateThrottle(throttling.RoleRateThrottle):
+    THROTTLE_RATES = {"user": "3/min", "teller": "10/min"}
+
+
+class RoleRateThrottleTests(TestCase):
+    def setUp(self):
+        if not redis_available():
+            self.skipTest("Redis is not available")
+        self.request = APIRequestFactory().get("/")
+
+    def hits_allowed(self, user, attempts):
+        self.request.user = user
+        key = TestRoleRateThrottle().cache_format % {"scope": "user", "ident": user.pk}
+        get_redis_connection("default").delete(key)
+        return sum(TestRoleRateThrottle().allow_request(self.request, None) for _ in range(attempts))
+
+    def test_rate_depends_on_role(self):
+        customer = make_user()
+        teller = make_user(
+            email="teller@example.com", id_no="TELLER0001", role=CustomUser.RoleChoices.TELLER
+        )
+        self.assertEqual(self.hits_allowed(customer, 12), 3)
+        self.assertEqual(self.hits_allowed(teller, 12), 10)
+
+    def test_denied_request_waits_for_the_next_token(self):
+        self.request.user = make_user()
+        self.hits_allowed(self.request.user, 3)
+        throttle = TestRoleRateThrottle()
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertTrue(0 < throttle.wait() <= 20)
+
+    def test_redis_outage_lets_requests_through(self):
+        self.request.user = make_user()
+        with mock.patch.object(throttling, "_gcra_script", side_effect=ConnectionError):
+            self.assertTrue(TestRoleRateThrottle().allow_request(self.request, None))
+
+
+class ConnectionPoolTests(TransactionTestCase):
+    def setUp(self):
+        settings_dict = {**connection.settings_dict, "CONN_MAX_AGE": 0, "POOL": {"MAX_SIZE": 1}}
+        self.db = PooledDatabaseWrapper(settings_dict, alias="pool_tests")
+        self.addCleanup(lambda: self.db.pool.close())
+        self.addCleanup(self.db.close)
+
+    def test_connections_are_reused(self):
+        self.db.ensure_connection()
+        first = self.db.connection
+        self.db.close()
+        self.db.ensure_connection()
+        self.assertIs(self.db.connection, first)
+        self.assertEqual(self.db.pool.stats()["size"], 1)
+
+    def test_open_transaction_is_rolled_back_on_release(self):
+        self.db.ensure_connection()
+        self.db.set_autocommit(False)
+        with self.db.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        raw = self.db.connection
+        self.db.pool.release(raw)
+        self.db.connection = None
+        self.assertEqual(raw.info.transaction_status, TRANSACTION_STATUS_IDLE)
+
+    def test_waits_for_a_free_connection_then_times_out(self):
+        self.db.pool.timeout = 0.05
+        self.db.ensure_connection()
+        other = PooledDatabaseWrapper(self.db.settings_dict, alias="pool_tests")
+        with self.assertRaises(OperationalError):
+            other.ensure_connection()
+
+        self.db.pool.timeout = 5
+        raw, self.db.connection = self.db.connection, None
+        release = threading.Timer(0.05, self.db.pool.release, [raw])
+        release.start()
+        other.ensure_connection()
+        release.join()
+        self.assertIs(other.connection, raw)
+        other.close()
+        self.assertEqual(self.db.pool.stats()["size"], 1)
+
+    def test_idle_connections_are_checked_outside_the_lock(self):
+        self.db.pool.check_after = 0
+        self.db.ensure_connection()
+        first = self.db.connection
+        self.db.close()
+
+        def ping(connection):
+            self.assertFalse(self.db.pool._lock.locked())
+            return False
+
+        with mock.patch.object(self.db.pool, "_ping", side_effect=ping) as pinged:
+            self.db.ensure_connection()
+        # The broken connection was dropped and its slot reused
+        pinged.assert_called_once_with(first)
+        self.assertTrue(first.closed)
+        self.assertIsNot(self.db.connection, first)
+        self.assertEqual(self.db.pool.stats()["size"], 1)
+
+
+class ReadThroughCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.loads = []
+        self.cache = read_through.ReadThroughCache(f"test-{uuid.uuid4().hex}", self.load)
+
+    def load(self, key_id):
+        self.loads.append(key_id)
+        time.sleep(0.1)
+        return f"value {len(self.loads)}"
+
+    def test_concurrent_misses_load_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get(1))) for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.loads, [1])
+        self.assertEqual(results, ["value 1"] * 5)
+
+    def test_load_racing_an_invalidation_is_not_served(self):
+        invalidate = threading.Timer(0.05, self.cache.invalidate, [[1]])
+        invalidate.start()
+        self.cache.get(1)
+        invalidate.join()
+
+        self.assertEqual(self.cache.get(1), "value 2")
+
+    @override_settings(READ_THROUGH_CACHE={**settings.READ_THROUGH_CACHE, "TIMEOUT": 1})
+    def test_entry_is_refreshed_before_it_expires(self):
+        self.cache.get(1)
+        # One second left and a 0.1s load: refreshed early now and then
+        with mock.patch.object(read_through.random, "random", return_value=0.999999):
+            self.assertEqual(self.cache.get(1), "value 2")
+        self.assertEqual(self.cache.get(1), "value 2")
+
+    def test_values_are_loaded_directly_without_redis(self):
+        down = ConnectionError("down")
+        with mock.patch.object(read_through.cache, "get_many", side_effect=down):
+            self.assertEqual(self.cache.get(1), "value 1")
+        with mock.patch.object(read_through.cache, "set", side_effect=down):
+            self.assertEqual(self.cache.get(1), "value 2")
+        with mock.patch.object(read_through.cache, "set_many", side_effect=down):
+            self.cache.invalidate([1])
+
+        self.assertEqual(self.cache.get(1), "value 3")
+
+
+class BenchmarkingTests(TestCase):
+    def test_benchmark_is_measured_and_rolled_back(self):
+        bench = replace(benchmarking.discover()["content_view.record_view"], number=2)
+        result = benchmarking.run(bench, rounds=1)
+
+        self.assertEqual(result.queries, 2)
+        self.assertGreater(result.time_us, 0)
+        self.assertFalse(CustomUser.objects.exists())
+
+    def test_extra_queries_are_a_regression_whatever_the_tolerance(self):
+        baseline = {"time_us": 100.0, "queries": 1, "peak_kib": 4.0, "blocks": 10}
+
+        self.assertEqual(
+            benchmarking.regressions(benchmarking.Result(120.0, 1, 4.5, 12), baseline, 0.25, 0.25),
+            [],
+        )
+        self.assertEqual(
+            benchmarking.regressions(benchmarking.Result(90.0, 2, 4.0, 10), baseline, 10, 10),
+            ["queries 1 -> 2"],
+        )
+
+
+class QueryBudgetTests(TestCase):
+    def test_every_url_declares_a_budget(self):
+        self.assertEqual(query_budget.unbudgeted_urls(), [])
+
+    def test_breach_lists_the_queries_and_where_they_come_from(self):
+        with self.assertRaises(query_budget.QueryBudgetExceeded) as caught:
+            with query_budget.limit_queries(1, name="counting"):
+                CustomUser.objects.count()
+                CustomUser.objects.count()
+
+        report = str(caught.exception)
+        self.assertIn("counting took 2 queries (budget 1)", report)
+        self.assertIn("SELECT COUNT(*)", report)
+        self.assertIn("core_apps/common/tests.py", report)
+
+    def test_requests_are_held_to_their_view_budget(self):
+        self.client.cookies[settings.COOKIE_NAME] = str(AccessToken.for_user(make_user()))
+        budget = query_budget.Budget("MyProfileView.get", 1)
+
+        with mock.patch.object(MyProfileView.get, "query_budget", budget):
+            with self.assertRaisesMessage(
+                query_budget.QueryBudgetExceeded, "GET /api/v1/profiles/me/ took"
+            ):
+                self.client.get(reverse("my_profile"))
+
+
+def viewed_on(day: int, hour: int = 12) -> datetime:
+    return datetime(2026, 3, day, hour, tzinfo=dt_timezone.utc)
+
+
+class ViewBufferChecks:
+    buffer: LocalViewBuffer | RedisViewBuffer
+
+    def entries(self, count):
+        return [
+            ViewEntry(1, uuid.uuid4(), uuid.uuid4(), f"10.0.0.{n}", viewed_on(1, hour=n))
+            for n in range(count)
+        ]
+
+    def test_entries_come_out_in_order(self):
+        entries = self.entries(3)
+        for entry in entries:
+            self.buffer.push(entry)
+
+        self.assertEqual(len(self.buffer), 3)
+        self.assertEqual(self.buffer.pop_batch(2), entries[:2])
+        self.assertEqual(self.buffer.pop_batch(2), entries[2:])
+        self.assertEqual(self.buffer.pop_batch(2), [])
+
+    def test_requeued_entries_come_out_first(self):
+        entries = self.entries(3)
+        for entry in entries:
+            self.buffer.push(entry)
+        batch = self.buffer.pop_batch(2)
+        self.buffer.requeue(batch)
+
+        self.assertEqual(self.buffer.pop_batch(3), entries)
+
+
+class LocalViewBufferTests(ViewBufferChecks, SimpleTestCase):
+    def setUp(self):
+        self.buffer = LocalViewBuffer(batch_size=100, flush_interval=60)
+        # No flusher thread, the tests drain the buffer themselves
+        patcher = mock.patch.object(self.buffer, "_ensure_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class RedisViewBufferTests(ViewBufferChecks, SimpleTestCase):
+    def setUp(self):
+        if not redis_available():
+            self.skipTest("Redis is not available")
+        self.buffer = RedisViewBuffer(batch_size=100, key=f"test:views:{uuid.uuid4()}")
+
+    def tearDown(self):
+        self.buffer.client.delete(self.buffer.key)
+
+
+class ContentViewIngestionTests(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.get(user=make_user())
+        self.content_type = ContentType.objects.get_for_model(self.profile)
+        self.object_id = ContentView._object_id(self.profile)
+        self.viewer = make_user(email="viewer@example.com", id_no="V0")
+        self.buffer = LocalViewBuffer(batch_size=2, flush_interval=60)
+        patcher = mock.patch.object(self.buffer, "_ensure_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def entry(self, viewed_at, user_id=None, viewer_ip="10.0.0.1"):
+        return ViewEntry(self.content_type.pk, self.object_id, user_id, viewer_ip, viewed_at)
+
+    def last_viewed(self):
+        return {
+            (view.user_id, view.viewer_ip): view.last_viewed
+            for view in ContentView.objects.filter(object_id=self.object_id)
+        }
+
+    def test_viewers_are_upserted_with_their_latest_view(self):
+        with self.assertNumQueries(1):
+            ContentView.bulk_record_views(
+                [
+                    self.entry(viewed_on(1, hour=14), self.viewer.pk),
+                    self.entry(viewed_on(1), self.viewer.pk),
+                    self.entry(viewed_on(1), self.viewer.pk, "10.0.0.2"),
+                ]
+            )
+        ContentView.bulk_record_views([self.entry(viewed_on(2), self.viewer.pk)])
+
+        self.assertEqual(
+            self.last_viewed(),
+            {
+                (self.viewer.pk, "10.0.0.1"): viewed_on(2),
+                (self.viewer.pk, "10.0.0.2"): viewed_on(1),
+            },
+        )
+
+    def test_anonymous_viewers_are_matched_to_their_rows(self):
+        ContentView.bulk_record_views([self.entry(viewed_on(1)), self.entry(viewed_on(1, hour=9))])
+        ContentView.bulk_record_views(
+            [
+                self.entry(viewed_on(2)),
+                self.entry(viewed_on(1, hour=6), viewer_ip=None),
+                self.entry(viewed_on(1, hour=7), viewer_ip=None),
+            ]
+        )
+        # An older view does not move the last one back
+        ContentView.bulk_record_views([self.entry(viewed_on(1, hour=18))])
+
+        self.assertEqual(
+            self.last_viewed(),
+            {(None, "10.0.0.1"): viewed_on(2), (None, None): viewed_on(1, hour=7)},
+        )
+
+    def test_a_failed_batch_is_put_back_for_the_next_flush(self):
+        entries = [self.entry(viewed_on(day), viewer_ip=f"10.0.0.{day}") for day in (1, 2, 3)]
+        for entry in entries:
+            self.buffer.push(entry)
+
+        with mock.patch.object(
+            ContentView, "bulk_record_views", side_effect=[None, OperationalError("down")]
+        ):
+            with self.assertRaises(OperationalError):
+                flush_view_buffer(self.buffer)
+        self.assertEqual(self.buffer.pop_batch(2), entries[2:])
+        self.buffer.requeue(entries[2:])
+
+        self.assertEqual(flush_view_buffer(self.buffer), 1)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_max_batches_leaves_the_rest_buffered(self):
+        for day in (1, 2, 3):
+            self.buffer.push(self.entry(viewed_on(day), viewer_ip=f"10.0.0.{day}"))
+
+        self.assertEqual(flush_view_buffer(self.buffer, max_batches=1), 2)
+        self.assertEqual(len(self.buffer), 1)
+
+    @override_settings(
+        CONTENT_VIEW_INGESTION={
+            **settings.CONTENT_VIEW_INGESTION, "MODE": "buffered", "BUFFER": "local"
+        },
+        CONTENT_VIEW_SKETCHES={**settings.CONTENT_VIEW_SKETCHES, "BACKEND": "local"},
+    )
+    def test_buffered_views_are_written_by_the_flush(self):
+        with mock.patch.dict("core_apps.common.view_buffer._buffers", {"local": self.buffer}):
+            with self.assertNumQueries(0):
+                ContentView.record_view(self.profile, self.viewer, "10.0.0.1")
+                ContentView.record_view(self.profile, None, "10.0.0.1")
+            self.assertFalse(ContentView.objects.exists())
+            flush_view_buffer(self.buffer)
+            ContentView.record_view(self.profile, None, "10.0.0.1")
+            flush_view_buffer(self.buffer)
+
+        # The anonymous viewer's second view found its row
+        self.assertEqual(ContentView.objects.count(), 2)
+        self.assertEqual(set(self.last_viewed()), {(self.viewer.pk, "10.0.0.1"), (None, "10.0.0.1")})
+
+    @override_settings(
+        CONTENT_VIEW_INGESTION={
+            **settings.CONTENT_VIEW_INGESTION, "MODE": "buffered", "BUFFER": "local"
+        },
+        CONTENT_VIEW_SKETCHES={**settings.CONTENT_VIEW_SKETCHES, "BACKEND": "local"},
+    )
+    def test_views_are_written_directly_when_the_buffer_fails(self):
+        with mock.patch.dict("core_apps.common.view_buffer._buffers", {"local": self.buffer}):
+            with mock.patch.object(self.buffer, "push", side_effect=ConnectionError("down")):
+                ContentView.record_view(self.profile, self.viewer, "10.0.0.1")
+
+        self.assertEqual(set(self.last_viewed()), {(self.viewer.pk, "10.0.0.1")})
+        self.assertEqual(len(self.buffer), 0)
+
+
+@override_settings(
+    CONTENT_VIEW_INGESTION={**settings.CONTENT_VIEW_INGESTION, "MODE": "sync"},
+    CONTENT_VIEW_SKETCHES={**settings.CONTENT_VIEW_SKETCHES, "BACKEND": "local"},
+)
+class ContentViewRollupTests(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.get(user=make_user())
+        self.viewers = [make_user(email=f"viewer{n}@example.com", id_no=f"V{n}") for n in range(2)]
+
+    def view(self, viewer, viewed_at):
+        with mock.patch("django.utils.timezone.now", return_value=viewed_at):
+            ContentView.record_view(self.profile, viewer, "10.0.0.1")
+
+    def rollup(self, viewed_at):
+        # Past the LAG, as if the run came later
+        return rollups.rollup_content_views(now=viewed_at + timedelta(minutes=5))
+
+    def daily(self):
+        return {
+            row.day: (row.views, row.unique_viewers)
+            for row in ContentViewDaily.objects.for_object(self.profile)
+        }
+
+    def test_views_are_folded_per_day(self):
+        self.view(self.viewers[0], viewed_on(1))
+        self.view(self.viewers[0], viewed_on(1) + timedelta(minutes=20))
+        self.view(self.viewers[1], viewed_on(1) + timedelta(minutes=40))
+
+        self.assertEqual(self.rollup(viewed_on(1, hour=13)), 1)
+        self.assertEqual(self.daily(), {date(2026, 3, 1): (3, 2)})
+        # Nothing changed since
+        self.assertEqual(self.rollup(viewed_on(1, hour=14)), 0)
+
+    def test_every_view_counts_and_a_viewer_once_a_day(self):
+        self.view(self.viewers[0], viewed_on(1))
+        self.rollup(viewed_on(1))
+        self.view(self.viewers[0], viewed_on(1, hour=13))
+        self.view(self.viewers[0], viewed_on(1, hour=14))
+        self.rollup(viewed_on(1, hour=14))
+        self.view(self.viewers[0], viewed_on(2))
+        self.rollup(viewed_on(2))
+
+        self.assertEqual(self.daily(), {date(2026, 3, 1): (3, 1), date(2026, 3, 2): (1, 1)})
+        self.assertEqual(
+            ContentViewDaily.objects.for_object(self.profile)
+            .between(date(2026, 3, 1), date(2026, 3, 31))
+            .totals(),
+            {"views": 4, "viewer_days": 2},
+        )
+
+    def test_buffered_views_are_counted_one_by_one(self):
+        content_type = ContentType.objects.get_for_model(self.profile)
+        entry = ViewEntry(
+            content_type.pk,
+            ContentView._object_id(self.profile),
+            self.viewers[0].pk,
+            "10.0.0.1",
+            viewed_on(1),
+        )
+        anonymous = replace(entry, user_id=None)
+        ContentView.bulk_record_views([entry, entry, anonymous])
+        ContentView.bulk_record_views([replace(entry, viewed_at=viewed_on(1, hour=9)), anonymous])
+
+        self.assertEqual(self.rollup(timezone.now()), 1)
+        self.assertEqual(self.daily(), {date(2026, 3, 1): (5, 2)})
+
+
+@override_settings(
+    CONTENT_VIEW_PARTITIONING={**settings.CONTENT_VIEW_PARTITIONING, "ENABLED": True}
+)
+class ContentViewPartitioningTests(TestCase):
+    def setUp(self):
+        self.profile = Profile.objects.get(user=make_user())
+        content_type = ContentType.objects.get_for_model(self.profile)
+        self.entry = ViewEntry(content_type.pk, uuid.uuid4(), None, "10.0.0.1", viewed_on(1))
+        ContentView.bulk_record_views([self.entry])
+        with connection.cursor() as cursor:
+            # The table can't be altered with foreign key checks pending
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        partitions.convert()
+        self.created = partitions.maintain_partitions()["created"]
+
+    def test_table_is_converted_keeping_its_rows(self):
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(
+            set(partitions.partitions()), {"common_contentview_legacy", *self.created}
+        )
+        month = partitions._month(timezone.now(), 3)
+        self.assertIn(f"common_contentview_y{month:%Ym%m}", self.created)
+        self.assertEqual(ContentView.objects.get().last_viewed, viewed_on(1))
+
+        # Viewers are matched by hand, a repeat view updates their row
+        ContentView.bulk_record_views([replace(self.entry, user_id=self.profile.user_id)])
+        ContentView.bulk_record_views([replace(self.entry, viewed_at=viewed_on(2))])
+        self.assertEqual(ContentView.objects.count(), 2)
+        self.assertEqual(ContentView.objects.latest("last_viewed").last_viewed, viewed_on(2))
+
+    @override_settings(
+        CONTENT_VIEW_INGESTION={**settings.CONTENT_VIEW_INGESTION, "MODE": "sync"},
+        CONTENT_VIEW_SKETCHES={**settings.CONTENT_VIEW_SKETCHES, "BACKEND": "local"},
+    )
+    def test_views_recorded_in_the_request_lock_their_viewer(self):
+        viewer = make_user(email="viewer@example.com", id_no="V0")
+        with CaptureQueriesContext(connection) as queries:
+            ContentView.record_view(self.profile, viewer, "10.0.0.1")
+            ContentView.record_view(self.profile, viewer, "10.0.0.1")
+
+        self.assertEqual(ContentView.objects.filter(user=viewer).count(), 1)
+        self.assertEqual(
+            sum("pg_advisory_xact_lock" in query["sql"] for query in queries.captured_queries), 2
+        )
+        # Folded from the partitioned table like any other
+        rollups.rollup_content_views(now=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(
+            ContentViewDaily.objects.for_object(self.profile).totals(),
+            {"views": 2, "viewer_days": 1},
+        )
+
+    def test_date_filters_prune_partitions_and_old_months_are_dropped(self):
+        month = partitions._month(timezone.now(), 3)
+        plan = ContentView.objects.filter(created_at__gte=month + timedelta(days=1)).explain()
+        self.assertIn(f"common_contentview_y{month:%Ym%m}", plan)
+        self.assertNotIn("common_contentview_legacy", plan)
+
+        done = partitions.maintain_partitions(partitions._month(timezone.now(), 16))
+        self.assertIn("common_contentview_legacy", done["dropped"])
+        self.assertFalse(ContentView.objects.exists())
+
+
+class ViewSketchChecks:
+    sketches: view_sketches.LocalViewSketches | view_sketches.RedisViewSketches
+
+    def add_viewers(self, object_id, viewers, day):
+        for n in viewers:
+            ip = f"10.{n >> 16}.{n >> 8 & 255}.{n & 255}"
+            self.sketches.add(ViewEntry(1, object_id, None, ip, day))
+
+    def count(self, object_id, *days):
+        return self.sketches.count([view_sketches.sketch_name(1, object_id, day) for day in days])
+
+    def test_counts_are_within_the_error_bound(self):
+        object_id = uuid.uuid4()
+        self.add_viewers(object_id, range(15000), viewed_on(1))
+        self.add_viewers(object_id, range(10000, 25000), viewed_on(2))
+
+        # A viewer on both days is counted once
+        for exact, days in [(15000, ["20260301"]), (25000, ["20260301", "20260302"])]:
+            error = abs(self.count(object_id, *days) - exact) / exact
+            self.assertLess(error, view_sketches.ERROR_BOUND)
+        error = abs(self.count(object_id, view_sketches.ALL_TIME) - 25000) / 25000
+        self.assertLess(error, view_sketches.ERROR_BOUND)
+
+    def test_small_counts_are_near_exact(self):
+        object_id = uuid.uuid4()
+        self.add_viewers(object_id, range(500), viewed_on(1))
+        self.add_viewers(object_id, range(500), viewed_on(1, hour=18))
+
+        self.assertAlmostEqual(self.count(object_id, "20260301"), 500, delta=5)
+
+
+
+class LocalViewSketchTests(ViewSketchChecks, SimpleTestCase):
+    def setUp(self):
+        self.sketches = view_sketches.LocalViewSketches()
+
+
+class RedisViewSketchTests(ViewSketchChecks, SimpleTestCase):
+    def setUp(self):
+        if not redis_available():
+            self.skipTest("Redis is not available")
+        self.sketches = view_sketches.RedisViewSketches(f"test:hll:{uuid.uuid4()}", 1)
+
+    def tearDown(self):
+        keys = list(self.sketches.client.scan_iter(f"{self.sketches.prefix}:*"))
+        if keys:
+            self.sketches.client.delete(*keys)
+
+
+@override_settings(
+    CONTENT_VIEW_INGESTION={**settings.CONTENT_VIEW_INGESTION, "MODE": "sync"},
+    CONTENT_VIEW_SKETCHES={**settings.CONTENT_VIEW_SKETCHES, "BACKEND": "local"},
+)
+class ApproxUniqueViewersTests(TestCase):
+    def test_matches_the_exact_count_of_viewers(self):
+        profile = Profile.objects.get(user=make_user())
+        viewers = [make_user(email=f"viewer{n}@example.com", id_no=f"V{n}") for n in range(3)]
+        for user in viewers:
+            for ip in ["10.0.0.1", "10.0.0.2", "10.0.0.1"]:
+                ContentView.record_view(profile, user, ip)
+        ContentView.record_view(profile, None, "10.0.0.3")
+
+        exact = ContentView.objects.filter(object_id=profile.pk).count()
+        self.assertEqual(exact, 7)
+        self.assertEqual(ContentView.approx_unique_viewers(profile), exact)
+        self.assertEqual(ContentView.approx_unique_viewers(profile, since=timezone.now()), exact)
+        self.assertEqual(
+            ContentView.approx_unique_viewers(profile, since=date.today() + timedelta(days=1)), 0
+        )
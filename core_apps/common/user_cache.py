@@ -0,0 +1,139 @@
+"""
+Cached user resolution for authentication.
+
+Users are cached in Redis under a key that embeds a per-user version stamp,
+with a small per-process LRU in front. Every lookup reads the current version
+(one Redis GET), so invalidating a user is just replacing their version: the
+change is seen by every process on its next request, while unchanged users are
+served from local memory without touching Postgres. When Redis can't be
+reached, users are read from the database instead.
+"""
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from loguru import logger
+
+from .cache_versions import current_version, replace_versions
+
+
+class LRUCache:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_where(self, predicate) -> None:
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_local = LRUCache(settings.USER_CACHE["LOCAL_MAXSIZE"])
+_stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _version_key(user_id: Any) -> str:
+    return f"{settings.USER_CACHE['KEY_PREFIX']}:version:{user_id}"
+
+
+def _user_key(user_id: Any, version: str) -> str:
+    return f"{settings.USER_CACHE['KEY_PREFIX']}:{user_id}:{version}"
+
+
+def get_user(user_id: Any) -> Any:
+    """
+    Return the user with the given id, raising ``DoesNotExist`` like
+    ``User.objects.get``. Callers get their own copy of the cached instance.
+    """
+    user_id = str(user_id)
+    try:
+        version = current_version(_version_key(user_id))
+        user = _local.get((user_id, version))
+        if user is not None:
+            _count("local_hits")
+            return copy.copy(user)
+        user = cache.get(_user_key(user_id, version))
+    except Exception as e:
+        logger.warning(f"User cache skipped, Redis unavailable: {e}")
+        _count("misses")
+        return get_user_model().objects.get(pk=user_id)
+
+    if user is not None:
+        _count("redis_hits")
+    else:
+        _count("misses")
+        user = get_user_model().objects.get(pk=user_id)
+        try:
+            cache.set(_user_key(user_id, version), user, settings.USER_CACHE["TIMEOUT"])
+        except Exception as e:
+            logger.warning(f"User {user_id} not cached, Redis unavailable: {e}")
+
+    _local.set((user_id, version), user)
+    return copy.copy(user)
+
+
+def invalidate_user(user_id: Any) -> None:
+    user_id = str(user_id)
+    _local.discard_where(lambda key: key[0] == user_id)
+    try:
+        replace_versions([_version_key(user_id)])
+    except Exception as e:
+        # Other processes may serve the old user until their entries expire
+        logger.error(f"Failed to invalidate cached user {user_id}, Redis unavailable: {e}")
+
+
+def invalidate_user_on_commit(user_id: Any) -> None:
+    """
+    Invalidate once the change is committed: before that, a concurrent
+    request could cache the old row again.
+    """
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        counters = dict(_stats)
+    lookups = sum(counters.values())
+    counters["hit_ratio"] = (
+        (counters["local_hits"] + counters["redis_hits"]) / lookups if lookups else 0.0
+    )
+    return counters
+
+
+def reset(stats_only: bool = False) -> None:
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+    if not stats_only:
+        _local.clear()
@@ -0,0 +1,196 @@
+"""
+Write-behind buffering for ContentView ingestion.
+
+Instead of hitting the database on every tracked view, ``ContentView.record_view``
+pushes a small entry into a buffer and returns. A flusher later drains the buffer
+in batches and writes each batch with a single upsert.
+
+Two buffers are available:
+- ``local``: an in-process queue drained by a background thread (single process setups).
+- ``redis``: a Redis list shared by every worker, drained by a Celery beat task.
+"""
+import atexit
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class ViewEntry:
+    content_type_id: int
+    object_id: uuid.UUID
+    user_id: Optional[uuid.UUID]
+    viewer_ip: Optional[str]
+    viewed_at: datetime
+
+    @property
+    def key(self) -> tuple:
+        return (self.content_type_id, self.object_id, self.user_id, self.viewer_ip)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "ct": self.content_type_id,
+                "obj": str(self.object_id),
+                "user": str(self.user_id) if self.user_id else None,
+                "ip": self.viewer_ip,
+                "ts": self.viewed_at.isoformat(),
+            }
+        )
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "ViewEntry":
+        data = json.loads(raw)
+        return cls(
+            content_type_id=data["ct"],
+            object_id=uuid.UUID(data["obj"]),
+            user_id=uuid.UUID(data["user"]) if data["user"] else None,
+            viewer_ip=data["ip"],
+            viewed_at=datetime.fromisoformat(data["ts"]),
+        )
+
+
+class LocalViewBuffer:
+    """
+    In-process buffer. A daemon thread flushes it every ``flush_interval``
+    seconds, or sooner once ``batch_size`` entries are waiting.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._entries: deque[ViewEntry] = deque()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def push(self, entry: ViewEntry) -> None:
+        self._entries.append(entry)
+        self._ensure_flusher()
+        if len(self._entries) >= self.batch_size:
+            self._wakeup.set()
+
+    def pop_batch(self, size: int) -> list[ViewEntry]:
+        batch = []
+        while len(batch) < size:
+            try:
+                batch.append(self._entries.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def requeue(self, entries: list[ViewEntry]) -> None:
+        self._entries.extendleft(reversed(entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _ensure_flusher(self) -> None:
+        # Threads do not survive a fork, so gunicorn workers each start their own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="content-view-flusher", daemon=True
+            )
+            self._thread.start()
+            atexit.register(flush_view_buffer, self)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                flush_view_buffer(self)
+            except Exception as e:
+                logger.error(f"Failed to flush content views: {e}")
+            finally:
+                close_old_connections()
+
+
+class RedisViewBuffer:
+    """
+    Buffer backed by a Redis list, shared across processes and nodes.
+    It is drained by the ``flush_content_views`` Celery task.
+    """
+
+    def __init__(self, batch_size: int, key: str) -> None:
+        self.batch_size = batch_size
+        self.key = key
+
+    @property
+    def client(self) -> Any:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+
+    def push(self, entry: ViewEntry) -> None:
+        self.client.rpush(self.key, entry.to_json())
+
+    def pop_batch(self, size: int) -> list[ViewEntry]:
+        raw_entries = self.client.lpop(self.key, size) or []
+        return [ViewEntry.from_json(raw) for raw in raw_entries]
+
+    def requeue(self, entries: list[ViewEntry]) -> None:
+        if entries:
+            self.client.lpush(self.key, *[entry.to_json() for entry in reversed(entries)])
+
+    def __len__(self) -> int:
+        return self.client.llen(self.key)
+
+
+_buffers: dict[str, LocalViewBuffer | RedisViewBuffer] = {}
+
+
+def get_view_buffer() -> LocalViewBuffer | RedisViewBuffer:
+    config = settings.CONTENT_VIEW_INGESTION
+    backend = config["BUFFER"]
+    if backend not in _buffers:
+        if backend == "local":
+            _buffers[backend] = LocalViewBuffer(
+                config["BATCH_SIZE"], config["FLUSH_INTERVAL"]
+            )
+        elif backend == "redis":
+            _buffers[backend] = RedisViewBuffer(config["BATCH_SIZE"], config["REDIS_KEY"])
+        else:
+            raise ValueError(f"Unknown content view buffer: {backend}")
+    return _buffers[backend]
+
+
+def flush_view_buffer(
+    buffer: Optional[LocalViewBuffer | RedisViewBuffer] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    Drain the buffer batch by batch and return the number of entries written.
+    A batch that fails to write is put back so it is retried on the next flush.
+    """
+    from .models import ContentView
+
+    buffer = buffer or get_view_buffer()
+    flushed = batches = 0
+    while max_batches is None or batches < max_batches:
+        entries = buffer.pop_batch(buffer.batch_size)
+        if not entries:
+            break
+        try:
+            ContentView.bulk_record_views(entries)
+        except Exception:
+            buffer.requeue(entries)
+            raise
+        flushed += len(entries)
+        batches += 1
+    return flushed
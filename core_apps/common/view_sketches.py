@@ -0,0 +1,180 @@
+"""
+Approximate unique viewer counts, from HyperLogLog sketches.
+
+Counting distinct viewers of an object exactly means scanning its
+ContentView rows. Instead, ``ContentView.record_view`` adds each viewer, the
+(user, IP) pair ContentView keys rows by, to two sketches of the object: one
+for the day of the view and one for all time. Sketches are counted together
+as their union, so the viewers of a range of days are counted once each
+(``ContentView.approx_unique_viewers``). Day sketches are kept
+``RETENTION_DAYS``.
+
+Every sketch has 16384 registers, at most 12KB in Redis, whatever the
+number of viewers. The count's standard error is 1.04 / sqrt(16384) = 0.81%:
+counts are within ``ERROR_BOUND``, three standard errors, of the exact
+count with 99.7% confidence. The error is relative to the count: a count of
+a thousand viewers can be off by a dozen.
+
+Two backends are available:
+- ``redis``: PFADD / PFCOUNT, shared by every worker.
+- ``local``: the same sketches in process memory, kept by each process, for
+  development and tests.
+"""
+import hashlib
+import math
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .view_buffer import ViewEntry
+
+INDEX_BITS = 14  # as Redis
+REGISTERS = 2**INDEX_BITS
+MAX_RANK = 64 - INDEX_BITS + 1
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+ERROR_BOUND = 3 * STANDARD_ERROR
+
+ALL_TIME = "all"
+
+
+def viewer(entry: ViewEntry) -> str:
+    return f"{entry.user_id}|{entry.viewer_ip}"
+
+
+def sketch_keys(entry: ViewEntry) -> tuple[str, str]:
+    """The day and all-time sketches of the entry's object"""
+    return (
+        sketch_name(entry.content_type_id, entry.object_id, timezone.localdate(entry.viewed_at)),
+        sketch_name(entry.content_type_id, entry.object_id, ALL_TIME),
+    )
+
+
+def sketch_name(content_type_id: int, object_id: Any, day: date | str) -> str:
+    day = day.strftime("%Y%m%d") if isinstance(day, date) else day
+    return f"{content_type_id}:{object_id}:{day}"
+
+
+def days_since(since: date) -> list[date]:
+    today = timezone.localdate()
+    return [since + timedelta(days=n) for n in range((today - since).days + 1)]
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous, z = z, z + x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x in (0, 1):
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        y *= 0.5
+        previous, z = z, z - (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class LocalViewSketches:
+    """
+    HyperLogLog sketches in process memory, with Redis' register layout and
+    estimator (Ertl, "New cardinality estimation algorithms for HyperLogLog
+    sketches", 2017).
+    """
+
+    def __init__(self) -> None:
+        self._sketches: defaultdict[str, bytearray] = defaultdict(
+            lambda: bytearray(REGISTERS)
+        )
+
+    def add(self, entry: ViewEntry) -> None:
+        digest = hashlib.blake2b(viewer(entry).encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        register = value & (REGISTERS - 1)
+        rest = value >> INDEX_BITS
+        # Position of the lowest set bit of the remaining 50 bits
+        rank = (rest & -rest).bit_length() if rest else MAX_RANK
+        for key in sketch_keys(entry):
+            sketch = self._sketches[key]
+            if rank > sketch[register]:
+                sketch[register] = rank
+
+    def count(self, keys: list[str]) -> int:
+        merged = bytearray(REGISTERS)
+        for key in keys:
+            if key in self._sketches:
+                merged = bytearray(map(max, merged, self._sketches[key]))
+        histogram = [0] * (MAX_RANK + 1)
+        for rank in merged:
+            histogram[rank] += 1
+        z = REGISTERS * _tau(1 - histogram[MAX_RANK] / REGISTERS)
+        for rank in range(MAX_RANK - 1, 0, -1):
+            z = (z + histogram[rank]) * 0.5
+        z += REGISTERS * _sigma(histogram[0] / REGISTERS)
+        return round(REGISTERS**2 / (2 * math.log(2)) / z)
+
+
+class RedisViewSketches:
+    """Sketches held in Redis, shared across processes and nodes"""
+
+    def __init__(self, prefix: str, retention_days: int) -> None:
+        self.prefix = prefix
+        self.retention = timedelta(days=retention_days)
+
+    @property
+    def client(self) -> Any:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+
+    def add(self, entry: ViewEntry) -> None:
+        day_key, all_time_key = (f"{self.prefix}:{key}" for key in sketch_keys(entry))
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.pfadd(day_key, viewer(entry))
+        pipeline.expire(day_key, self.retention)
+        pipeline.pfadd(all_time_key, viewer(entry))
+        pipeline.execute()
+
+    def count(self, keys: list[str]) -> int:
+        if not keys:
+            return 0
+        return self.client.pfcount(*(f"{self.prefix}:{key}" for key in keys))
+
+
+_sketches: dict[str, LocalViewSketches | RedisViewSketches] = {}
+
+
+def get_view_sketches() -> LocalViewSketches | RedisViewSketches:
+    config = settings.CONTENT_VIEW_SKETCHES
+    backend = config["BACKEND"]
+    if backend not in _sketches:
+        if backend == "local":
+            _sketches[backend] = LocalViewSketches()
+        elif backend == "redis":
+            _sketches[backend] = RedisViewSketches(
+                config["REDIS_PREFIX"], config["RETENTION_DAYS"]
+            )
+        else:
+            raise ValueError(f"Unknown content view sketches: {backend}")
+    return _sketches[backend]
+
+
+def approx_unique_viewers(
+    content_type_id: int, object_id: Any, since: Optional[date] = None
+) -> int:
+    if since is None:
+        keys = [sketch_name(content_type_id, object_id, ALL_TIME)]
+    else:
+        keys = [sketch_name(content_type_id, object_id, day) for day in days_since(since)]
+    return get_view_sketches().count(keys)
@@ -1,3 +1,57 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+
+from .cookie_auth import CookieAuth
+from .instrumentation import export
+from .query_budget import query_budget
+
+
+class AsyncJSONView(View):
+    """
+    Base for async JSON endpoints. DRF views can't be async, so these are
+    plain Django views; like DRF's APIView they are CSRF exempt and rely on
+    the JWT cookie's SameSite policy instead.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    @staticmethod
+    def request_data(request) -> dict:
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                return {}
+            return data if isinstance(data, dict) else {}
+        return request.POST.dict()
+
+    @staticmethod
+    def error(message, status: int = 400) -> JsonResponse:
+        return JsonResponse({"error": message}, status=status)
+
+    @staticmethod
+    async def authenticate(request):
+        """The user of the request's JWT (header or cookie), or None"""
+        # The user cache is synchronous (Redis, then the database)
+        try:
+            result = await sync_to_async(CookieAuth().authenticate)(request)
+        except AuthenticationFailed:
+            return None
+        return result[0] if result else None
+
+
+@require_GET
+@query_budget(0)
+def metrics(request):
+    """Prometheus scrape endpoint, not routed by nginx so it stays internal"""
+    body, content_type = export()
+    return HttpResponse(body, content_type=content_type)
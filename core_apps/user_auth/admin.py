@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _
+
+from core_apps.common.paginator import EstimatedCountPaginator
 from .models import CustomUser as User
 from .forms import UserChangeForm, UserCreationForm
 
@@ -22,7 +24,10 @@ class CustomUserAdmin(UserAdmin):
         "is_active",
     ]
 
-    list_filter = ["email", "is_staff", "role", "is_active"]
+    # Only low-cardinality, indexed columns: filtering on email listed every address
+    list_filter = ["role", "account_status", "is_staff", "is_active"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (_("User Credentials"), {"fields": ("username","email", "password")}),
         (
@@ -0,0 +1,79 @@
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.models import update_last_login
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core_apps.common.benchmarking import benchmark
+from core_apps.common.cookie_auth import CookieAuth
+
+from .managers import generate_username
+
+User = get_user_model()
+
+_serial = count()
+
+
+def benchmark_user(**extra_fields):
+    n = next(_serial)
+    fields = {
+        "email": f"benchmark{n}@example.com",
+        "password": "Secret-pass-123",
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "id_no": f"BENCH{n:05}",
+        "security_question": User.SecurityQuestions.PET_NAME,
+        "security_answer": "Rex",
+    }
+    fields.update(extra_fields)
+    return User.objects.create_user(**fields)
+
+
+def authenticated_request():
+    request = APIRequestFactory().get("/")
+    request.COOKIES[settings.COOKIE_NAME] = str(AccessToken.for_user(benchmark_user()))
+    return request
+
+
+@benchmark("user.cookie_authenticate", setup=authenticated_request)
+def cookie_authenticate(request):
+    CookieAuth().authenticate(request)
+
+
+# Never reach the lockout threshold, its email isn't part of the hot path
+@benchmark(
+    "user.failed_login_attempt", setup=benchmark_user, overrides={"LOGIN_ATTEMPTS": 10**9}
+)
+def failed_login_attempt(user):
+    user.handle_failed_login_attempt()
+
+
+# What a login costs the database around the password check, which hashes
+# with Argon2, so a few calls are enough
+@benchmark("user.login", setup=benchmark_user, number=5)
+def login(user):
+    update_last_login(None, authenticate(email=user.email, password="Secret-pass-123"))
+
+
+@benchmark("user.set_otp", setup=benchmark_user)
+def set_otp(user):
+    user.set_otp("123456")
+
+
+@benchmark("user.set_and_verify_otp", setup=benchmark_user)
+def set_and_verify_otp(user):
+    user.set_otp("123456")
+    user.verify_otp("123456")
+
+
+# Hashes the password with Argon2, a few calls are enough
+@benchmark("user.create_user", number=5)
+def create_user():
+    benchmark_user()
+
+
+@benchmark("user.generate_username")
+def username():
+    generate_username()
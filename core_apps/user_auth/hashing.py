@@ -0,0 +1,20 @@
+"""
+Password hashing for the bulk onboarding process pool.
+
+Kept free of model imports: spawned workers import this module before
+Django is set up.
+"""
+
+
+def init_worker() -> None:
+    # Spawned workers start from a clean interpreter, forking after the
+    # executor started its threads can deadlock the children
+    import django
+
+    django.setup()
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    from django.contrib.auth.hashers import make_password
+
+    return [make_password(password) for password in passwords]
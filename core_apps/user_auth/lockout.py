@@ -0,0 +1,107 @@
+"""
+Failed login tracking and account lockout.
+
+Every state change is a single conditional UPDATE, so concurrent bad logins
+from different gunicorn workers can never lose an increment, and only the
+lockout columns are written instead of the whole user row.
+"""
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.utils import timezone
+
+from core_apps.common.user_cache import invalidate_user_on_commit
+
+# PositiveSmallIntegerField upper bound
+MAX_FAILED_ATTEMPTS = 32767
+
+
+class LockoutState(NamedTuple):
+    failed_login_attempts: int
+    account_status: str
+    last_failed_login: datetime
+    just_locked: bool
+
+
+def register_failed_login(user_id: Any) -> Optional[LockoutState]:
+    """
+    Increment the failed attempts, check the threshold and lock the account
+    in one ``UPDATE ... RETURNING``. ``just_locked`` is only True for the
+    attempt that crossed the threshold.
+    """
+    User = get_user_model()
+    opts = User._meta
+    locked = User.AccountStatus.LOCKED
+    threshold = settings.LOGIN_ATTEMPTS
+    attempts = opts.get_field("failed_login_attempts").column
+    last_failed = opts.get_field("last_failed_login").column
+    status = opts.get_field("account_status").column
+    pk = opts.pk.column
+    now = timezone.now()
+
+    sql = (
+        f"UPDATE {opts.db_table} SET "
+        f"{attempts} = CASE WHEN {attempts} < %s THEN {attempts} + 1 ELSE {attempts} END, "
+        f"{last_failed} = %s, "
+        f"{status} = CASE WHEN {attempts} + 1 >= %s THEN %s ELSE {status} END "
+        f"WHERE {pk} = %s "
+        f"RETURNING {attempts}, {status}"
+    )
+    db = router.db_for_write(User)
+    with connections[db].cursor() as cursor:
+        cursor.execute(
+            sql,
+            [
+                MAX_FAILED_ATTEMPTS,
+                now,
+                threshold,
+                locked,
+                opts.pk.get_db_prep_value(user_id, connections[db]),
+            ],
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+    # Plain UPDATEs send no post_save, so drop the cached user by hand
+    invalidate_user_on_commit(user_id)
+    failed_attempts, account_status = row
+    return LockoutState(
+        failed_login_attempts=failed_attempts,
+        account_status=account_status,
+        last_failed_login=now,
+        just_locked=failed_attempts == threshold,
+    )
+
+
+def reset_failed_logins(user_id: Any) -> None:
+    User = get_user_model()
+    User.objects.filter(pk=user_id).update(
+        failed_login_attempts=0,
+        last_failed_login=None,
+        account_status=User.AccountStatus.ACTIVE,
+    )
+    invalidate_user_on_commit(user_id)
+
+
+def unlock_if_expired(user_id: Any) -> bool:
+    """
+    Unlock the account only if it is still locked and the lockout window has
+    passed. Returns True when this call performed the unlock.
+    """
+    User = get_user_model()
+    unlocked = User.objects.filter(
+        pk=user_id,
+        account_status=User.AccountStatus.LOCKED,
+        last_failed_login__lt=timezone.now() - settings.LOCKOUT_DURATION,
+    ).update(
+        failed_login_attempts=0,
+        last_failed_login=None,
+        account_status=User.AccountStatus.ACTIVE,
+    )
+    if unlocked:
+        invalidate_user_on_commit(user_id)
+    return bool(unlocked)
@@ -0,0 +1,108 @@
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+User = get_user_model()
+
+
+def read_csv(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open(newline="", encoding="utf-8") as file:
+        yield from csv.DictReader(file)
+
+
+def read_ndjson(path: Path) -> Iterator[dict[str, Any]]:
+    with path.open(encoding="utf-8") as file:
+        for line_no, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"_error": f"Line {line_no}: invalid JSON ({e})"}
+                continue
+            if isinstance(row, dict):
+                yield row
+            else:
+                yield {"_error": f"Line {line_no}: expected an object, got {type(row).__name__}"}
+
+
+class Command(BaseCommand):
+    """
+    Onboard customers in bulk from a CSV or NDJSON file. The input is
+    streamed, passwords are hashed in a process pool and users and profiles
+    are written with chunked bulk inserts. Rejected rows (without their
+    password) are written as NDJSON to the reject file.
+    """
+
+    help = "Bulk onboard customers from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path, help="CSV or NDJSON input file")
+        parser.add_argument(
+            "--format", choices=["csv", "ndjson"], help="Defaults to the file extension"
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers", type=int, default=None, help="Hashing processes, defaults to CPU count"
+        )
+        parser.add_argument(
+            "--rejects", type=Path, default=None, help="Defaults to <path>.rejects.ndjson"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path.is_file():
+            raise CommandError(f"{path} does not exist")
+
+        input_format = options["format"] or (
+            "csv" if path.suffix.lower() == ".csv" else "ndjson"
+        )
+        rows = read_csv(path) if input_format == "csv" else read_ndjson(path)
+        rejects_path = options["rejects"] or path.with_suffix(".rejects.ndjson")
+        start = time.perf_counter()
+        rejected = 0
+
+        with rejects_path.open("w", encoding="utf-8") as rejects:
+
+            def on_reject(row: dict[str, Any], reason: str) -> None:
+                nonlocal rejected
+                rejected += 1
+                row = {key: value for key, value in row.items() if key != "password"}
+                rejects.write(json.dumps({"row": row, "reason": reason}) + "\n")
+
+            def on_progress(created: int, _: int) -> None:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"Onboarded {created} users, rejected {rejected} "
+                    f"({(created + rejected) / elapsed:.0f} rows/s)"
+                )
+                sys.stdout.flush()
+
+            created = User.objects.bulk_create_users(
+                (row for row in rows if not self._invalid_line(row, on_reject)),
+                chunk_size=options["chunk_size"],
+                workers=options["workers"],
+                on_reject=on_reject,
+                on_progress=on_progress,
+            )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Onboarded {created} users in {elapsed:.1f}s "
+                f"({created / elapsed if elapsed else 0:.0f} users/s), "
+                f"{rejected} rejected rows in {rejects_path}"
+            )
+        )
+
+    def _invalid_line(self, row: dict[str, Any], on_reject) -> bool:
+        if "_error" in row:
+            on_reject({}, row["_error"])
+            return True
+        return False
@@ -1,25 +1,66 @@
-import random
+import multiprocessing
 import string
-from os import getenv
-from typing import Any
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from os import cpu_count, getenv
+from typing import Any, Callable, Iterable, Optional
 
+from django.apps import apps
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
 from django.utils.translation import gettext_lazy as _
 
+from . import hashing
 
-def generate_username() -> str:
+
+USERNAME_LENGTH = 12
+USERNAME_ALPHABET = string.ascii_uppercase + string.digits
+USERNAME_SEQUENCE = "user_auth_username_seq"
+# Odd and not a multiple of 3, so multiplying by it permutes 0..36**n - 1.
+# Consecutive sequence values therefore do not give consecutive usernames.
+USERNAME_MULTIPLIER = 2654435761
+
+@lru_cache(maxsize=None)
+def username_prefix() -> str:
     bank_name = getenv("BANK_NAME")
     words = bank_name.split(" ")
-    prefix = "".join([word[0] for word in words])
-    remaining_length = 12 - len(prefix) - 1
-    random_chars = "".join(
-        random.choices(string.ascii_uppercase + string.digits, k=remaining_length)
-    )
-    username = f"{prefix}-{random_chars}"
-    return username
+    return "".join([word[0] for word in words])
+
+def encode_username(value: int) -> str:
+    """
+    Map a sequence value to a unique username. The mapping is a bijection,
+    so distinct values can never produce the same username.
+    """
+    prefix = username_prefix()
+    remaining_length = USERNAME_LENGTH - len(prefix) - 1
+    space = len(USERNAME_ALPHABET) ** remaining_length
+    if not 0 <= value < space:
+        raise ValueError("The username space for this prefix is exhausted")
+
+    scrambled = value * USERNAME_MULTIPLIER % space
+    chars = []
+    for _ in range(remaining_length):
+        scrambled, index = divmod(scrambled, len(USERNAME_ALPHABET))
+        chars.append(USERNAME_ALPHABET[index])
+    return f"{prefix}-{''.join(chars)}"
+
+def allocate_usernames(count: int, using: Optional[str] = None) -> list[str]:
+    """Reserve ``count`` usernames with a single sequence round trip"""
+    if count <= 0:
+        return []
+    with connections[using or DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            f"SELECT nextval('{USERNAME_SEQUENCE}') FROM generate_series(1, %s)",
+            [count],
+        )
+        return [encode_username(value) for (value,) in cursor.fetchall()]
+
+def generate_username() -> str:
+    return allocate_usernames(1)[0]
 
 def validate_email_address(email: str) -> None:
     try:
@@ -29,6 +70,18 @@ def validate_email_address(email: str) -> None:
             _("Enter a valid email address"), code="invalid_email_address"
         )
 
+BULK_USER_FIELDS = {
+    "email",
+    "password",
+    "first_name",
+    "middle_name",
+    "last_name",
+    "id_no",
+    "security_question",
+    "security_answer",
+    "role",
+}
+
 class UserManager(DjangoUserManager):
     def _create_user(self, email:str, password:str, **extra_fields):
         if not email:
@@ -37,7 +90,7 @@ class UserManager(DjangoUserManager):
         if not password:
             raise ValueError("The given password must be set")
         
-        username = generate_username()
+        username = allocate_usernames(1, using=self._db)[0]
         email = self.normalize_email(email)
         validate_email_address(email)
 
@@ -65,4 +118,157 @@ class UserManager(DjangoUserManager):
         if extra_fields.get("is_staff") is not True:
             raise ValueError("Superuser must have is_staff=True.")
 
-        return self._create_user(email, password, **extra_fields)
\ No newline at end of file
+        return self._create_user(email, password, **extra_fields)
+
+    def bulk_create_users(
+        self,
+        rows: Iterable[dict[str, Any]],
+        chunk_size: int = 1000,
+        workers: Optional[int] = None,
+        on_reject: Optional[Callable[[dict[str, Any], str], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> int:
+        """
+        Create users and their profiles from a stream of rows, ``chunk_size``
+        at a time. Passwords are hashed in a process pool while the previous
+        chunk is written, and each chunk is written with ``bulk_create``.
+        Invalid rows are passed to ``on_reject(row, reason)``.
+        Returns the number of users created.
+        """
+        workers = workers or cpu_count() or 1
+        created = rejected = 0
+        seen_emails: set[str] = set()
+        seen_id_nos: set[str] = set()
+
+        def reject(row: dict[str, Any], reason: str) -> None:
+            nonlocal rejected
+            rejected += 1
+            if on_reject:
+                on_reject(row, reason)
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=hashing.init_worker,
+        ) as pool:
+            pending = None
+            rows = iter(rows)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                users = self._prepare_bulk_users(chunk, seen_emails, seen_id_nos, reject)
+                hash_futures = self._hash_in_pool(pool, workers, users) if users else None
+                if pending is not None:
+                    created += self._write_bulk_users(*pending, reject)
+                    if on_progress:
+                        on_progress(created, rejected)
+                if not chunk:
+                    break
+                pending = (users, hash_futures) if users else None
+        return created
+
+    def _prepare_bulk_users(
+        self,
+        chunk: list[dict[str, Any]],
+        seen_emails: set[str],
+        seen_id_nos: set[str],
+        reject: Callable[[dict[str, Any], str], None],
+    ) -> list[tuple[Any, dict[str, Any]]]:
+        candidates = []
+        for row in chunk:
+            fields = {
+                key: value
+                for key, value in row.items()
+                if key in BULK_USER_FIELDS and value
+            }
+            missing = [
+                field
+                for field in ["email", "password", *self.model.REQUIRED_FIELDS]
+                if not fields.get(field)
+            ]
+            if missing:
+                reject(row, f"Missing fields: {', '.join(missing)}")
+                continue
+            fields["email"] = self.normalize_email(fields["email"])
+            try:
+                validate_email_address(fields["email"])
+            except ValidationError as e:
+                reject(row, " ".join(e.messages))
+                continue
+            if fields["email"] in seen_emails or fields["id_no"] in seen_id_nos:
+                reject(row, "Duplicate email or ID number in input")
+                continue
+            seen_emails.add(fields["email"])
+            seen_id_nos.add(fields["id_no"])
+            candidates.append((fields, row))
+
+        existing_emails = set(
+            self.filter(email__in=[fields["email"] for fields, _ in candidates])
+            .values_list("email", flat=True)
+        )
+        existing_id_nos = set(
+            self.filter(id_no__in=[fields["id_no"] for fields, _ in candidates])
+            .values_list("id_no", flat=True)
+        )
+
+        users = []
+        for fields, row in candidates:
+            if fields["email"] in existing_emails or fields["id_no"] in existing_id_nos:
+                reject(row, "User with this email or ID number already exists")
+                continue
+            user = self.model(**fields)
+            try:
+                user.clean_fields(exclude=["password", "username"])
+            except ValidationError as e:
+                reject(
+                    row,
+                    "; ".join(
+                        f"{field}: {' '.join(errors)}"
+                        for field, errors in e.message_dict.items()
+                    ),
+                )
+                continue
+            users.append((user, row))
+
+        for (user, _), username in zip(users, allocate_usernames(len(users), self._db)):
+            user.username = username
+        return users
+
+    def _hash_in_pool(
+        self, pool: Executor, workers: int, users: list[tuple[Any, dict[str, Any]]]
+    ) -> list:
+        passwords = [user.password for user, _ in users]
+        # A few slices per worker keeps every process busy until the chunk is done
+        size = max(1, len(passwords) // (workers * 4))
+        return [
+            pool.submit(hashing.hash_passwords, passwords[start : start + size])
+            for start in range(0, len(passwords), size)
+        ]
+
+    def _write_bulk_users(
+        self,
+        users: list[tuple[Any, dict[str, Any]]],
+        hash_futures: list,
+        reject: Callable[[dict[str, Any], str], None],
+    ) -> int:
+        hashed = [password for future in hash_futures for password in future.result()]
+        for (user, _), password in zip(users, hashed):
+            user.password = password
+
+        Profile = apps.get_model("user_profile", "Profile")
+        try:
+            with transaction.atomic(using=self._db):
+                created = self.bulk_create([user for user, _ in users])
+                Profile.objects.create_for_users(created)
+            return len(created)
+        except IntegrityError:
+            # A conflicting row slipped in, isolate it by writing one by one
+            created = []
+            for user, row in users:
+                try:
+                    with transaction.atomic(using=self._db):
+                        user.save(using=self._db)
+                    created.append(user)
+                except IntegrityError as e:
+                    reject(row, str(e))
+            Profile.objects.create_for_users(created)
+            return len(created)
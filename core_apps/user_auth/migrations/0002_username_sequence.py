@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from core_apps.user_auth.managers import USERNAME_SEQUENCE
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_auth", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f"CREATE SEQUENCE IF NOT EXISTS {USERNAME_SEQUENCE}",
+            reverse_sql=f"DROP SEQUENCE IF EXISTS {USERNAME_SEQUENCE}",
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.15 on 2026-10-18 01:42
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are built without locking the table against writes
+    atomic = False
+
+    dependencies = [
+        ("user_auth", "0002_username_sequence"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="customuser",
+            index=models.Index(fields=["role"], name="user_role"),
+        ),
+        AddIndexConcurrently(
+            model_name="customuser",
+            index=models.Index(fields=["account_status"], name="user_account_status"),
+        ),
+    ]
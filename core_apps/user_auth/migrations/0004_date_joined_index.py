@@ -0,0 +1,20 @@
+# Generated by Django 4.2.15 on 2026-10-18 03:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The index is built without locking the table against writes
+    atomic = False
+
+    dependencies = [
+        ("user_auth", "0003_role_account_status_indexes"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="customuser",
+            index=models.Index(fields=["-date_joined"], name="user_date_joined"),
+        ),
+    ]
@@ -5,8 +5,12 @@ from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from core_apps.common.query_budget import query_budget
+
+from . import lockout
 from .emails import send_account_locked_email
 from .managers import UserManager
+from .otp import get_otp_backend
 
 class CustomUser(AbstractUser):
     class SecurityQuestions(models.TextChoices):
@@ -76,34 +80,31 @@ class CustomUser(AbstractUser):
         "security_answer",
     ]
     
+    @query_budget(1)
     def set_otp(self, otp: str)-> None:
-        self.otp = otp,
-        self.otp_expiry_time = timezone.now() + settings.OTP_EXPIRATION
-        self.save()
+        get_otp_backend().issue(self, otp)
     
+    @query_budget(2)
     def verify_otp(self, otp:str)-> bool:
-        if self.otp == otp and self.otp_expiry_time > timezone.now():
-            self.otp = ""
-            self.otp_expiry_time = None
-            self.save()
-            return True
-        
-        return False
+        return get_otp_backend().verify(self, otp)
 
+    # 1, and 3 for the email when the account gets locked
+    @query_budget(4)
     def handle_failed_login_attempt(self) -> None:
-        self.failed_login_attempts += 1
-        self.last_failed_login = timezone.now()
-        if self.failed_login_attempts >= settings.LOGIN_ATTEMPTS:
-            self.account_status = self.AccountStatus.LOCKED
-            self.save()
+        state = lockout.register_failed_login(self.pk)
+        if state is None:
+            return
+        self.failed_login_attempts = state.failed_login_attempts
+        self.last_failed_login = state.last_failed_login
+        self.account_status = state.account_status
+        if state.just_locked:
             send_account_locked_email(self)
-        self.save()
     
     def reset_failed_login_attempts(self) -> None:
+        lockout.reset_failed_logins(self.pk)
         self.failed_login_attempts = 0
         self.last_failed_login = None
         self.account_status = self.AccountStatus.ACTIVE
-        self.save()
 
     def unlock_account(self) -> None:
         if self.is_locked:
@@ -114,8 +115,10 @@ class CustomUser(AbstractUser):
             if (
                 timezone.now() - self.last_failed_login
                 > settings.LOCKOUT_DURATION
-            ):
-                self.unlock_account()
+            ) and lockout.unlock_if_expired(self.pk):
+                self.failed_login_attempts = 0
+                self.last_failed_login = None
+                self.account_status = self.AccountStatus.ACTIVE
                 return True
         return False
 
@@ -131,6 +134,13 @@ class CustomUser(AbstractUser):
         verbose_name = _("User")    
         verbose_name_plural = _("Users")
         ordering = ["-date_joined"]
+        indexes = [
+            # The admin filters on these
+            models.Index(fields=["role"], name="user_role"),
+            models.Index(fields=["account_status"], name="user_account_status"),
+            # Default querysets, and so the user lists, sort on it
+            models.Index(fields=["-date_joined"], name="user_date_joined"),
+        ]
     
     def has_role(self, role_name:str) -> bool:
         return hasattr(self, "role") and self.role == role_name
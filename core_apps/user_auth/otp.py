@@ -0,0 +1,121 @@
+"""
+Pluggable OTP storage.
+
+``OTP_BACKEND`` selects where one-time passwords live:
+- ``RedisOTPBackend``: the code is stored in Redis with a native TTL of
+  ``OTP_EXPIRATION``; verification compares, counts the attempt and consumes
+  the code in one Lua script, so it never touches the users table. While
+  Redis can't be reached, codes are issued and verified by the database
+  backend instead.
+- ``DatabaseOTPBackend``: the ``otp``/``otp_expiry_time`` columns on the user,
+  written with targeted updates.
+"""
+from functools import lru_cache
+from typing import Any
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from loguru import logger
+from redis.exceptions import RedisError
+
+
+class BaseOTPBackend:
+    def issue(self, user: Any, otp: str) -> None:
+        raise NotImplementedError
+
+    def verify(self, user: Any, otp: str) -> bool:
+        """Return True and consume the OTP if it matches and has not expired"""
+        raise NotImplementedError
+
+
+class DatabaseOTPBackend(BaseOTPBackend):
+    def issue(self, user: Any, otp: str) -> None:
+        user.otp = otp
+        user.otp_expiry_time = timezone.now() + settings.OTP_EXPIRATION
+        type(user).objects.filter(pk=user.pk).update(
+            otp=user.otp, otp_expiry_time=user.otp_expiry_time
+        )
+
+    def verify(self, user: Any, otp: str) -> bool:
+        # The filter makes compare-and-consume a single conditional UPDATE
+        consumed = type(user).objects.filter(
+            pk=user.pk, otp=otp, otp_expiry_time__gt=timezone.now()
+        ).update(otp=None, otp_expiry_time=None)
+        if consumed:
+            user.otp = None
+            user.otp_expiry_time = None
+        return bool(consumed)
+
+
+class RedisOTPBackend(BaseOTPBackend):
+    # KEYS[1]: otp hash, ARGV[1]: submitted code, ARGV[2]: max attempts
+    # Returns 1 on success, 0 on a wrong code, -1 when there is no live code
+    # and -2 when this attempt used up the allowance (the code is discarded)
+    VERIFY_SCRIPT = """
+    local code = redis.call('HGET', KEYS[1], 'code')
+    if not code then
+        return -1
+    end
+    if code == ARGV[1] then
+        redis.call('DEL', KEYS[1])
+        return 1
+    end
+    local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+    if attempts >= tonumber(ARGV[2]) then
+        redis.call('DEL', KEYS[1])
+        return -2
+    end
+    return 0
+    """
+
+    key_prefix = "otp"
+
+    def __init__(self) -> None:
+        self._verify = None
+        self.fallback = DatabaseOTPBackend()
+
+    @property
+    def client(self) -> Any:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+
+    def key(self, user: Any) -> str:
+        return f"{self.key_prefix}:{user.pk}"
+
+    def issue(self, user: Any, otp: str) -> None:
+        ttl = int(settings.OTP_EXPIRATION.total_seconds() * 1000)
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.delete(self.key(user))
+            pipe.hset(self.key(user), mapping={"code": otp, "attempts": 0})
+            pipe.pexpire(self.key(user), ttl)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"OTP stored in the database, Redis unavailable: {e}")
+            self.fallback.issue(user, otp)
+
+    def verify(self, user: Any, otp: str) -> bool:
+        try:
+            if self._verify is None:
+                self._verify = self.client.register_script(self.VERIFY_SCRIPT)
+            result = self._verify(
+                keys=[self.key(user)], args=[otp, settings.OTP_MAX_ATTEMPTS]
+            )
+        except RedisError as e:
+            logger.warning(f"OTP checked in the database, Redis unavailable: {e}")
+            return self.fallback.verify(user, otp)
+        if result == -1 and user.otp:
+            # Issued to the database while Redis was down
+            return self.fallback.verify(user, otp)
+        return result == 1
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path: str) -> BaseOTPBackend:
+    return import_string(path)()
+
+
+def get_otp_backend() -> BaseOTPBackend:
+    return _load_backend(settings.OTP_BACKEND)
@@ -0,0 +1,419 @@
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .managers import USERNAME_LENGTH, allocate_usernames, encode_username
+from .models import CustomUser as User
+from .otp import RedisOTPBackend
+
+
+def make_user(**extra_fields) -> User:
+    fields = {
+        "email": "customer@example.com",
+        "password": "Secret-pass-123",
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "id_no": "1234567890",
+        "security_question": User.SecurityQuestions.PET_NAME,
+        "security_answer": "Rex",
+    }
+    fields.update(extra_fields)
+    return User.objects.create_user(**fields)
+
+
+class UsernameAllocationTests(TestCase):
+    def test_usernames_are_unique_and_fixed_length(self):
+        with self.assertNumQueries(1):
+            usernames = allocate_usernames(5000)
+
+        self.assertEqual(len(set(usernames)), 5000)
+        self.assertTrue(all(len(username) == USERNAME_LENGTH for username in usernames))
+
+    def test_encoding_is_a_bijection(self):
+        self.assertEqual(len({encode_username(value) for value in range(100000)}), 100000)
+
+
+class ChangelistQueryCountMixin:
+    """
+    Asserts an admin changelist costs the same number of queries whatever
+    the number of rows, i.e. it has no N+1.
+    """
+
+    changelist = None
+
+    def create_rows(self, count: int) -> None:
+        raise NotImplementedError
+
+    def changelist_queries(self) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(self.changelist))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_constant(self):
+        admin_user = User.objects.create_superuser(
+            email="admin@example.com",
+            password="Admin-pass-123",
+            first_name="Admin",
+            last_name="User",
+            id_no="ADMIN00001",
+            security_question=User.SecurityQuestions.PET_NAME,
+            security_answer="Admin",
+        )
+        self.client.force_login(admin_user)
+        self.create_rows(1)
+        baseline = self.changelist_queries()
+        self.create_rows(10)
+        self.assertEqual(self.changelist_queries(), baseline)
+
+
+class CustomUserAdminTests(ChangelistQueryCountMixin, TestCase):
+    changelist = "admin:user_auth_customuser_changelist"
+
+    def create_rows(self, count: int) -> None:
+        start = User.objects.count()
+        for i in range(start, start + count):
+            make_user(email=f"customer{i}@example.com", id_no=f"ID{i:08}")
+
+
+def redis_available() -> bool:
+    try:
+        return RedisOTPBackend().client.ping()
+    except Exception:
+        return False
+
+
+@override_settings(OTP_BACKEND="core_apps.user_auth.otp.DatabaseOTPBackend")
+class DatabaseOTPTests(TestCase):
+    def test_otp_is_consumed_once(self):
+        user = make_user()
+        user.set_otp("123456")
+        user.refresh_from_db()
+        self.assertEqual(user.otp, "123456")
+
+        self.assertFalse(user.verify_otp("654321"))
+        self.assertTrue(user.verify_otp("123456"))
+        self.assertFalse(user.verify_otp("123456"))
+
+    def test_expired_otp_is_rejected(self):
+        user = make_user()
+        user.set_otp("123456")
+        User.objects.filter(pk=user.pk).update(otp_expiry_time=timezone.now())
+        self.assertFalse(user.verify_otp("123456"))
+
+
+@override_settings(
+    OTP_BACKEND="core_apps.user_auth.otp.RedisOTPBackend", OTP_MAX_ATTEMPTS=3
+)
+class RedisOTPTests(TestCase):
+    def setUp(self):
+        if not redis_available():
+            self.skipTest("Redis is not available")
+        self.user = make_user()
+
+    def test_otp_never_touches_the_users_table(self):
+        with self.assertNumQueries(0):
+            self.user.set_otp("123456")
+            self.assertTrue(self.user.verify_otp("123456"))
+            self.assertFalse(self.user.verify_otp("123456"))
+
+    def test_otp_is_discarded_after_max_attempts(self):
+        self.user.set_otp("123456")
+        for _ in range(3):
+            self.assertFalse(self.user.verify_otp("000000"))
+        self.assertFalse(self.user.verify_otp("123456"))
+
+
+@override_settings(OTP_BACKEND="core_apps.user_auth.otp.RedisOTPBackend")
+class RedisOTPFallbackTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        broken = mock.Mock()
+        broken.pipeline.side_effect = broken.register_script.side_effect = RedisError("down")
+        patcher = mock.patch.object(
+            RedisOTPBackend, "client", new_callable=mock.PropertyMock, return_value=broken
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_otp_goes_through_the_database_without_redis(self):
+        self.user.set_otp("123456")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.otp, "123456")
+
+        self.assertFalse(self.user.verify_otp("654321"))
+        self.assertTrue(self.user.verify_otp("123456"))
+        self.assertFalse(self.user.verify_otp("123456"))
+
+
+class FailedLoginTests(TestCase):
+    def test_locks_account_at_threshold(self):
+        user = make_user()
+        for attempt in range(settings.LOGIN_ATTEMPTS):
+            user.handle_failed_login_attempt()
+
+        user.refresh_from_db()
+        self.assertTrue(user.is_locked)
+        self.assertEqual(user.failed_login_attempts, settings.LOGIN_ATTEMPTS)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_attempt_is_a_single_query(self):
+        user = make_user()
+        with self.assertNumQueries(1):
+            user.handle_failed_login_attempt()
+
+    def test_unlock_if_expired(self):
+        user = make_user()
+        for attempt in range(settings.LOGIN_ATTEMPTS):
+            user.handle_failed_login_attempt()
+        self.assertFalse(user.unlock_if_expired())
+
+        expired = timezone.now() - settings.LOCKOUT_DURATION - timedelta(seconds=1)
+        User.objects.filter(pk=user.pk).update(last_failed_login=expired)
+        user.refresh_from_db()
+        self.assertTrue(user.unlock_if_expired())
+
+        user.refresh_from_db()
+        self.assertFalse(user.is_locked)
+        self.assertEqual(user.failed_login_attempts, 0)
+
+
+class ConcurrentFailedLoginTests(TransactionTestCase):
+    threads = 8
+    attempts_per_thread = 25
+
+    def test_concurrent_attempts_are_not_lost(self):
+        user = make_user()
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def hammer():
+            try:
+                # Each thread works on its own stale copy, like separate workers
+                stale_user = User.objects.get(pk=user.pk)
+                barrier.wait()
+                for _ in range(self.attempts_per_thread):
+                    stale_user.handle_failed_login_attempt()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=hammer) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        user.refresh_from_db()
+        self.assertEqual(
+            user.failed_login_attempts, self.threads * self.attempts_per_thread
+        )
+        self.assertTrue(user.is_locked)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(OTP_BACKEND="core_apps.user_auth.otp.DatabaseOTPBackend")
+class AsyncLoginTests(TransactionTestCase):
+    # Password checks and emails run on the offload pool's own connections,
+    # so the data has to be committed
+
+    async def login(self, password="Secret-pass-123"):
+        return await self.async_client.post(
+            reverse("login"),
+            {"email": "customer@example.com", "password": password},
+            content_type="application/json",
+        )
+
+    async def test_login_with_otp_then_read_and_edit_profile(self):
+        user = await sync_to_async(make_user)()
+
+        response = await self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 1)
+
+        await user.arefresh_from_db()
+        response = await self.async_client.post(
+            reverse("verify_otp"),
+            {"email": user.email, "otp": user.otp},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.COOKIE_NAME, response.cookies)
+
+        response = await self.async_client.get(reverse("my_profile"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["email"], user.email)
+
+        response = await self.async_client.patch(
+            reverse("my_profile"),
+            {"city": "Quito", "marital_status": "single"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["city"], "Quito")
+
+    async def test_wrong_password_counts_a_failed_attempt(self):
+        user = await sync_to_async(make_user)()
+
+        response = await self.login(password="wrong-password")
+        self.assertEqual(response.status_code, 400)
+        await user.arefresh_from_db()
+        self.assertEqual(user.failed_login_attempts, 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    async def verify(self, otp):
+        return await self.async_client.post(
+            reverse("verify_otp"),
+            {"email": "customer@example.com", "otp": otp},
+            content_type="application/json",
+        )
+
+    async def test_wrong_otps_count_towards_the_lockout(self):
+        user = await sync_to_async(make_user)()
+        await sync_to_async(user.set_otp)("123456")
+
+        for attempt in range(settings.LOGIN_ATTEMPTS):
+            response = await self.verify("654321")
+            self.assertEqual(response.status_code, 400)
+        await user.arefresh_from_db()
+        self.assertTrue(user.is_locked)
+
+        # The right code no longer helps once the account is locked
+        response = await self.verify("123456")
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn(settings.COOKIE_NAME, response.cookies)
+
+    async def test_profile_requires_authentication(self):
+        response = await self.async_client.get(reverse("my_profile"))
+        self.assertEqual(response.status_code, 401)
+
+
+def onboarding_row(n: int, **fields) -> dict:
+    row = {
+        "email": f"onboard{n}@example.com",
+        "password": "Secret-pass-123",
+        "first_name": "Jane",
+        "last_name": "Doe",
+        "id_no": f"OB{n:08}",
+        "security_question": User.SecurityQuestions.PET_NAME,
+        "security_answer": "Rex",
+    }
+    row.update(fields)
+    return row
+
+
+class BulkOnboardingTests(TestCase):
+    def setUp(self):
+        self.rejects = []
+        self.progress = []
+
+    def onboard(self, rows, **options):
+        return User.objects.bulk_create_users(
+            rows,
+            workers=1,
+            on_reject=lambda row, reason: self.rejects.append((row.get("email"), reason)),
+            on_progress=lambda created, rejected: self.progress.append((created, rejected)),
+            **options,
+        )
+
+    def test_users_and_profiles_are_created_chunk_by_chunk(self):
+        created = self.onboard([onboarding_row(n) for n in range(5)], chunk_size=2)
+
+        self.assertEqual(created, 5)
+        self.assertEqual(self.progress, [(2, 0), (4, 0), (5, 0)])
+        user = User.objects.select_related("profile").get(email="onboard4@example.com")
+        self.assertTrue(user.check_password("Secret-pass-123"))
+        self.assertIsNotNone(user.profile.pk)
+        self.assertEqual(len(user.username), USERNAME_LENGTH)
+
+    def test_invalid_rows_are_rejected(self):
+        make_user(email="onboard9@example.com", id_no="TAKEN00001")
+        rows = [
+            onboarding_row(1),
+            onboarding_row(2, password=""),
+            onboarding_row(3, email="not-an-email"),
+            onboarding_row(4, id_no="OB00000001"),
+            onboarding_row(9),
+            onboarding_row(5, security_question="favourite colour"),
+        ]
+
+        self.assertEqual(self.onboard(rows), 1)
+        reasons = dict(self.rejects)
+        self.assertEqual(reasons["onboard2@example.com"], "Missing fields: password")
+        self.assertIn("not-an-email", reasons)
+        self.assertEqual(reasons["onboard4@example.com"], "Duplicate email or ID number in input")
+        self.assertEqual(
+            reasons["onboard9@example.com"], "User with this email or ID number already exists"
+        )
+        self.assertIn("security_question", reasons["onboard5@example.com"])
+        self.assertEqual(self.progress, [(1, 5)])
+
+    def test_a_conflict_after_the_checks_rejects_only_its_row(self):
+        def on_progress(created, rejected):
+            # Registered between the second chunk's checks and its write
+            if not self.progress:
+                make_user(email="onboard2@example.com", id_no="TAKEN00001")
+            self.progress.append((created, rejected))
+
+        created = User.objects.bulk_create_users(
+            [onboarding_row(n) for n in range(4)],
+            chunk_size=2,
+            workers=1,
+            on_reject=lambda row, reason: self.rejects.append((row["email"], reason)),
+            on_progress=on_progress,
+        )
+
+        self.assertEqual(created, 3)
+        self.assertEqual([email for email, _ in self.rejects], ["onboard2@example.com"])
+        self.assertTrue(User.objects.get(email="onboard3@example.com").profile.pk)
+        self.assertEqual(User.objects.get(email="onboard2@example.com").id_no, "TAKEN00001")
+
+    def test_command_reports_unreadable_lines_without_passwords(self):
+        lines = [
+            json.dumps(onboarding_row(1)),
+            "{not json",
+            "[]",
+            "1",
+            '"x"',
+            "",
+            json.dumps(onboarding_row(2, first_name="")),
+            json.dumps(onboarding_row(3)),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "customers.ndjson"
+            path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            call_command(
+                "bulk_onboard", str(path), "--workers", "1", "--chunk-size", "1", stdout=StringIO()
+            )
+            rejects = [
+                json.loads(line)
+                for line in path.with_suffix(".rejects.ndjson").read_text().splitlines()
+            ]
+
+        self.assertEqual(
+            set(User.objects.values_list("email", flat=True)),
+            {"onboard1@example.com", "onboard3@example.com"},
+        )
+        self.assertEqual(
+            [reject["reason"].split(":")[0] for reject in rejects],
+            ["Line 2", "Line 3", "Line 4", "Line 5", "Missing fields"],
+        )
+        self.assertIn("expected an object, got list", rejects[1]["reason"])
+        self.assertNotIn("password", rejects[4]["row"])
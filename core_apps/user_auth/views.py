@@ -0,0 +1,144 @@
+"""
+Two-step login: the password is checked and an OTP emailed, then the OTP is
+exchanged for JWT cookies.
+
+The views are async. ORM calls use Django's async API (or ``sync_to_async``
+for model methods), password hashing and email delivery run on the bounded
+offload pool, so a login waiting on argon2 or SMTP never blocks the event
+loop nor the thread that serves everyone's queries.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from loguru import logger
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core_apps.common.offload import offload
+from core_apps.common.query_budget import query_budget
+from core_apps.common.throttling import LoginRateThrottle
+from core_apps.common.views import AsyncJSONView
+
+from .emails import sent_otp_email
+from .models import CustomUser as User
+from .utils import generate_otp
+
+
+def set_auth_cookies(response, access_token: str, refresh_token: str) -> None:
+    options = {
+        "path": settings.COOKIE_PATH,
+        "secure": settings.COOKIE_SECURE,
+        "httponly": settings.COOKIE_HTTPONLY,
+        "samesite": settings.COOKIE_SAMESITE,
+    }
+    response.set_cookie(
+        settings.COOKIE_NAME,
+        access_token,
+        max_age=int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+        **options,
+    )
+    response.set_cookie(
+        "refresh",
+        refresh_token,
+        max_age=int(jwt_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+        **options,
+    )
+    response.set_cookie(
+        "logged_in", "true", path=settings.COOKIE_PATH, samesite=settings.COOKIE_SAMESITE
+    )
+
+
+async def throttled(request) -> JsonResponse | None:
+    throttle = LoginRateThrottle()
+    if await offload(throttle.allow_request, request, None):
+        return None
+    response = AsyncJSONView.error(_("Too many login attempts."), status=429)
+    response["Retry-After"] = str(int(throttle.wait() or 0) + 1)
+    return response
+
+
+async def locked(user: User) -> JsonResponse | None:
+    if not user.is_locked or await sync_to_async(user.unlock_if_expired)():
+        return None
+    minutes = int(settings.LOCKOUT_DURATION.total_seconds() // 60)
+    return AsyncJSONView.error(
+        _("Account is locked, try again in %(minutes)s minutes.") % {"minutes": minutes},
+        status=403,
+    )
+
+
+class LoginView(AsyncJSONView):
+    # The OTP email takes 3 queries when delivered in the request (tests), 1
+    # when queued for Celery
+    @query_budget(6)
+    async def post(self, request):
+        if response := await throttled(request):
+            return response
+
+        data = self.request_data(request)
+        email, password = data.get("email"), data.get("password")
+        if not email or not password:
+            return self.error(_("Email and password are required."))
+
+        user = await User.objects.filter(email=email).afirst()
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            await offload(User().set_password, password)
+            return self.error(_("Invalid credentials."))
+
+        if response := await locked(user):
+            return response
+
+        if not user.is_active or not await offload(user.check_password, password):
+            await sync_to_async(user.handle_failed_login_attempt)()
+            return self.error(_("Invalid credentials."))
+
+        if user.failed_login_attempts:
+            await sync_to_async(user.reset_failed_login_attempts)()
+
+        otp = generate_otp()
+        await sync_to_async(user.set_otp)(otp)
+        await offload(sent_otp_email, user.email, otp)
+        return JsonResponse({"message": _("OTP sent to your email.")})
+
+
+class VerifyOTPView(AsyncJSONView):
+    # A failed code takes 4 more when it locks the account, the email included
+    @query_budget(8)
+    async def post(self, request):
+        if response := await throttled(request):
+            return response
+
+        data = self.request_data(request)
+        email, otp = data.get("email"), data.get("otp")
+        if not email or not otp:
+            return self.error(_("Email and OTP are required."))
+
+        user = await User.objects.filter(email=email, is_active=True).afirst()
+        if user is None:
+            return self.error(_("Invalid or expired OTP."))
+
+        if response := await locked(user):
+            return response
+
+        # Codes are guessed like passwords, so wrong ones count towards the lockout
+        if not await sync_to_async(user.verify_otp)(str(otp)):
+            await sync_to_async(user.handle_failed_login_attempt)()
+            return self.error(_("Invalid or expired OTP."))
+
+        refresh = RefreshToken.for_user(user)
+        await User.objects.filter(pk=user.pk).aupdate(last_login=timezone.now())
+        logger.info(f"{user.email} logged in")
+
+        response = JsonResponse(
+            {
+                "message": _("Login successful."),
+                "email": user.email,
+                "full_name": user.full_name,
+                "role": user.role,
+            }
+        )
+        set_auth_cookies(response, str(refresh.access_token), str(refresh))
+        return response
@@ -1,22 +1,67 @@
 from django.contrib import admin
-from cloudinary.forms import CloudinaryFileField
 from django import forms
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
-from .models import NextOfKin, Profile
+from core_apps.common.paginator import EstimatedCountPaginator
+from . import uploads
+from .models import KYCDossier, NextOfKin, Profile
+from .tasks import generate_kyc_dossier
 
 
 class ProfileAdminForm(forms.ModelForm):
-    photo = CloudinaryFileField(
-        options={"crop": "thumb", "width": 200, "height": 200, "folder": "bank_photos"},
-        required=False,
-    )
+    """
+    KYC documents are re-encoded while the form is validated, all three at
+    once, and uploaded to storage by a Celery task after the save: the
+    document fields keep their stored value until the upload is done.
+    """
+
+    photo = forms.FileField(required=False)
+    id_photo = forms.FileField(required=False)
+    signature_photo = forms.FileField(required=False)
 
     class Meta:
         model = Profile
         fields = "__all__"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._processing = {}
+        self.staged = {}
+
+    def _clean_document(self, document: str):
+        upload = self.cleaned_data.get(document)
+        if upload:
+            self._processing[document] = uploads.prepare(document, upload)
+        return getattr(self.instance, document)
+
+    def clean_photo(self):
+        return self._clean_document("photo")
+
+    def clean_id_photo(self):
+        return self._clean_document("id_photo")
+
+    def clean_signature_photo(self):
+        return self._clean_document("signature_photo")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for document, processing in self._processing.items():
+            try:
+                self.staged[document] = processing.result()
+            except forms.ValidationError as e:
+                self.add_error(document, e)
+        if self.errors:
+            # Nothing will be uploaded
+            for path in self.staged.values():
+                path.unlink(missing_ok=True)
+            self.staged = {}
+        return cleaned_data
+
+    def schedule_uploads(self, profile: Profile) -> None:
+        for document, path in self.staged.items():
+            uploads.schedule_upload(profile.pk, document, path)
+
 
 class NextOfKinInline(admin.TabularInline):
     model = NextOfKin
@@ -24,6 +69,23 @@ class NextOfKinInline(admin.TabularInline):
     fields = ["first_name", "last_name", "relationship", "phone_number", "is_primary"]
 
 
+class KYCDossierInline(admin.TabularInline):
+    model = KYCDossier
+    extra = 0
+    can_delete = False
+    fields = ["created_at", "pages", "dossier_link"]
+    readonly_fields = fields
+    ordering = ["-created_at"]
+
+    def has_add_permission(self, request, obj=None) -> bool:
+        return False
+
+    def dossier_link(self, obj) -> str:
+        return format_html('<a href="{}" target="_blank">{}</a>', obj.url, _("Open PDF"))
+
+    dossier_link.short_description = _("Dossier")
+
+
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     form = ProfileAdminForm
@@ -33,26 +95,38 @@ class ProfileAdmin(admin.ModelAdmin):
         "phone_number",
         "email",
         "employment_status",
+        "kyc_score",
         "photo_preview",
     ]
     list_display_links = ["user"]
-    list_filter = ["gender", "marital_status", "employment_status", "country"]
+    list_select_related = ["user"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_filter = ["kyc_status", "gender", "marital_status", "employment_status", "country"]
     search_fields = [
         "user__email",
         "user__first_name",
         "user__last_name",
         "phone_number",
     ]
-    readonly_fields = ["user"]
+    readonly_fields = [
+        "user",
+        "photo_url",
+        "id_photo_url",
+        "signature_photo_url",
+        "kyc_status",
+        "kyc_score",
+        "kyc_missing_fields",
+    ]
     fieldsets = (
         (
             _("Personal Information"),
             {
                 "fields": (
                     "user",
-                    "photo",
-                    "id_photo",
-                    "signature_photo",
+                    ("photo", "photo_url"),
+                    ("id_photo", "id_photo_url"),
+                    ("signature_photo", "signature_photo_url"),
                     "title",
                     "gender",
                     "date_of_birth",
@@ -68,10 +142,9 @@ class ProfileAdmin(admin.ModelAdmin):
             _("Identification"),
             {
                 "fields": (
-                    "means_of_identification",
+                    "identification_means",
                     "id_issue_date",
                     "id_expiry_date",
-                    "passport_number",
                 )
             },
         ),
@@ -82,15 +155,34 @@ class ProfileAdmin(admin.ModelAdmin):
                     "employment_status",
                     "employer_name",
                     "annual_income",
-                    "date_of_employment",
                     "employer_address",
                     "employer_city",
                     "employer_state",
                 )
             },
         ),
+        (
+            _("KYC"),
+            {"fields": ("kyc_status", "kyc_score", "kyc_missing_fields")},
+        ),
     )
-    inlines = [NextOfKinInline]
+    inlines = [NextOfKinInline, KYCDossierInline]
+    actions = ["generate_dossiers"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        form.schedule_uploads(obj)
+
+    @admin.action(description=_("Generate KYC dossiers"))
+    def generate_dossiers(self, request, queryset):
+        profile_ids = [str(pk) for pk in queryset.values_list("pk", flat=True)]
+        for profile_id in profile_ids:
+            generate_kyc_dossier.delay(profile_id)
+        self.message_user(
+            request,
+            _("%(count)s dossiers are being generated, they show up on each profile when ready.")
+            % {"count": len(profile_ids)},
+        )
 
     def full_name(self, obj) -> str:
         return obj.user.full_name
@@ -103,10 +195,12 @@ class ProfileAdmin(admin.ModelAdmin):
     email.short_description = _("Email")
 
     def photo_preview(self, obj) -> str:
-        if obj.photo:
+        # Prefer the stored URL over building a Cloudinary URL for every row
+        url = obj.photo_url or (obj.photo.url if obj.photo else None)
+        if url:
             return format_html(
                 '<img src="{}" width="50" height="50" style="object-fit:cover;" />',
-                obj.photo.url,
+                url,
             )
         return "No Photo Yet"
 
@@ -116,8 +210,12 @@ class ProfileAdmin(admin.ModelAdmin):
 @admin.register(NextOfKin)
 class NextOfKinAdmin(admin.ModelAdmin):
     list_display = ["full_name", "relationship", "profile", "is_primary"]
-    list_filter = ["is_primary", "relationship"]
+    # relationship is free text, filtering on it meant a DISTINCT over the table
+    list_filter = ["is_primary", "gender"]
+    list_select_related = ["profile__user"]
     search_fields = ["first_name", "last_name", "profile__user__email"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def full_name(self, obj) -> str:
         return f"{obj.first_name} {obj.last_name}"
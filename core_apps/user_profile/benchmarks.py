@@ -0,0 +1,18 @@
+from core_apps.common.benchmarking import benchmark
+from core_apps.user_auth.benchmarks import benchmark_user
+
+from .models import Profile
+
+
+def editable_profile():
+    profile = Profile.objects.get(user=benchmark_user())
+    profile.marital_status = Profile.MaritalStatus.SINGLE
+    profile.save()
+    return profile
+
+
+# Every call changes a field, so the profile is validated and written
+@benchmark("profile.save", setup=editable_profile)
+def save(profile):
+    profile.city = "Quito" if profile.city != "Quito" else "Lima"
+    profile.save()
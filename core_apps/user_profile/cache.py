@@ -0,0 +1,112 @@
+"""
+Cached profile reads, keyed by user id.
+
+A profile is cached with its next of kin, and the user fields shown next to
+it are cached as a separate user summary: users are saved on every login,
+profiles rarely, so each entry is only invalidated by changes to what it
+holds (see signals.py).
+"""
+from typing import Any
+
+from django.contrib.auth import get_user_model
+
+from core_apps.common.read_through import ReadThroughCache
+
+from .models import NextOfKin, Profile
+
+# Plain fields a customer can edit through the API, photos go through uploads
+EDITABLE_FIELDS = [
+    "title",
+    "gender",
+    "date_of_birth",
+    "country_of_birth",
+    "place_of_birth",
+    "marital_status",
+    "identification_means",
+    "id_issue_date",
+    "id_expiry_date",
+    "nationality",
+    "phone_number",
+    "address",
+    "city",
+    "country",
+    "employment_status",
+    "employer_name",
+    "annual_income",
+    "employer_address",
+    "employer_city",
+    "employer_state",
+]
+
+USER_SUMMARY_FIELDS = ["email", "username", "first_name", "last_name", "role"]
+
+NEXT_OF_KIN_FIELDS = [
+    "title",
+    "first_name",
+    "last_name",
+    "gender",
+    "date_of_birth",
+    "relationship",
+    "email",
+    "phone_number",
+    "address",
+    "city",
+    "country",
+    "is_primary",
+]
+
+
+def _serializable(instance: Any, fields: list[str]) -> dict:
+    data = {field: instance.serializable_value(field) for field in fields}
+    for field, value in data.items():
+        # Dates, countries, phone numbers and decimals as JSON would show them
+        if value is not None and not isinstance(value, (str, int, bool, list)):
+            data[field] = value.isoformat() if hasattr(value, "isoformat") else str(value)
+    return data
+
+
+def profile_fields(profile: Profile) -> dict:
+    data = _serializable(profile, EDITABLE_FIELDS)
+    data.update(
+        id=str(profile.pk),
+        photo_url=profile.photo_url,
+        id_photo_url=profile.id_photo_url,
+        signature_photo_url=profile.signature_photo_url,
+        kyc_status=profile.kyc_status,
+        kyc_score=profile.kyc_score,
+        kyc_missing_fields=profile.kyc_missing_fields,
+    )
+    return data
+
+
+def next_of_kin_fields(kin: NextOfKin) -> dict:
+    return _serializable(kin, NEXT_OF_KIN_FIELDS)
+
+
+def load_profile(user_id: Any) -> dict:
+    profile = Profile.objects.get(user_id=user_id)
+    data = profile_fields(profile)
+    data["next_of_kin"] = [
+        next_of_kin_fields(kin)
+        for kin in NextOfKin.objects.filter(profile=profile).order_by("-is_primary", "created_at")
+    ]
+    return data
+
+
+def load_user_summary(user_id: Any) -> dict:
+    user = get_user_model().objects.only(*USER_SUMMARY_FIELDS).get(pk=user_id)
+    return {
+        "email": user.email,
+        "username": user.username,
+        "full_name": user.full_name,
+        "role": user.role,
+    }
+
+
+profiles = ReadThroughCache("profile", load_profile)
+user_summaries = ReadThroughCache("user_summary", load_user_summary)
+
+
+def get_profile_data(user_id: Any) -> dict:
+    """What ``GET /profiles/me/`` returns for this user"""
+    return {**profiles.get(user_id), **user_summaries.get(user_id)}
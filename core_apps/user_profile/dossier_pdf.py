@@ -0,0 +1,150 @@
+"""
+KYC dossier rendering, for Celery workers and the month-end process pool.
+
+Kept free of model imports: spawned workers import this module before
+Django is set up, and get the dossier's data and the storage settings as
+arguments.
+"""
+from pathlib import Path
+from typing import Any, Iterator
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen.canvas import Canvas
+
+# Bump when the layout changes, so every dossier is rendered again
+LAYOUT_VERSION = 1
+
+MARGIN = 20 * mm
+LABEL_WIDTH = 55 * mm
+LINE_HEIGHT = 4.5 * mm
+FONT, BOLD, SIZE = "Helvetica", "Helvetica-Bold", 9
+
+# Section: the keys of the dossier data it shows
+SECTIONS = {
+    "Customer": ["full_name", "email", "username", "id_no", "role", "account_status"],
+    "KYC": ["kyc_status", "kyc_score", "kyc_missing_fields"],
+    "Personal information": [
+        "title",
+        "gender",
+        "date_of_birth",
+        "country_of_birth",
+        "place_of_birth",
+        "marital_status",
+        "nationality",
+    ],
+    "Identification": ["identification_means", "id_issue_date", "id_expiry_date"],
+    "Contact information": ["phone_number", "address", "city", "country"],
+    "Employment": [
+        "employment_status",
+        "employer_name",
+        "annual_income",
+        "employer_address",
+        "employer_city",
+        "employer_state",
+    ],
+    "Documents": ["photo_url", "id_photo_url", "signature_photo_url"],
+}
+
+
+def init_worker() -> None:
+    import django
+
+    django.setup()
+
+
+def _label(key: str) -> str:
+    return key.replace("_", " ").capitalize().replace("Id ", "ID ").replace(" url", "")
+
+
+def _value(value: Any) -> str:
+    if value in (None, "", []):
+        return "-"
+    if isinstance(value, list):
+        return ", ".join(_label(str(item)) for item in value)
+    return str(value)
+
+
+def _blocks(data: dict) -> Iterator[tuple[str, list[tuple[str, str]]]]:
+    for title, keys in SECTIONS.items():
+        yield title, [(_label(key), _value(data.get(key))) for key in keys]
+    kin = data.get("next_of_kin") or []
+    if not kin:
+        yield "Next of kin", [("Next of kin", "None declared")]
+    for number, person in enumerate(kin, 1):
+        primary = " (primary)" if person.get("is_primary") else ""
+        yield f"Next of kin {number}{primary}", [
+            (_label(key), _value(value)) for key, value in person.items() if key != "is_primary"
+        ]
+
+
+class _Writer:
+    """Lays out label/value rows, starting a new page when one is full"""
+
+    def __init__(self, canvas: Canvas, title: str) -> None:
+        self.canvas = canvas
+        self.title = title
+        self.width, self.height = A4
+        self.pages = 0
+        self._new_page()
+
+    def _new_page(self) -> None:
+        if self.pages:
+            # Done with the page: its content is compressed and set aside
+            self.canvas.showPage()
+        self.pages += 1
+        self.canvas.setFont(BOLD, 12)
+        self.canvas.drawString(MARGIN, self.height - MARGIN, self.title)
+        self.canvas.setFont(FONT, 8)
+        self.canvas.drawRightString(self.width - MARGIN, MARGIN / 2, f"Page {self.pages}")
+        self.y = self.height - MARGIN - 3 * LINE_HEIGHT
+
+    def _need(self, lines: int) -> None:
+        if self.y - lines * LINE_HEIGHT < MARGIN:
+            self._new_page()
+
+    def section(self, title: str, rows: list[tuple[str, str]]) -> None:
+        self._need(2)
+        self.canvas.setFont(BOLD, 10)
+        self.canvas.drawString(MARGIN, self.y, title)
+        self.y -= 1.5 * LINE_HEIGHT
+        value_width = self.width - 2 * MARGIN - LABEL_WIDTH
+        for label, value in rows:
+            lines = simpleSplit(value, FONT, SIZE, value_width) or ["-"]
+            self._need(len(lines))
+            self.canvas.setFont(BOLD, SIZE)
+            self.canvas.drawString(MARGIN, self.y, label)
+            self.canvas.setFont(FONT, SIZE)
+            for line in lines:
+                self.canvas.drawString(MARGIN + LABEL_WIDTH, self.y, line)
+                self.y -= LINE_HEIGHT
+        self.y -= LINE_HEIGHT
+
+
+def render(data: dict, path: Path) -> int:
+    """Write the dossier of ``data`` to ``path`` as a PDF, return its page count"""
+    # invariant: no creation date nor random id, the same data gives the same file
+    canvas = Canvas(str(path), pagesize=A4, pageCompression=1, invariant=1)
+    canvas.setTitle(f"KYC dossier - {data['full_name']}")
+    writer = _Writer(canvas, f"{data['site_name']} - KYC dossier of {data['full_name']}")
+    for title, rows in _blocks(data):
+        writer.section(title, rows)
+    canvas.save()
+    return writer.pages
+
+
+def render_and_store(
+    data: dict, name: str, staging_dir: str, storage: dict[str, Any]
+) -> tuple[str, str, int]:
+    """Render to the staging directory, then upload: (public id, URL, pages)"""
+    from .uploads import build_storage
+
+    path = Path(staging_dir) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        pages = render(data, path)
+        stored = build_storage(storage).save(path, name)
+    finally:
+        path.unlink(missing_ok=True)
+    return stored.public_id, stored.url, pages
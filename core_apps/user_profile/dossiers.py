@@ -0,0 +1,142 @@
+"""
+KYC dossiers: a customer's identity, profile, KYC status and next of kin as
+a PDF, for compliance.
+
+A dossier is stored under a hash of the data it shows and of the layout
+version, so an unchanged customer's dossier is never rendered twice.
+``generate`` renders one dossier, from the ``user_profile.generate_kyc_dossier``
+task. ``generate_many`` renders those of many customers for month-end runs
+(``manage.py generate_dossiers``): a process pool renders and uploads them
+while this process loads the next chunk of customers.
+
+reportlab only writes a PDF once it is complete, its cross-reference table
+comes last. Each page is compressed once finished and the file is written
+to ``DOSSIERS["STAGING_DIR"]``, from where storage uploads it.
+"""
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db.models import Prefetch, QuerySet
+from loguru import logger
+
+from .cache import next_of_kin_fields, profile_fields
+from .dossier_pdf import LAYOUT_VERSION, init_worker, render_and_store
+from .models import KYCDossier, NextOfKin, Profile
+
+
+def dossier_profiles() -> QuerySet:
+    """Profiles with what their dossier shows, in three queries for any number"""
+    return Profile.objects.select_related("user").prefetch_related(
+        Prefetch("next_of_kin", queryset=NextOfKin.objects.order_by("-is_primary", "created_at"))
+    )
+
+
+def dossier_data(profile: Profile) -> dict:
+    user = profile.user
+    return {
+        "site_name": settings.SITE_NAME,
+        "full_name": user.full_name,
+        "email": user.email,
+        "username": user.username,
+        "id_no": user.id_no,
+        "role": user.role,
+        "account_status": user.account_status,
+        **profile_fields(profile),
+        "next_of_kin": [next_of_kin_fields(kin) for kin in profile.next_of_kin.all()],
+    }
+
+
+def content_hash(data: dict) -> str:
+    content = json.dumps({"layout": LAYOUT_VERSION, **data}, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _render_args(profile_id: Any, data: dict, digest: str) -> tuple:
+    options = settings.DOSSIERS
+    name = f"dossier-{profile_id}-{digest[:16]}.pdf"
+    return data, name, options["STAGING_DIR"], options["STORAGE"]
+
+
+def _record(profile_id: Any, digest: str, stored: tuple[str, str, int]) -> KYCDossier:
+    public_id, url, pages = stored
+    # Two runs may have rendered the same content, either is fine
+    dossier, _ = KYCDossier.objects.get_or_create(
+        profile_id=profile_id,
+        content_hash=digest,
+        defaults={"public_id": public_id, "url": url, "pages": pages},
+    )
+    return dossier
+
+
+def generate(profile_id: Any) -> KYCDossier:
+    """The profile's dossier for its current data, rendered only if it changed"""
+    profile = dossier_profiles().get(pk=profile_id)
+    data = dossier_data(profile)
+    digest = content_hash(data)
+    dossier = KYCDossier.objects.filter(profile=profile, content_hash=digest).first()
+    if dossier is not None:
+        return dossier
+
+    dossier = _record(profile.pk, digest, render_and_store(*_render_args(profile.pk, data, digest)))
+    logger.info(f"Generated the KYC dossier of profile {profile.pk}: {dossier.url}")
+    return dossier
+
+
+def generate_many(
+    profile_ids: Optional[Iterable[Any]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+    on_progress: Optional[Callable[[dict[str, int]], None]] = None,
+) -> dict[str, int]:
+    """
+    Bring the dossiers of the given profiles, or of all of them, up to date.
+    Returns how many were generated, unchanged and failed.
+    """
+    workers = workers or settings.DOSSIERS["WORKERS"]
+    profiles = dossier_profiles().order_by("pk")
+    if profile_ids is not None:
+        profiles = profiles.filter(pk__in=list(profile_ids))
+    counts = {"generated": 0, "unchanged": 0, "failed": 0}
+
+    def collect(pending: dict[Future, tuple[Any, str]]) -> None:
+        for future, (profile_id, digest) in pending.items():
+            try:
+                _record(profile_id, digest, future.result())
+                counts["generated"] += 1
+            except Exception as e:
+                logger.error(f"KYC dossier of profile {profile_id} failed: {e}")
+                counts["failed"] += 1
+        if on_progress:
+            on_progress(counts)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    ) as pool:
+        pending: dict[Future, tuple[Any, str]] = {}
+        rows = profiles.iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            known = set(
+                KYCDossier.objects.filter(profile__in=chunk).values_list("profile_id", "content_hash")
+            )
+            submitted = {}
+            for profile in chunk:
+                data = dossier_data(profile)
+                digest = content_hash(data)
+                if (profile.pk, digest) in known:
+                    counts["unchanged"] += 1
+                    continue
+                future = pool.submit(render_and_store, *_render_args(profile.pk, data, digest))
+                submitted[future] = (profile.pk, digest)
+            # The previous chunk rendered while this one loaded, at most two
+            # chunks are in flight
+            collect(pending)
+            pending = submitted
+        collect(pending)
+    return counts
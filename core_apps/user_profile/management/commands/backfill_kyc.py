@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core_apps.user_profile.models import Profile
+
+
+class Command(BaseCommand):
+    """
+    Recompute the stored KYC status, score and missing fields of every profile.
+    Needed once after the columns are added, and safe to rerun at any time.
+    """
+
+    help = "Backfill the materialized KYC completeness columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        updated = Profile.objects.order_by("pk").refresh_kyc(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated {updated} profiles in {time.perf_counter() - start:.1f}s"
+            )
+        )
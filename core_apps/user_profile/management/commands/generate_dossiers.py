@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core_apps.user_profile import dossiers
+
+
+class Command(BaseCommand):
+    """
+    Bring customers' KYC dossiers up to date, for month-end runs. Dossiers
+    whose data is unchanged are skipped, the rest are rendered and uploaded
+    on a process pool.
+    """
+
+    help = "Generate the KYC dossiers of all, or the given, profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("profile_ids", nargs="*", help="Defaults to every profile")
+        parser.add_argument(
+            "--workers", type=int, default=None, help='Defaults to DOSSIERS["WORKERS"]'
+        )
+        parser.add_argument("--chunk-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(counts: dict[str, int]) -> None:
+            if options["verbosity"] > 1:
+                self.stdout.write(", ".join(f"{n} {state}" for state, n in counts.items()))
+
+        counts = dossiers.generate_many(
+            options["profile_ids"] or None,
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            on_progress=progress,
+        )
+        summary = (
+            f"{counts['generated']} dossiers generated, {counts['unchanged']} unchanged, "
+            f"{counts['failed']} failed in {time.perf_counter() - start:.1f}s"
+        )
+        self.stdout.write(
+            self.style.ERROR(summary) if counts["failed"] else self.style.SUCCESS(summary)
+        )
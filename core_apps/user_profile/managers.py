@@ -0,0 +1,57 @@
+from typing import Any, Iterable
+
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef
+
+KYC_FIELDS = ["kyc_status", "kyc_score", "kyc_missing_fields"]
+
+
+class ProfileQuerySet(models.QuerySet):
+    def kyc_complete(self) -> "ProfileQuerySet":
+        return self.filter(kyc_status=self.model.KYCStatus.COMPLETE)
+
+    def kyc_incomplete(self) -> "ProfileQuerySet":
+        return self.filter(kyc_status=self.model.KYCStatus.INCOMPLETE)
+
+    def refresh_kyc(self, batch_size: int = 1000) -> int:
+        """
+        Recompute the stored KYC columns of every profile in the queryset,
+        streaming rows and writing them back with ``bulk_update``. As that
+        skips ``post_save``, the cached profiles are invalidated here.
+        """
+        from .cache import profiles as cached_profiles
+
+        NextOfKin = self.model._meta.get_field("next_of_kin").related_model
+        profiles = self.annotate(
+            has_next_of_kin=Exists(NextOfKin.objects.filter(profile=OuterRef("pk")))
+        )
+
+        def write(batch: list) -> int:
+            user_ids = [profile.user_id for profile in batch]
+            transaction.on_commit(lambda: cached_profiles.invalidate(user_ids))
+            return self.model.objects.bulk_update(batch, KYC_FIELDS)
+
+        updated, batch = 0, []
+        for profile in profiles.iterator(chunk_size=batch_size):
+            profile.refresh_kyc(has_next_of_kin=profile.has_next_of_kin)
+            if profile.get_dirty_fields():
+                batch.append(profile)
+            if len(batch) >= batch_size:
+                updated += write(batch)
+                batch = []
+        if batch:
+            updated += write(batch)
+        return updated
+
+
+class ProfileManager(models.Manager.from_queryset(ProfileQuerySet)):
+    def create_for_users(self, users: Iterable[Any], batch_size: int = 1000) -> None:
+        """
+        Create the empty KYC profile of each user in bulk. Users that already
+        have a profile are skipped, so it is safe to call after ``bulk_create``
+        and from the ``post_save`` signal alike.
+        """
+        profiles = [self.model(user_id=user.pk) for user in users]
+        for profile in profiles:
+            profile.refresh_kyc(has_next_of_kin=False)
+        self.bulk_create(profiles, batch_size=batch_size, ignore_conflicts=True)
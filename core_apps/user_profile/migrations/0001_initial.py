@@ -0,0 +1,341 @@
+# Generated by Django 4.2.15 on 2026-10-18 01:20
+
+import cloudinary.models
+import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_countries.fields
+import phonenumber_field.modelfields
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Profile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "title",
+                    models.CharField(
+                        choices=[("mr", "Mr."), ("mrs", "Mrs."), ("miss", "Miss")],
+                        default="mr",
+                        max_length=10,
+                        verbose_name="Salutation",
+                    ),
+                ),
+                (
+                    "gender",
+                    models.CharField(
+                        choices=[("male", "Male"), ("female", "Female")],
+                        default="male",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "date_of_birth",
+                    models.DateField(
+                        default=datetime.date(2000, 1, 1), verbose_name="Date of Birth"
+                    ),
+                ),
+                (
+                    "country_of_birth",
+                    django_countries.fields.CountryField(
+                        default="US", max_length=2, verbose_name="Country of Birth"
+                    ),
+                ),
+                (
+                    "place_of_birth",
+                    models.CharField(
+                        default="Unknown", max_length=50, verbose_name="Place of Birth"
+                    ),
+                ),
+                (
+                    "marital_status",
+                    models.CharField(
+                        choices=[
+                            ("single", "Single"),
+                            ("married", "Married"),
+                            ("widowed", "Widowed"),
+                            ("divorced", "Divorced"),
+                        ],
+                        max_length=20,
+                        verbose_name="Marital Status",
+                    ),
+                ),
+                (
+                    "identification_means",
+                    models.CharField(
+                        choices=[
+                            ("passport", "Passport"),
+                            ("driver_license", "Driver License"),
+                            ("national_id", "National ID"),
+                        ],
+                        default="national_id",
+                        max_length=20,
+                        verbose_name="Means of Identification",
+                    ),
+                ),
+                (
+                    "id_issue_date",
+                    models.DateField(
+                        default=datetime.date(2021, 1, 1), verbose_name="Date of Issue"
+                    ),
+                ),
+                (
+                    "id_expiry_date",
+                    models.DateField(
+                        default=datetime.date(2024, 1, 1), verbose_name="Expiry Date"
+                    ),
+                ),
+                (
+                    "nationality",
+                    models.CharField(
+                        default="Unknown", max_length=50, verbose_name="Nationality"
+                    ),
+                ),
+                (
+                    "phone_number",
+                    phonenumber_field.modelfields.PhoneNumberField(
+                        default="+593 994233890",
+                        max_length=128,
+                        region=None,
+                        verbose_name="Phone Number",
+                    ),
+                ),
+                (
+                    "address",
+                    models.CharField(
+                        default="Unknown", max_length=100, verbose_name="Address"
+                    ),
+                ),
+                (
+                    "city",
+                    models.CharField(
+                        default="Unknown", max_length=50, verbose_name="City"
+                    ),
+                ),
+                (
+                    "country",
+                    django_countries.fields.CountryField(
+                        default="US", max_length=2, verbose_name="Country"
+                    ),
+                ),
+                (
+                    "postal_code",
+                    models.CharField(
+                        default="Unknown", max_length=10, verbose_name="Postal Code"
+                    ),
+                ),
+                (
+                    "employment_status",
+                    models.CharField(
+                        choices=[
+                            ("self_employed", "Self Employed"),
+                            ("employed", "Employed"),
+                            ("unemployed", "Unemployed"),
+                            ("retired", "Retired"),
+                            ("student", "Student"),
+                        ],
+                        default="employed",
+                        max_length=20,
+                        verbose_name="Employment Status",
+                    ),
+                ),
+                (
+                    "employer_name",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="Employer Name",
+                    ),
+                ),
+                (
+                    "annual_income",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0"),
+                        max_digits=12,
+                        verbose_name="Annual Income",
+                    ),
+                ),
+                (
+                    "employer_address",
+                    models.CharField(
+                        blank=True,
+                        max_length=100,
+                        null=True,
+                        verbose_name="Employer Address",
+                    ),
+                ),
+                (
+                    "employer_city",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="Employer City",
+                    ),
+                ),
+                (
+                    "employer_state",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="Employer State",
+                    ),
+                ),
+                (
+                    "photo",
+                    cloudinary.models.CloudinaryField(
+                        blank=True, max_length=255, null=True, verbose_name="Photo"
+                    ),
+                ),
+                (
+                    "photo_url",
+                    models.URLField(blank=True, null=True, verbose_name="Photo URL"),
+                ),
+                (
+                    "id_photo",
+                    cloudinary.models.CloudinaryField(
+                        blank=True, max_length=255, null=True, verbose_name="ID Photo"
+                    ),
+                ),
+                (
+                    "id_photo_url",
+                    models.URLField(blank=True, null=True, verbose_name="ID Photo URL"),
+                ),
+                (
+                    "signature_photo",
+                    cloudinary.models.CloudinaryField(
+                        blank=True,
+                        max_length=255,
+                        null=True,
+                        verbose_name="Signature Photo",
+                    ),
+                ),
+                (
+                    "signature_photo_url",
+                    models.URLField(
+                        blank=True, null=True, verbose_name="Signature Photo URL"
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="profile",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="NextOfKin",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "title",
+                    models.CharField(
+                        choices=[("mr", "Mr."), ("mrs", "Mrs."), ("miss", "Miss")],
+                        max_length=20,
+                        verbose_name="Title",
+                    ),
+                ),
+                (
+                    "first_name",
+                    models.CharField(max_length=50, verbose_name="First Name"),
+                ),
+                (
+                    "last_name",
+                    models.CharField(max_length=50, verbose_name="Last Name"),
+                ),
+                (
+                    "gender",
+                    models.CharField(
+                        choices=[("male", "Male"), ("female", "Female")],
+                        max_length=10,
+                        verbose_name="Gender",
+                    ),
+                ),
+                ("date_of_birth", models.DateField(verbose_name="Date of Birth")),
+                (
+                    "relationship",
+                    models.CharField(max_length=50, verbose_name="Relationship"),
+                ),
+                (
+                    "email",
+                    models.EmailField(
+                        db_index=True, max_length=254, verbose_name="Email"
+                    ),
+                ),
+                (
+                    "phone_number",
+                    phonenumber_field.modelfields.PhoneNumberField(
+                        max_length=128, region=None, verbose_name="Phone Number"
+                    ),
+                ),
+                ("address", models.CharField(max_length=100, verbose_name="Address")),
+                ("city", models.CharField(max_length=50, verbose_name="City")),
+                (
+                    "country",
+                    django_countries.fields.CountryField(
+                        max_length=2, verbose_name="Country"
+                    ),
+                ),
+                (
+                    "is_primary",
+                    models.BooleanField(default=False, verbose_name="Is Primary"),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="next_of_kin",
+                        to="user_profile.profile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="nextofkin",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_primary", True)),
+                fields=("profile", "is_primary"),
+                name="unique_primary_next_of_kin",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.15 on 2026-10-18 01:41
+
+import core_apps.user_profile.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_profile", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="kyc_missing_fields",
+            field=models.JSONField(
+                blank=True,
+                default=core_apps.user_profile.models.default_kyc_missing_fields,
+                verbose_name="Missing KYC Fields",
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="kyc_score",
+            field=models.PositiveSmallIntegerField(
+                db_index=True, default=0, verbose_name="KYC Completeness (%)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="kyc_status",
+            field=models.CharField(
+                choices=[("complete", "Complete"), ("incomplete", "Incomplete")],
+                db_index=True,
+                default="incomplete",
+                max_length=10,
+                verbose_name="KYC Status",
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.15 on 2026-10-18 02:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_profile", "0002_kyc_completeness"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="KYCDossier",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "content_hash",
+                    models.CharField(max_length=64, verbose_name="Content Hash"),
+                ),
+                (
+                    "public_id",
+                    models.CharField(max_length=255, verbose_name="Public ID"),
+                ),
+                ("url", models.URLField(max_length=500, verbose_name="URL")),
+                ("pages", models.PositiveSmallIntegerField(verbose_name="Pages")),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dossiers",
+                        to="user_profile.profile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "KYC Dossier",
+                "verbose_name_plural": "KYC Dossiers",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="kycdossier",
+            constraint=models.UniqueConstraint(
+                fields=("profile", "content_hash"), name="unique_dossier_content"
+            ),
+        ),
+    ]
@@ -10,9 +10,18 @@ from django_countries.fields import CountryField
 from phonenumber_field.modelfields import PhoneNumberField
 
 from core_apps.common.models import TimeStampedModel
+from core_apps.common.query_budget import query_budget
+
+from .managers import ProfileManager
 
 User = get_user_model()
 
+
+def default_kyc_missing_fields() -> list[str]:
+    # Until computed, a profile counts as missing everything
+    return [*Profile.KYC_REQUIRED_FIELDS, "next_of_kin"]
+
+
 class Profile(TimeStampedModel):
     """
     Class for storing KYC information
@@ -44,6 +53,32 @@ class Profile(TimeStampedModel):
         UNEMPLOYED = "unemployed", _("Unemployed")
         RETIRED = "retired", _("Retired")
         STUDENT = "student", _("Student")
+
+    class KYCStatus(models.TextChoices):
+        COMPLETE = "complete", _("Complete")
+        INCOMPLETE = "incomplete", _("Incomplete")
+
+    # Fields a customer must fill in, plus at least one next of kin
+    KYC_REQUIRED_FIELDS = [
+        "title",
+        "gender",
+        "date_of_birth",
+        "country_of_birth",
+        "place_of_birth",
+        "marital_status",
+        "identification_means",
+        "id_issue_date",
+        "id_expiry_date",
+        "nationality",
+        "phone_number",
+        "address",
+        "city",
+        "country",
+        "employment_status",
+        "photo",
+        "id_photo",
+        "signature_photo",
+    ]
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     title = models.CharField(
@@ -78,7 +113,7 @@ class Profile(TimeStampedModel):
         _("Nationality"), max_length=50, default="Unknown"
     )
     phone_number = PhoneNumberField(
-        _("Phone Number"), default="Unknown"
+        _("Phone Number"), default=settings.DEFAULT_PHONE_NUMBER
     )
     address = models.CharField(
         _("Address"), max_length=100, default="Unknown"
@@ -159,39 +194,90 @@ class Profile(TimeStampedModel):
         null=True,
     )
 
+    kyc_status = models.CharField(
+        _("KYC Status"),
+        max_length=10,
+        choices=KYCStatus.choices,
+        default=KYCStatus.INCOMPLETE,
+        db_index=True,
+    )
+    kyc_score = models.PositiveSmallIntegerField(
+        _("KYC Completeness (%)"), default=0, db_index=True
+    )
+    kyc_missing_fields = models.JSONField(
+        _("Missing KYC Fields"), default=default_kyc_missing_fields, blank=True
+    )
+
+    objects = ProfileManager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._take_snapshot()
+        return instance
+
+    def _take_snapshot(self) -> None:
+        # Values as they are stored, to tell which fields have been edited
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: field.get_prep_value(getattr(self, field.attname))
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+
+    def get_dirty_fields(self) -> list[str]:
+        loaded_values = getattr(self, "_loaded_values", None)
+        if loaded_values is None:
+            return [field.attname for field in self._meta.concrete_fields]
+        return [
+            field.attname
+            for field in self._meta.concrete_fields
+            if field.attname in loaded_values
+            and field.get_prep_value(getattr(self, field.attname))
+            != loaded_values[field.attname]
+        ]
+
     def clean(self) -> None:
         super().clean()
         if self.id_expiry_date and self.id_issue_date:
             if self.id_expiry_date < self.id_issue_date:
                 raise ValidationError(_("ID Expiry Date cannot be before ID Issue Date"))
 
+    def refresh_kyc(self, has_next_of_kin: bool | None = None) -> None:
+        """
+        Recompute the stored KYC columns. Next of kin changes are tracked by
+        their own signals, so unless told otherwise the last known state is kept.
+        """
+        if has_next_of_kin is None:
+            has_next_of_kin = (
+                not self._state.adding and "next_of_kin" not in self.kyc_missing_fields
+            )
+        missing = [field for field in self.KYC_REQUIRED_FIELDS if not getattr(self, field)]
+        if not has_next_of_kin:
+            missing.append("next_of_kin")
+        checks = len(self.KYC_REQUIRED_FIELDS) + 1
+        self.kyc_missing_fields = missing
+        self.kyc_score = round(100 * (checks - len(missing)) / checks)
+        self.kyc_status = (
+            self.KYCStatus.INCOMPLETE if missing else self.KYCStatus.COMPLETE
+        )
+
+    @query_budget(3)
     def save(self, *args, **kwargs):
+        self.refresh_kyc()
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            dirty_fields = self.get_dirty_fields()
+            if not dirty_fields:
+                # Unchanged profiles are never validated nor written again
+                return
+            if hasattr(self, "_loaded_values"):
+                kwargs["update_fields"] = [*dirty_fields, "updated_at"]
         self.full_clean()
         super().save(*args, **kwargs)
+        self._take_snapshot()
 
-    def is_complete_with_next_of_kin(self):
-        required_fields = [
-            self.title,
-            self.gender,
-            self.date_of_birth,
-            self.country_of_birth,
-            self.place_of_birth,
-            self.marital_status,
-            self.identification_means,
-            self.id_issue_date,
-            self.id_expiry_date,
-            self.nationality,
-            self.phone_number,
-            self.address,
-            self.city,
-            self.country,
-            self.employment_status,
-            self.photo,
-            self.id_photo,
-            self.signature_photo
-        ]
-
-        return all(required_fields) and self.next_of_kin.exists()
+    def is_complete_with_next_of_kin(self) -> bool:
+        return self.kyc_status == self.KYCStatus.COMPLETE
     
     def __str__(self):
         return f"{self.title} {self.user.first_name} {self.user.last_name}"
@@ -230,6 +316,7 @@ class NextOfKin(TimeStampedModel):
             if primary_kin.exists():
                 raise ValidationError(_("Only one primary next of kin is allowed"))
     
+    @query_budget(6)
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
@@ -247,4 +334,25 @@ class NextOfKin(TimeStampedModel):
                 name="unique_primary_next_of_kin",
             )
         ]
-   
\ No newline at end of file
+
+
+class KYCDossier(TimeStampedModel):
+    """A rendered KYC dossier, kept per content hash of the data it shows"""
+
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="dossiers")
+    content_hash = models.CharField(_("Content Hash"), max_length=64)
+    public_id = models.CharField(_("Public ID"), max_length=255)
+    url = models.URLField(_("URL"), max_length=500)
+    pages = models.PositiveSmallIntegerField(_("Pages"))
+
+    def __str__(self):
+        return f"KYC dossier {self.content_hash[:12]} of profile {self.profile_id}"
+
+    class Meta:
+        verbose_name = _("KYC Dossier")
+        verbose_name_plural = _("KYC Dossiers")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "content_hash"], name="unique_dossier_content"
+            )
+        ]
@@ -1,18 +1,64 @@
 from typing import Any, Type
+from django.db import transaction
 from django.db.models.base import Model
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from loguru import logger
 
 from config.settings.base import AUTH_USER_MODEL
-from core_apps.user_profile.models import Profile
+from core_apps.user_profile.models import NextOfKin, Profile
 
 @receiver(post_save, sender=AUTH_USER_MODEL)
 def create_user_profile(sender: Type[Model], instance: Model, created: bool, **kwargs:Any) -> None:
     if created:
-        Profile.objects.create(user=instance)
+        # Same path as bulk onboarding, which does not send post_save
+        Profile.objects.create_for_users([instance])
         logger.info(f"Profile created for {instance.first_name} {instance.last_name}")
 
 @receiver(post_save, sender=AUTH_USER_MODEL)
 def save_user_profile(sender: Type[Model], instance: Model, **kwargs:Any) -> None:
-    instance.profile.save()
\ No newline at end of file
+    # Only a profile loaded and edited together with the user is saved,
+    # a plain user save (login, OTP, lockout) never fetches the profile
+    if sender.profile.is_cached(instance):
+        instance.profile.save()
+
+@receiver(post_save, sender=NextOfKin)
+@receiver(post_delete, sender=NextOfKin)
+def refresh_profile_kyc(sender: Type[Model], instance: NextOfKin, **kwargs:Any) -> None:
+    # Keeps the stored KYC status in step with the profile's next of kin
+    Profile.objects.filter(pk=instance.profile_id).refresh_kyc()
+
+# Cached reads (see cache.py) are dropped once the change is committed, so a
+# concurrent read can't cache the data as it was before
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_cached_profile(sender: Type[Model], instance: Profile, **kwargs:Any) -> None:
+    from core_apps.user_profile.cache import profiles
+
+    transaction.on_commit(lambda: profiles.invalidate([instance.user_id]))
+
+@receiver(post_save, sender=NextOfKin)
+@receiver(post_delete, sender=NextOfKin)
+def invalidate_cached_next_of_kin(sender: Type[Model], instance: NextOfKin, **kwargs:Any) -> None:
+    from core_apps.user_profile.cache import profiles
+
+    def invalidate() -> None:
+        profiles.invalidate(
+            Profile.objects.filter(pk=instance.profile_id).values_list("user_id", flat=True)
+        )
+
+    transaction.on_commit(invalidate)
+
+@receiver(post_save, sender=AUTH_USER_MODEL)
+@receiver(post_delete, sender=AUTH_USER_MODEL)
+def invalidate_cached_user_summary(sender: Type[Model], instance: Model, **kwargs:Any) -> None:
+    from core_apps.user_profile.cache import USER_SUMMARY_FIELDS, profiles, user_summaries
+
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not update_fields & set(USER_SUMMARY_FIELDS):
+        # Logins, OTPs and lockouts don't change what the summary shows
+        return
+    transaction.on_commit(lambda: user_summaries.invalidate([instance.pk]))
+    if kwargs["signal"] is post_delete:
+        transaction.on_commit(lambda: profiles.invalidate([instance.pk]))
@@ -0,0 +1,29 @@
+from celery import shared_task
+
+from . import dossiers
+from .models import Profile
+from .uploads import store
+
+
+@shared_task(
+    name="user_profile.upload_kyc_document",
+    ignore_result=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def upload_kyc_document(profile_id: str, document: str, staged_name: str) -> None:
+    """Push a staged KYC document to storage and record its URL on the profile"""
+    store(profile_id, document, staged_name)
+
+
+@shared_task(
+    name="user_profile.generate_kyc_dossier",
+    autoretry_for=(Exception,),
+    dont_autoretry_for=(Profile.DoesNotExist,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def generate_kyc_dossier(profile_id: str) -> str:
+    """Render the profile's KYC dossier, unless its data is unchanged, and return its URL"""
+    return dossiers.generate(profile_id).url
@@ -1,3 +1,384 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core_apps.user_auth.tests import ChangelistQueryCountMixin, make_user
+
+from . import dossiers, exports, uploads
+from .cache import get_profile_data
+from .models import NextOfKin, Profile
+from .tasks import upload_kyc_document
+
+User = get_user_model()
+
+
+class ProfileSaveTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        Profile.objects.filter(user=self.user).update(
+            marital_status=Profile.MaritalStatus.SINGLE
+        )
+        Profile.objects.refresh_kyc()
+
+    def test_profile_is_created_on_signup(self):
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+
+    def test_user_save_does_not_touch_the_profile(self):
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            user.save(update_fields=["last_login"])
+
+    def test_unchanged_profile_is_not_saved(self):
+        profile = Profile.objects.get(user=self.user)
+        with self.assertNumQueries(0):
+            profile.save()
+
+    def test_only_dirty_fields_are_written(self):
+        profile = Profile.objects.get(user=self.user)
+        profile.city = "Quito"
+        self.assertEqual(profile.get_dirty_fields(), ["city"])
+        profile.save()
+
+        self.assertEqual(profile.get_dirty_fields(), [])
+        self.assertEqual(Profile.objects.get(pk=profile.pk).city, "Quito")
+
+    def test_profiles_for_bulk_created_users(self):
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f"bulk{i}@example.com",
+                    username=f"BULK-{i}",
+                    id_no=f"ID{i}",
+                    first_name="Bulk",
+                    last_name="User",
+                )
+                for i in range(3)
+            ]
+        )
+        Profile.objects.create_for_users([self.user, *users])
+        self.assertEqual(Profile.objects.count(), 4)
+
+
+class KYCCompletenessTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        Profile.objects.filter(user=self.user).update(
+            marital_status=Profile.MaritalStatus.SINGLE,
+            photo="photo",
+            id_photo="id_photo",
+            signature_photo="signature_photo",
+        )
+        Profile.objects.refresh_kyc()
+        self.profile = Profile.objects.get(user=self.user)
+
+    def add_next_of_kin(self) -> NextOfKin:
+        return NextOfKin.objects.create(
+            profile=self.profile,
+            title=NextOfKin.Salutation.MR,
+            first_name="John",
+            last_name="Doe",
+            gender=NextOfKin.Gender.MALE,
+            date_of_birth="1970-01-01",
+            relationship="Father",
+            email="john@example.com",
+            phone_number="+593994233890",
+            address="Main street",
+            city="Quito",
+            country="EC",
+        )
+
+    def test_new_profile_is_incomplete(self):
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual(profile.kyc_missing_fields, ["next_of_kin"])
+        self.assertFalse(profile.is_complete_with_next_of_kin())
+
+    def test_next_of_kin_changes_update_the_status(self):
+        kin = self.add_next_of_kin()
+        self.assertEqual(Profile.objects.kyc_complete().get(), self.profile)
+
+        kin.delete()
+        self.assertEqual(Profile.objects.kyc_incomplete().get(), self.profile)
+
+    def test_profile_edits_update_the_status(self):
+        self.add_next_of_kin()
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.signature_photo = None
+        profile.save()
+
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual(profile.kyc_status, Profile.KYCStatus.INCOMPLETE)
+        self.assertEqual(profile.kyc_missing_fields, ["signature_photo"])
+
+    def test_backfill(self):
+        self.add_next_of_kin()
+        Profile.objects.update(kyc_status=Profile.KYCStatus.INCOMPLETE, kyc_score=0)
+        self.assertEqual(Profile.objects.refresh_kyc(), 1)
+        self.assertEqual(Profile.objects.get().kyc_score, 100)
+
+
+class ProfileCacheTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.profile = Profile.objects.get(user=self.user)
+
+    def test_repeated_reads_skip_the_database(self):
+        data = get_profile_data(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_profile_data(self.user.pk), data)
+        self.assertEqual(data["email"], self.user.email)
+        self.assertEqual(data["next_of_kin"], [])
+
+    def test_profile_and_next_of_kin_changes_are_visible(self):
+        get_profile_data(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.city = "Quito"
+            self.profile.marital_status = Profile.MaritalStatus.SINGLE
+            self.profile.save()
+        self.assertEqual(get_profile_data(self.user.pk)["city"], "Quito")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            KYCCompletenessTests.add_next_of_kin(self)
+        data = get_profile_data(self.user.pk)
+        self.assertEqual([kin["first_name"] for kin in data["next_of_kin"]], ["John"])
+        self.assertNotIn("next_of_kin", data["kyc_missing_fields"])
+
+    def test_logins_keep_the_user_summary(self):
+        get_profile_data(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            get_profile_data(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Jane"
+            self.user.save()
+        self.assertTrue(get_profile_data(self.user.pk)["full_name"].startswith("Jane "))
+
+
+def image_upload(name="photo.jpg", size=(3000, 2000), image_format="JPEG") -> SimpleUploadedFile:
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x0110] = "Camera model"
+    Image.new("RGB", size, "teal").save(buffer, image_format, exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class KYCUploadTests(TestCase):
+    def setUp(self):
+        tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(
+            override_settings(
+                KYC_UPLOADS={
+                    **settings.KYC_UPLOADS,
+                    "STAGING_DIR": str(tmp / "staging"),
+                    "STORAGE": {
+                        "BACKEND": "core_apps.user_profile.uploads.FileSystemStorage",
+                        "OPTIONS": {"location": str(tmp / "stored"), "base_url": "/media/kyc/"},
+                    },
+                }
+            )
+        )
+        uploads.get_storage.cache_clear()
+        self.addCleanup(uploads.get_storage.cache_clear)
+        self.stored = tmp / "stored"
+        self.user = make_user()
+        self.profile = Profile.objects.get(user=self.user)
+
+    def test_image_is_resized_and_stripped(self):
+        staged = uploads.prepare("photo", image_upload()).result()
+
+        with Image.open(staged) as image:
+            self.assertEqual((image.format, image.size), ("JPEG", (800, 533)))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_invalid_uploads_are_rejected(self):
+        with self.assertRaisesMessage(ValidationError, "larger than 1 MB"):
+            uploads.prepare("photo", SimpleUploadedFile("big.jpg", b"0" * (2 * 1024 * 1024)))
+        with self.assertRaisesMessage(ValidationError, "not a valid image"):
+            uploads.prepare("photo", SimpleUploadedFile("photo.jpg", b"not an image")).result()
+        with self.assertRaisesMessage(ValidationError, "JPEG, PNG or WebP"):
+            uploads.prepare("photo", image_upload("photo.gif", (10, 10), "GIF")).result()
+
+    def test_upload_runs_after_commit_and_records_the_url(self):
+        get_profile_data(self.profile.user_id)
+        staged = uploads.prepare("signature_photo", image_upload("sign.png", image_format="PNG")).result()
+        with mock.patch.object(upload_kyc_document, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                uploads.schedule_upload(self.profile.pk, "signature_photo", staged)
+                delay.assert_not_called()
+        delay.assert_called_once_with(str(self.profile.pk), "signature_photo", staged.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            upload_kyc_document(*delay.call_args.args)
+
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEqual(profile.signature_photo_url, f"/media/kyc/{staged.name}")
+        self.assertNotIn("signature_photo", profile.kyc_missing_fields)
+        self.assertTrue((self.stored / staged.name).exists())
+        self.assertFalse(staged.exists())
+        self.assertEqual(
+            get_profile_data(self.profile.user_id)["signature_photo_url"], profile.signature_photo_url
+        )
+
+    def test_customers_upload_their_documents(self):
+        self.client.cookies[settings.COOKIE_NAME] = str(AccessToken.for_user(self.user))
+        url = reverse("my_document", args=["id_photo"])
+        with mock.patch.object(upload_kyc_document, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {"file": image_upload()})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(delay.call_args.args[:2], (str(self.profile.pk), "id_photo"))
+        response = self.client.post(url, {"file": SimpleUploadedFile("id.jpg", b"text")})
+        self.assertEqual(response.status_code, 400)
+
+
+class KYCDossierTests(TestCase):
+    def setUp(self):
+        tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(
+            override_settings(
+                DOSSIERS={
+                    **settings.DOSSIERS,
+                    "STAGING_DIR": str(tmp / "staging"),
+                    "STORAGE": {
+                        "BACKEND": "core_apps.user_profile.uploads.FileSystemStorage",
+                        "OPTIONS": {"location": str(tmp / "stored"), "base_url": "/media/dossiers/"},
+                    },
+                }
+            )
+        )
+        self.stored = tmp / "stored"
+        self.profile = Profile.objects.get(user=make_user())
+
+    def test_dossier_is_only_rendered_again_when_its_data_changes(self):
+        dossier = dossiers.generate(self.profile.pk)
+
+        path = self.stored / dossier.url.removeprefix("/media/dossiers/")
+        self.assertTrue(path.read_bytes().startswith(b"%PDF"))
+        self.assertEqual(dossier.pages, 1)
+        self.assertEqual(dossiers.generate(self.profile.pk), dossier)
+
+        Profile.objects.filter(pk=self.profile.pk).update(city="Quito")
+        self.assertNotEqual(dossiers.generate(self.profile.pk).content_hash, dossier.content_hash)
+        self.assertEqual(len(list(self.stored.iterdir())), 2)
+
+    def test_month_end_run_skips_unchanged_dossiers(self):
+        dossiers.generate(self.profile.pk)
+        other = Profile.objects.get(user=make_user(email="other@example.com", id_no="0987654321"))
+
+        counts = dossiers.generate_many(workers=1)
+
+        self.assertEqual(counts, {"generated": 1, "unchanged": 1, "failed": 0})
+        self.assertEqual(other.dossiers.get().pages, 1)
+
+
+class CustomerExportTests(TestCase):
+    def setUp(self):
+        self.staff = make_user(email="staff@example.com", id_no="0000000001", is_staff=True)
+        make_user(email="quito@example.com", id_no="0000000002")
+        make_user(
+            email="lima@example.com", id_no="0000000003", role=User.RoleChoices.TELLER
+        )
+        Profile.objects.update(country="PE")
+        Profile.objects.filter(user__email="quito@example.com").update(country="EC", city="Quito")
+
+    def test_command_writes_the_selected_columns_of_matching_customers(self):
+        output = Path(self.enterContext(tempfile.TemporaryDirectory())) / "customers.csv"
+        call_command(
+            "export_customers",
+            *("--columns", "email,city", "--country", "ec", "--output", output),
+            stderr=io.StringIO(),
+        )
+
+        self.assertEqual(output.read_bytes(), b"email,city\r\nquito@example.com,Quito\r\n")
+
+    def test_columnar_export_has_a_group_of_columns_per_chunk(self):
+        chunks = exports.export_customers(
+            "columnar", ["email", "role"], chunk_size=2, roles=["customer"]
+        )
+        groups = [json.loads(chunk) for chunk in chunks]
+
+        self.assertEqual([group["rows"] for group in groups], [2])
+        self.assertEqual(groups[0]["columns"]["role"], ["customer", "customer"])
+
+    def test_staff_stream_the_export(self):
+        url = reverse("customer_export")
+        self.client.cookies[settings.COOKIE_NAME] = str(AccessToken.for_user(self.staff))
+        response = self.client.get(url, {"format": "ndjson", "role": "teller"})
+
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["email"] for row in rows], ["lima@example.com"])
+        self.assertEqual(self.client.get(url, {"columns": "password"}).status_code, 400)
+
+        customer = User.objects.get(email="quito@example.com")
+        self.client.cookies[settings.COOKIE_NAME] = str(AccessToken.for_user(customer))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class ProfileAdminTests(ChangelistQueryCountMixin, TestCase):
+    changelist = "admin:user_profile_profile_changelist"
+
+    def create_rows(self, count: int) -> None:
+        start = User.objects.count()
+        for i in range(start, start + count):
+            make_user(email=f"customer{i}@example.com", id_no=f"ID{i:08}")
+
+    def test_change_and_add_pages_render(self):
+        admin_user = User.objects.create_superuser(
+            email="admin@example.com",
+            password="Admin-pass-123",
+            first_name="Admin",
+            last_name="User",
+            id_no="ADMIN00001",
+            security_question=User.SecurityQuestions.PET_NAME,
+            security_answer="Admin",
+        )
+        self.client.force_login(admin_user)
+        profile = make_user().profile
+
+        for url in [
+            reverse("admin:user_profile_profile_change", args=[profile.pk]),
+            reverse("admin:user_profile_profile_add"),
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class NextOfKinAdminTests(ChangelistQueryCountMixin, TestCase):
+    changelist = "admin:user_profile_nextofkin_changelist"
+
+    def create_rows(self, count: int) -> None:
+        start = User.objects.count()
+        for i in range(start, start + count):
+            user = make_user(email=f"customer{i}@example.com", id_no=f"ID{i:08}")
+            NextOfKin.objects.bulk_create(
+                [
+                    NextOfKin(
+                        profile=user.profile,
+                        title=NextOfKin.Salutation.MR,
+                        first_name="John",
+                        last_name="Doe",
+                        gender=NextOfKin.Gender.MALE,
+                        date_of_birth="1970-01-01",
+                        relationship="Father",
+                        email="john@example.com",
+                        phone_number="+593994233890",
+                        address="Main street",
+                        city="Quito",
+                        country="EC",
+                    )
+                ]
+            )
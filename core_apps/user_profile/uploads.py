@@ -0,0 +1,164 @@
+"""
+KYC document uploads, in three steps, only the first two in the request:
+
+1. ``prepare`` validates the image and re-encodes it with Pillow on a small
+   process-wide thread pool (Pillow releases the GIL while decoding, resizing
+   and encoding, so the three documents of a form are processed in parallel).
+   Uploads over ``MAX_UPLOAD_SIZE`` or that aren't JPEG, PNG or WebP images
+   are rejected; the rest are shrunk to fit their document's size, turned
+   upright and stripped of their metadata (camera, location).
+2. The result is written to ``KYC_UPLOADS["STAGING_DIR"]``, which must be
+   shared with the Celery workers.
+3. Once the transaction commits, the ``user_profile.upload_kyc_document``
+   task pushes the staged file to the configured storage backend and stores
+   the document's id and URL on the profile (``photo`` and ``photo_url``...).
+
+Storage backends implement ``save(path, name) -> StoredDocument``:
+``CloudinaryStorage`` for deployments, ``FileSystemStorage`` for tests and
+offline development.
+"""
+import io
+import shutil
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext as _
+from loguru import logger
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Document: (largest width and height, format it is stored in)
+DOCUMENTS = {
+    "photo": ((800, 800), "JPEG"),
+    "id_photo": ((1600, 1600), "JPEG"),
+    # Line art stays sharp and small as PNG
+    "signature_photo": ((800, 400), "PNG"),
+}
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP"}
+# Refuse images that would take this many pixels of memory once decoded
+MAX_PIXELS = 40_000_000
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.KYC_UPLOADS["WORKERS"], thread_name_prefix="kyc-images"
+)
+
+
+@dataclass
+class StoredDocument:
+    public_id: str
+    url: str
+
+
+class FileSystemStorage:
+    """Copies documents to a local directory served under ``base_url``"""
+
+    def __init__(self, location: str, base_url: str) -> None:
+        self.location = Path(location)
+        self.base_url = base_url
+
+    def save(self, path: Path, name: str) -> StoredDocument:
+        self.location.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, self.location / name)
+        return StoredDocument(public_id=name, url=f"{self.base_url}{name}")
+
+
+class CloudinaryStorage:
+    def __init__(self, folder: str) -> None:
+        self.folder = folder
+
+    def save(self, path: Path, name: str) -> StoredDocument:
+        import cloudinary.uploader
+
+        result = cloudinary.uploader.upload(
+            str(path), folder=self.folder, public_id=Path(name).stem, overwrite=True
+        )
+        # The value CloudinaryField stores for an upload
+        public_id = "{resource_type}/{type}/v{version}/{public_id}.{format}".format(**result)
+        return StoredDocument(public_id=public_id, url=result["secure_url"])
+
+
+def build_storage(options: dict[str, Any]) -> Any:
+    """The storage backend configured by ``{"BACKEND": ..., "OPTIONS": {...}}``"""
+    return import_string(options["BACKEND"])(**options.get("OPTIONS", {}))
+
+
+@lru_cache(maxsize=None)
+def get_storage() -> Any:
+    return build_storage(settings.KYC_UPLOADS["STORAGE"])
+
+
+def _staging_dir() -> Path:
+    path = Path(settings.KYC_UPLOADS["STAGING_DIR"])
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _process(document: str, data: bytes) -> Path:
+    (max_size, output_format) = DOCUMENTS[document]
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format not in ACCEPTED_FORMATS:
+                raise ValidationError(_("Upload a JPEG, PNG or WebP image."))
+            if image.width * image.height > MAX_PIXELS:
+                raise ValidationError(_("The image is too large."))
+            # JPEGs can be decoded straight at a fraction of their size
+            image.draft("RGB", max_size)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+            if output_format == "JPEG" or image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGB")
+
+            name = f"{document}-{uuid.uuid4().hex}.{output_format.lower().replace('jpeg', 'jpg')}"
+            path = _staging_dir() / name
+            # No exif passed on: location and camera details are dropped
+            image.save(path, output_format, quality=85, optimize=True)
+            return path
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValidationError(_("The file is not a valid image.")) from e
+
+
+def prepare(document: str, upload: Any) -> Future:
+    """
+    Check the uploaded file's size and start re-encoding it on the pool. The
+    future resolves to the staged file, or raises ``ValidationError``.
+    """
+    if upload.size > settings.MAX_UPLOAD_SIZE:
+        limit = settings.MAX_UPLOAD_SIZE // (1024 * 1024)
+        raise ValidationError(_("Files can't be larger than %(limit)s MB.") % {"limit": limit})
+    return _executor.submit(_process, document, upload.read())
+
+
+def schedule_upload(profile_id: Any, document: str, path: Path) -> None:
+    """Push the staged file to storage from a Celery worker, once committed"""
+    from .tasks import upload_kyc_document
+
+    transaction.on_commit(
+        lambda: upload_kyc_document.delay(str(profile_id), document, path.name)
+    )
+
+
+def store(profile_id: Any, document: str, staged_name: str) -> StoredDocument:
+    from .cache import profiles
+    from .models import Profile
+
+    path = _staging_dir() / staged_name
+    stored = get_storage().save(path, staged_name)
+    with transaction.atomic():
+        updated = Profile.objects.filter(pk=profile_id).update(
+            **{document: stored.public_id, f"{document}_url": stored.url}
+        )
+        if updated:
+            # update() sends no post_save, keep the KYC columns and cache in step
+            Profile.objects.filter(pk=profile_id).refresh_kyc()
+            user_ids = list(Profile.objects.filter(pk=profile_id).values_list("user_id", flat=True))
+            transaction.on_commit(lambda: profiles.invalidate(user_ids))
+    path.unlink(missing_ok=True)
+    logger.info(f"Stored {document} of profile {profile_id}: {stored.url}")
+    return stored
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import CustomerExportView, MyDocumentView, MyProfileView
+
+urlpatterns = [
+    path("me/", MyProfileView.as_view(), name="my_profile"),
+    path("me/documents/<str:document>/", MyDocumentView.as_view(), name="my_document"),
+    path("export/", CustomerExportView.as_view(), name="customer_export"),
+]
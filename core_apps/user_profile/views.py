@@ -1,3 +1,123 @@
-from django.shortcuts import render
+import asyncio
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from core_apps.common.query_budget import query_budget
+from core_apps.common.views import AsyncJSONView
+
+from . import exports, uploads
+from .cache import EDITABLE_FIELDS, get_profile_data
+from .models import Profile
+
+
+class AuthenticatedView(AsyncJSONView):
+    async def dispatch(self, request, *args, **kwargs):
+        self.user = await self.authenticate(request)
+        if self.user is None:
+            return self.error(_("Authentication credentials were not provided."), status=401)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class MyProfileView(AuthenticatedView):
+    """The authenticated user's profile: GET to read it, PATCH to edit it"""
+
+    @query_budget(4)
+    async def get(self, request):
+        # Read through the profile cache, invalidated whenever it changes
+        return JsonResponse(await sync_to_async(get_profile_data)(self.user.pk))
+
+    @query_budget(8)
+    async def patch(self, request):
+        profile = await Profile.objects.aget(user_id=self.user.pk)
+        data = self.request_data(request)
+        unknown = sorted(set(data) - set(EDITABLE_FIELDS))
+        if unknown:
+            return JsonResponse(
+                {"error": _("These fields can't be edited."), "fields": unknown}, status=400
+            )
+
+        for field, value in data.items():
+            setattr(profile, field, value)
+        try:
+            # Profile.save validates and only writes the fields that changed
+            await profile.asave()
+        except ValidationError as e:
+            return JsonResponse(
+                {"error": _("Invalid profile."), "fields": e.message_dict}, status=400
+            )
+        return JsonResponse(await sync_to_async(get_profile_data)(self.user.pk))
+
+
+class MyDocumentView(AuthenticatedView):
+    """
+    POST a KYC document (``photo``, ``id_photo`` or ``signature_photo``) as
+    the ``file`` field of a multipart form. The image is checked and
+    re-encoded before answering, the upload to storage happens in the
+    background: 202, and its URL shows up in the profile once stored.
+    """
+
+    @query_budget(2)
+    async def post(self, request, document):
+        if document not in uploads.DOCUMENTS:
+            return self.error(_("Unknown document."), status=404)
+        upload = request.FILES.get("file")
+        if upload is None:
+            return self.error(_("No file was submitted."))
+
+        try:
+            staged = await asyncio.wrap_future(uploads.prepare(document, upload))
+        except ValidationError as e:
+            return self.error(" ".join(e.messages))
+
+        profile = await Profile.objects.only("pk").aget(user_id=self.user.pk)
+        await sync_to_async(uploads.schedule_upload)(profile.pk, document, staged)
+        return JsonResponse({"document": document, "status": "processing"}, status=202)
+
+
+async def _stream(chunks):
+    # Each chunk is read from the server-side cursor off the event loop
+    while (chunk := await sync_to_async(next)(chunks, None)) is not None:
+        yield chunk
+
+
+class CustomerExportView(AuthenticatedView):
+    """
+    Staff only: the customer base as ``?format=csv`` (default), ``ndjson`` or
+    ``columnar``, streamed as it is read. ``columns``, ``role``,
+    ``account_status`` and ``country`` take comma separated values, see
+    exports.py.
+    """
+
+    @query_budget(2)
+    async def get(self, request):
+        if not self.user.is_staff:
+            return self.error(_("You do not have permission to export customers."), status=403)
+
+        params = request.GET
+        export_format = params.get("format", "csv")
+        try:
+            chunks = exports.export_customers(
+                export_format,
+                exports.split(params.get("columns")),
+                roles=exports.split(params.get("role")),
+                account_statuses=exports.split(params.get("account_status")),
+                countries=exports.split(params.get("country")),
+            )
+        except ValidationError as e:
+            return self.error(" ".join(e.messages))
+
+        # ASGI servers need an async iterator, or Django reads it all first
+        response = StreamingHttpResponse(
+            _stream(chunks) if isinstance(request, ASGIRequest) else chunks,
+            content_type=exports.CONTENT_TYPES[export_format],
+        )
+        extension = "csv" if export_format == "csv" else "ndjson"
+        response["Content-Disposition"] = (
+            f'attachment; filename="customers-{timezone.now():%Y%m%d}.{extension}"'
+        )
+        return response
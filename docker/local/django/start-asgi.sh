@@ -0,0 +1,21 @@
+#!/bin/bash
+
+set -o errexit
+
+set -o pipefail
+
+set -o nounset
+
+python manage.py migrate --no-input
+
+python manage.py collectstatic --no-input
+
+# Gunicorn manages the processes, each worker runs an uvicorn event loop
+# serving config.asgi. Blocking work (hashing, SMTP) runs on each worker's
+# ASYNC_OFFLOAD_WORKERS threads.
+exec gunicorn config.asgi:application \
+    --worker-class uvicorn_worker.UvicornWorker \
+    --workers "${WEB_CONCURRENCY:-2}" \
+    --bind 0.0.0.0:8001 \
+    --keep-alive 5 \
+    --graceful-timeout 30
@@ -1,30 +1,193 @@
 """
 Capture all logging and pipe them through Loguru
 """
-from loguru import logger
+import itertools
 import logging
+import os
+import queue
+import sys
+import threading
+import traceback
+from functools import lru_cache
+from pathlib import PurePath
+
+from loguru import logger
+# Loguru's own file sink, so rotation/retention/compression keep their exact
+# semantics when they move to the writer thread (loguru is pinned)
+from loguru._file_sink import FileSink
+
+FILE_OPTIONS = (
+    "rotation",
+    "retention",
+    "compression",
+    "delay",
+    "watch",
+    "mode",
+    "buffering",
+    "encoding",
+)
+
 
 class InterceptHandler(logging.Handler):
     """A handler job is to decide what to do when a logging record is emitted"""
+
     def emit(self, record):
         """
         This method is called every time a log is sent to this handler
         """
-        # Match the logging level to the Loguru level
-        try:
-            level = logger.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
-        
-        frame, depth = logging.currentframe(), 2
-
-        while frame.f_code.co_filename == logging.__file__:
-            frame = frame.f_back
-            depth += 1
-
-        # Tell loguru how far up the stack the logging call was
-        # Send the message at the correct level
-        logger.opt(depth=depth, exception=record.exc_info).log(
-            level, 
-            record.getMessage()
-        )
\ No newline at end of file
+        # The stdlib record already knows where the call came from, so copy
+        # it instead of walking the stack back out of the logging module
+        def patcher(loguru_record):
+            loguru_record["name"] = record.name
+            loguru_record["function"] = record.funcName
+            loguru_record["line"] = record.lineno
+
+        logger.patch(patcher).opt(exception=record.exc_info).log(
+            loguru_level(record.levelname, record.levelno), record.getMessage()
+        )
+
+
+@lru_cache(maxsize=None)
+def loguru_level(levelname, levelno):
+    # Match the logging level to the Loguru level
+    try:
+        return logger.level(levelname).name
+    except ValueError:
+        return levelno
+
+
+def _lookup(overrides, name):
+    """Value for the most specific dotted prefix of ``name`` in ``overrides``"""
+    while name:
+        if name in overrides:
+            return overrides[name]
+        name = name.rpartition(".")[0]
+    return overrides.get("")
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep one in ``rates[logger]`` DEBUG records of a noisy logger (and its
+    children), so it can stay on without flooding the sinks. Other levels
+    always pass.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = rates or {}
+        self._counters = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = _lookup(self.rates, record.name)
+        if not rate or rate <= 1:
+            return True
+        counter = self._counters.get(record.name)
+        if counter is None:
+            counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % rate == 0
+
+
+def level_filter(levels, max_level=None):
+    """
+    Loguru sink filter applying per-logger minimum levels (``{"django.db":
+    "INFO"}``), optionally capped at ``max_level``.
+    """
+    thresholds = {name: logger.level(level).no for name, level in levels.items()}
+    ceiling = logger.level(max_level).no if max_level else None
+
+    @lru_cache(maxsize=1024)
+    def threshold(name):
+        return _lookup(thresholds, name) or 0
+
+    def filter(record):
+        level_no = record["level"].no
+        if ceiling is not None and level_no > ceiling:
+            return False
+        return level_no >= threshold(record["name"])
+
+    return filter
+
+
+class QueueFileSink:
+    """
+    File sink that only queues messages; a background thread writes them and
+    runs rotation, retention and compression.
+
+    Loguru's ``enqueue`` does the same through a multiprocessing queue, which
+    pickles every record and costs the calling thread more than the write it
+    saves. A forked child, or a sink added again after being removed, starts
+    its own queue and writer thread on the first write.
+    """
+
+    def __init__(self, path, **file_options):
+        self.path = path
+        self.file_options = file_options
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._queue = queue.SimpleQueue()
+        self._file = FileSink(self.path, **self.file_options)
+        self._thread = threading.Thread(
+            target=self._run, name=f"log-writer:{PurePath(self.path).name}", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, message):
+        if self._pid != os.getpid():
+            self._start()
+        self._queue.put(message)
+
+    def _run(self):
+        while (message := self._queue.get()) is not None:
+            try:
+                self._file.write(message)
+            except Exception:
+                sys.stderr.write(f"--- Logging error in writer for {self.path} ---\n")
+                traceback.print_exc(file=sys.stderr)
+        self._file.stop()
+
+    def stop(self):
+        """Called by loguru when the handler is removed: drain, then close"""
+        if self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join()
+            self._pid = None
+
+
+def build_logging(handlers, levels=None, sampling=None, asynchronous=True):
+    """
+    Build the loguru handlers and the stdlib ``LOGGING`` dict for settings.
+
+    With ``asynchronous`` file sinks are wrapped in ``QueueFileSink``: the
+    calling thread only formats and queues the message, writing, rotation
+    and compression happen on a background thread.
+    """
+    levels = levels or {}
+    loguru_handlers = []
+    for handler in handlers:
+        handler = dict(handler)
+        max_level = handler.pop("max_level", None)
+        handler["filter"] = level_filter(levels, max_level)
+        if asynchronous and isinstance(handler["sink"], (str, PurePath)):
+            file_options = {key: handler.pop(key) for key in FILE_OPTIONS if key in handler}
+            handler["sink"] = QueueFileSink(handler["sink"], **file_options)
+        loguru_handlers.append(handler)
+
+    logging_config = {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "filters": {
+            "sampling": {"()": "interceptor.SamplingFilter", "rates": sampling or {}},
+        },
+        "handlers": {
+            "loguru": {"class": "interceptor.InterceptHandler", "filters": ["sampling"]},
+        },
+        "root": {"handlers": ["loguru"], "level": levels.get("", "DEBUG")},
+        # Records under these levels are dropped by the stdlib logger itself,
+        # before a LogRecord is even built
+        "loggers": {name: {"level": level} for name, level in levels.items() if name},
+    }
+    return {"handlers": loguru_handlers}, logging_config